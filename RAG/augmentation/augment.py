@@ -15,19 +15,23 @@ from RAG.retrieval.retrieve_from_pinecone import get_relevant_docs
 load_dotenv()
 
 
-def get_augmented_system_prompt(query: str, k: int = 5) -> str:
+NO_CONTEXT_SYSTEM_PROMPT = "You are a helpful assistant."
+
+
+def get_augmented_system_prompt(query: str, k: int = 5, **retrieval_kwargs) -> str:
     """
     Get an augmented system prompt with relevant context from Pinecone.
     
     Args:
         query: The user's query/question
         k: Number of relevant documents to retrieve (default: 5)
+        **retrieval_kwargs: Additional options forwarded to get_relevant_docs
         
     Returns:
         str: Augmented system prompt with retrieved context
     """
     # Retrieve relevant documents from Pinecone
-    relevant_docs = get_relevant_docs(query, k=k)
+    relevant_docs = get_relevant_docs(query, k=k, **retrieval_kwargs)
     
     # Extract text content from retrieved documents
     context_parts = []
@@ -69,18 +73,23 @@ Instructions:
     return augmented_prompt
 
 
-def get_augmented_prompt_template(query: str, k: int = 5) -> dict:
+def get_augmented_prompt_template(query: str, k: int = 5, **retrieval_kwargs) -> dict:
     """
     Get augmented prompt as a dictionary with system and user messages.
     
+    If no document is relevant enough, the system prompt carries no context
+    section at all.
+    
     Args:
         query: The user's query/question
         k: Number of relevant documents to retrieve (default: 5)
+        **retrieval_kwargs: Additional options forwarded to get_relevant_docs
         
     Returns:
-        dict: Dictionary with 'system' and 'user' keys for prompt formatting
+        dict: Dictionary with 'system' and 'user' keys for prompt formatting,
+            and 'documents' with the retrieved documents
     """
-    relevant_docs = get_relevant_docs(query, k=k)
+    relevant_docs = get_relevant_docs(query, k=k, **retrieval_kwargs)
     
     # Extract context from documents
     context_parts = []
@@ -95,6 +104,13 @@ def get_augmented_prompt_template(query: str, k: int = 5) -> dict:
     
     context = "\n\n".join(context_parts)
     
+    if not context:
+        return {
+            "system": NO_CONTEXT_SYSTEM_PROMPT,
+            "user": query,
+            "documents": relevant_docs,
+        }
+    
     return {
         "system": f"""You are a helpful assistant with access to relevant context from a knowledge base.
 
@@ -102,5 +118,6 @@ Use the following context to answer questions. If the context doesn't contain en
 
 Context from knowledge base:
 {context}""",
-        "user": query
-    }
\ No newline at end of file
+        "user": query,
+        "documents": relevant_docs,
+    }
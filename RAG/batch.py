@@ -0,0 +1,216 @@
+"""
+Answer a file of questions with one shared RAG instance, several questions in flight at a time.
+
+Input is JSON Lines with a "query" per line and optionally "id", "use_rag", "k",
+"namespaces" and "filter". Results are appended to the output file as they
+complete, so an interrupted run resumes by skipping IDs already answered.
+Lines that are not valid questions are written as failed records instead of
+stopping the run.
+
+Usage:
+    uv run python RAG/batch.py questions.jsonl [--output results.jsonl] [--concurrency 8]
+"""
+
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Iterator
+
+# Add project root to path for imports
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+from RAG.main import RAG
+from metrics.registry import Histogram
+from config.settings import BATCH_CONCURRENCY, REQUEST_TIMEOUT_SECONDS
+
+# Question fields passed through to RAG.query
+QUERY_OPTIONS = {"use_rag": "use_rag", "k": "k", "namespaces": "namespaces", "filter": "metadata_filter"}
+
+
+def completed_ids(output_path: Path) -> set[str]:
+    """Return the IDs already answered in an output file (failed questions are retried)."""
+    done = set()
+    if not output_path.exists():
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Torn last line from an interrupted run
+                continue
+            if record.get("error") is None:
+                done.add(str(record["id"]))
+    return done
+
+
+def truncate_torn_line(output_path: Path) -> None:
+    """Drop a partial last line left by an interrupted run so appended results start on a new line."""
+    if not output_path.exists():
+        return
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def parse_question(line: str, line_number: int) -> dict:
+    """
+    Parse one input line into a question.
+
+    A line that is not a JSON object with a non-empty string "query" gives a
+    question carrying an "error" instead, so it is reported in the results
+    rather than aborting the run.
+    """
+    try:
+        question = json.loads(line)
+    except json.JSONDecodeError as e:
+        return {"id": str(line_number), "query": None, "error": f"Invalid JSON on line {line_number}: {e}"}
+    if not isinstance(question, dict):
+        return {"id": str(line_number), "query": None, "error": f"Line {line_number} is not a JSON object"}
+    question["id"] = str(question.get("id", line_number))
+    if not isinstance(question.get("query"), str) or not question["query"].strip():
+        return {"id": question["id"], "query": question.get("query"), "error": f"Line {line_number} has no \"query\" string"}
+    return question
+
+
+def read_questions(input_path: Path, skip: set[str]) -> Iterator[dict]:
+    """Stream questions from a JSON Lines file, skipping answered and duplicate IDs."""
+    seen = set(skip)
+    with open(input_path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            question = parse_question(line, line_number)
+            if question["id"] in seen:
+                continue
+            seen.add(question["id"])
+            yield question
+
+
+def answer_question(rag: RAG, question: dict, timeout_seconds: float) -> dict:
+    """Answer one question and return its result record."""
+    options = {option: question[field] for field, option in QUERY_OPTIONS.items() if field in question}
+    start = time.perf_counter()
+    try:
+        answer = rag.query(question["query"], timeout_seconds=timeout_seconds, **options)
+        error = None
+    except Exception as e:
+        answer = None
+        error = f"{type(e).__name__}: {e}"
+    return {
+        "id": question["id"],
+        "query": question["query"],
+        "answer": answer,
+        "error": error,
+        "latency_seconds": round(time.perf_counter() - start, 4),
+    }
+
+
+def run_batch(rag: RAG, input_path: Path, output_path: Path, concurrency: int, timeout_seconds: float) -> dict:
+    """
+    Answer every unanswered question in ``input_path``, appending results to ``output_path``.
+
+    At most ``concurrency`` questions are in flight; new ones are read from
+    the input only as earlier ones finish, so memory stays flat for large files.
+
+    Args:
+        rag: Shared RAG instance (its caches and coalescing apply across questions)
+        input_path: JSON Lines file of questions
+        output_path: JSON Lines file results are appended to
+        concurrency: Questions answered concurrently
+        timeout_seconds: Time budget per question
+
+    Returns:
+        dict: Run statistics (counts, elapsed time, throughput and latency summary)
+    """
+    skip = completed_ids(output_path)
+    truncate_torn_line(output_path)
+    if skip:
+        print(f"Resuming: {len(skip)} questions already answered in {output_path}")
+    questions = read_questions(input_path, skip)
+    latencies = Histogram(window=None)
+    answered = failed = 0
+    start = time.perf_counter()
+
+    def write_record(out, record: dict) -> None:
+        nonlocal answered, failed
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+        if record["error"] is None:
+            answered += 1
+        else:
+            failed += 1
+            print(f"Question {record['id']} failed: {record['error']}")
+        if (answered + failed) % 100 == 0:
+            print(f"{answered + failed} questions done ({failed} failed)")
+
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch")
+    in_flight = set()
+    try:
+        with open(output_path, "a", encoding="utf-8") as out:
+            exhausted = False
+            while in_flight or not exhausted:
+                while not exhausted and len(in_flight) < concurrency:
+                    question = next(questions, None)
+                    if question is None:
+                        exhausted = True
+                    elif question.get("error") is not None:
+                        # Invalid input line: recorded as failed without being answered
+                        write_record(out, {**question, "answer": None, "latency_seconds": None})
+                    else:
+                        in_flight.add(executor.submit(answer_question, rag, question, timeout_seconds))
+                if not in_flight:
+                    break
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record = future.result()
+                    latencies.observe(record["latency_seconds"])
+                    write_record(out, record)
+    except KeyboardInterrupt:
+        print(f"Interrupted; {len(in_flight)} questions in flight are discarded and will be retried on resume")
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "answered": answered,
+        "failed": failed,
+        "skipped": len(skip),
+        "elapsed_seconds": round(elapsed, 2),
+        "questions_per_second": round((answered + failed) / elapsed, 2) if elapsed else None,
+        "latency_seconds": latencies.summary(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSON Lines file of questions. Interrupted runs resume from the output file.")
+    parser.add_argument("input", type=Path, help="JSON Lines file of questions")
+    parser.add_argument("--output", type=Path, help="Results file (default: <input>.results.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="Questions in flight at a time")
+    parser.add_argument("--timeout", type=float, default=REQUEST_TIMEOUT_SECONDS, help="Time budget per question in seconds")
+    parser.add_argument("--k", type=int, default=5, help="Default number of documents to retrieve")
+    args = parser.parse_args()
+
+    output_path = args.output or args.input.with_suffix(".results.jsonl")
+    # Bulk questions are not live traffic, so they are kept out of the warmup query log
+    rag = RAG(k=args.k, query_log_path=None)
+    stats = run_batch(rag, args.input, output_path, args.concurrency, args.timeout)
+
+    latency = stats["latency_seconds"]
+    print(f"Answered {stats['answered']}, failed {stats['failed']}, skipped {stats['skipped']} in {stats['elapsed_seconds']}s")
+    print(f"Throughput: {stats['questions_per_second']} questions/s")
+    if latency["count"]:
+        print(
+            f"Latency (s): mean {latency['mean']:.3f}, p50 {latency['p50']:.3f}, "
+            f"p95 {latency['p95']:.3f}, p99 {latency['p99']:.3f}, max {latency['max']:.3f}"
+        )
+    print(f"Results written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Persistent embedding artifacts.
+Stores chunk embeddings as a .npy matrix with a Parquet (or JSON Lines) sidecar of IDs, texts and metadata,
+keyed by a hash of the source content and the embedding settings, so vectors never have to be re-encoded.
+Parent spans of small-to-big chunks are stored once per artifact in a JSON file keyed by parent_id.
+A manifest records which artifact is current for each source file, so superseded ones are never loaded.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, Optional
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+
+
+@dataclass
+class EmbeddingArtifact:
+    """Embeddings and metadata for the chunks of one source file."""
+    key: str
+    ids: list[str]
+    vectors: np.ndarray
+    texts: list[str]
+    metadatas: list[dict]
+    # Parent spans by parent_id: {'text': ..., 'compact_text': ...}
+    parents: dict[str, dict] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def records(self, start: int = 0, stop: Optional[int] = None, projection=None) -> list[dict]:
+        """Build Pinecone-style upsert records for a slice of the artifact, reduced by ``projection`` if given."""
+        stop = len(self.ids) if stop is None else min(stop, len(self.ids))
+        vectors = self.vectors[start:stop]
+        if projection is not None:
+            vectors = projection.apply(vectors)
+        records = []
+        for i, vector in zip(range(start, stop), vectors):
+            metadata = dict(self.metadatas[i])
+            metadata["page_content"] = self.texts[i]
+            records.append({"id": self.ids[i], "values": vector.tolist(), "metadata": metadata})
+        return records
+
+
+def artifact_key(source_key: str, model_name: str, **settings) -> str:
+    """
+    Derive the artifact key for a source file.
+    
+    Args:
+        source_key: Content-derived key of the source file (see journal.file_key)
+        model_name: Embedding model name
+        **settings: Any other settings that change the chunks or vectors
+        
+    Returns:
+        str: Hex digest identifying the artifact
+    """
+    payload = json.dumps({"source": source_key, "model": model_name, **settings}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+def _paths(directory: Path, key: str) -> tuple[Path, Path]:
+    sidecar = directory / (f"{key}.parquet" if pq is not None else f"{key}.jsonl")
+    return directory / f"{key}.npy", sidecar
+
+
+def _find_sidecar(directory: Path, key: str) -> Optional[Path]:
+    for suffix in (".parquet", ".jsonl"):
+        path = directory / f"{key}{suffix}"
+        if path.exists():
+            return path
+    return None
+
+
+def _parents_path(directory: Path, key: str) -> Path:
+    return directory / f"{key}.parents.json"
+
+
+def artifact_exists(directory: Path, key: str) -> bool:
+    """Return True if a complete artifact is stored under ``key``."""
+    directory = Path(directory)
+    return (directory / f"{key}.npy").exists() and _find_sidecar(directory, key) is not None
+
+
+def save_artifact(directory: Path, key: str, ids: list[str], vectors: np.ndarray, texts: list[str], metadatas: list[dict], parents: Optional[dict[str, dict]] = None) -> None:
+    """
+    Write an artifact. Files are written to temporary names and renamed, and
+    the sidecar is written last, so a partially written artifact is never
+    mistaken for a complete one.
+    
+    Args:
+        directory: Artifact directory
+        key: Artifact key (see artifact_key)
+        ids: Vector IDs
+        vectors: Embedding matrix of shape (len(ids), dim)
+        texts: Chunk texts
+        metadatas: Chunk metadata (without the text)
+        parents: Parent spans by parent_id, for small-to-big chunks (default: None)
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    vectors_path, sidecar_path = _paths(directory, key)
+
+    tmp_vectors = vectors_path.with_suffix(".npy.tmp")
+    with open(tmp_vectors, "wb") as f:
+        np.save(f, np.ascontiguousarray(vectors, dtype=np.float32))
+    os.replace(tmp_vectors, vectors_path)
+
+    if parents:
+        parents_path = _parents_path(directory, key)
+        tmp_parents = parents_path.with_suffix(".json.tmp")
+        with open(tmp_parents, "w", encoding="utf-8") as f:
+            json.dump(parents, f)
+        os.replace(tmp_parents, parents_path)
+
+    tmp_sidecar = sidecar_path.with_suffix(sidecar_path.suffix + ".tmp")
+    metadata_json = [json.dumps(m, sort_keys=True) for m in metadatas]
+    if pq is not None:
+        table = pa.table({"id": ids, "text": texts, "metadata": metadata_json})
+        pq.write_table(table, tmp_sidecar, compression="zstd")
+    else:
+        with open(tmp_sidecar, "w", encoding="utf-8") as f:
+            for row in zip(ids, texts, metadata_json):
+                f.write(json.dumps({"id": row[0], "text": row[1], "metadata": row[2]}) + "\n")
+    os.replace(tmp_sidecar, sidecar_path)
+    logger.info(f"Saved embedding artifact {key} ({len(ids)} vectors) to {directory}")
+
+
+def load_artifact(directory: Path, key: str, mmap: bool = True) -> EmbeddingArtifact:
+    """
+    Load an artifact.
+    
+    Args:
+        directory: Artifact directory
+        key: Artifact key
+        mmap: Memory-map the vectors instead of reading them into memory (default: True)
+        
+    Returns:
+        EmbeddingArtifact: The stored vectors and metadata
+    """
+    directory = Path(directory)
+    vectors = np.load(directory / f"{key}.npy", mmap_mode="r" if mmap else None)
+    sidecar = _find_sidecar(directory, key)
+    if sidecar is None:
+        raise FileNotFoundError(f"No sidecar found for artifact {key} in {directory}")
+    if sidecar.suffix == ".parquet":
+        if pq is None:
+            raise ImportError("pyarrow is required to read Parquet artifact sidecars")
+        columns = pq.read_table(sidecar).to_pydict()
+        ids, texts, metadata_json = columns["id"], columns["text"], columns["metadata"]
+    else:
+        ids, texts, metadata_json = [], [], []
+        with open(sidecar, encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                ids.append(row["id"])
+                texts.append(row["text"])
+                metadata_json.append(row["metadata"])
+    return EmbeddingArtifact(key, ids, vectors, texts, [json.loads(m) for m in metadata_json], _load_parents(directory, key))
+
+
+def _load_parents(directory: Path, key: str) -> dict[str, dict]:
+    path = _parents_path(directory, key)
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_parents(directory: Path) -> dict[str, dict]:
+    """
+    Load the parent spans of the current artifacts in a directory, without their vectors.
+    
+    Returns:
+        dict[str, dict]: Parent spans ({'text': ..., 'compact_text': ...}) by parent_id
+    """
+    parents = {}
+    for key in list_artifacts(directory):
+        parents.update(_load_parents(Path(directory), key))
+    return parents
+
+
+def read_manifest(directory: Path) -> dict[str, str]:
+    """Return the manifest of a directory: the current artifact key per source file name."""
+    path = Path(directory) / MANIFEST_FILE
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def set_current_artifact(directory: Path, source: str, key: str) -> None:
+    """
+    Record ``key`` as the current artifact of a source file in the directory manifest.
+    
+    An artifact built from an older version of the file, or with other
+    settings, is superseded: its chunk IDs overlap the current one's, so
+    loading both would mix old and new chunks. Superseded artifacts stay on
+    disk (switching back to their settings reuses them) but are not listed.
+    
+    Args:
+        directory: Artifact directory
+        source: Source file name
+        key: Artifact key built from the current file and settings
+    """
+    directory = Path(directory)
+    manifest = read_manifest(directory)
+    if manifest.get(source) == key:
+        return
+    manifest[source] = key
+    directory.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, suffix=".tmp", delete=False) as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(f.name, directory / MANIFEST_FILE)
+
+
+def list_artifacts(directory: Path, include_superseded: bool = False) -> list[str]:
+    """
+    Return the keys of the complete artifacts in a directory.
+    
+    Only the current artifact of each source file in the manifest is listed,
+    unless ``include_superseded`` is set. Directories written before the
+    manifest existed list every artifact.
+    """
+    directory = Path(directory)
+    if not directory.exists():
+        return []
+    manifest = {} if include_superseded else read_manifest(directory)
+    if manifest:
+        keys = set(manifest.values())
+    else:
+        keys = {p.stem for p in directory.glob("*.npy")}
+        if not include_superseded and keys:
+            logger.warning(f"No artifact manifest in {directory}; listing every artifact, including superseded ones")
+    return sorted(key for key in keys if artifact_exists(directory, key))
+
+
+def iter_artifacts(directory: Path, keys: Optional[list[str]] = None, mmap: bool = True) -> Iterator[EmbeddingArtifact]:
+    """Yield artifacts from a directory (the current ones, see :func:`list_artifacts`, unless ``keys`` is given)."""
+    for key in keys or list_artifacts(directory):
+        yield load_artifact(directory, key, mmap=mmap)
+
+
+def bulk_load(store, directory: Path, namespace: Optional[str] = None, batch_size: int = 100, keys: Optional[list[str]] = None, projection=None) -> int:
+    """
+    Upsert stored artifacts into a vector store without running the embedding model.
+    
+    Works with any store exposing Pinecone's ``upsert(vectors=..., namespace=...)``,
+    including LocalVectorIndex.
+    
+    Args:
+        store: Target vector store
+        directory: Artifact directory
+        namespace: Target namespace
+        batch_size: Vectors per upsert call (default: 100)
+        keys: Artifact keys to load (default: the current artifact of each source file)
+        projection: EmbeddingProjection to reduce the vectors with (default: None)
+        
+    Returns:
+        int: Number of vectors upserted
+    """
+    total = 0
+    for artifact in iter_artifacts(directory, keys):
+        for start in range(0, len(artifact), batch_size):
+            store.upsert(vectors=artifact.records(start, start + batch_size, projection), namespace=namespace)
+        total += len(artifact)
+        logger.info(f"Loaded artifact {artifact.key} ({len(artifact)} vectors)")
+    return total
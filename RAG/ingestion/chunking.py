@@ -0,0 +1,345 @@
+"""
+Token-aware chunking for ingestion.
+Splits text into chunks measured in embedding-model tokens, breaking at sentence and section boundaries.
+"""
+
+import re
+import logging
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import numpy as np
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+# End of a sentence, or a line break (PDF extraction puts headings and list items on their own lines)
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;:])\s+|\n+")
+# Blank line, or a line break followed by a numbered or upper-case heading
+SECTION_BOUNDARY = re.compile(r"\n\s*\n|\n(?=(?:\d+(?:\.\d+)*\.?\s+[A-Z]|[A-Z][A-Z0-9 ,&-]{3,}\n))")
+
+
+class TokenChunker:
+    """
+    Split text into chunks that fit the embedding model's token window.
+    
+    Text is tokenized once per page with character offsets. Candidate break
+    points (sentence ends and section starts) are mapped to token positions
+    with a vectorized ``np.searchsorted``, and chunks are packed greedily up
+    to ``max_tokens``. Chunks prefer to end at a section boundary, overlap is
+    measured in tokens and never crosses a section boundary, and a sentence
+    longer than ``max_tokens`` is split at token boundaries.
+    """
+    
+    def __init__(self, tokenizer, max_tokens: int = 254, overlap_tokens: int = 32, min_section_fill: float = 0.5, workers: Optional[int] = None):
+        """
+        Initialize the chunker.
+        
+        Args:
+            tokenizer: Hugging Face fast tokenizer of the embedding model
+            max_tokens: Maximum tokens per chunk, excluding special tokens (default: 254)
+            overlap_tokens: Tokens shared between consecutive chunks (default: 32)
+            min_section_fill: Fraction of max_tokens a chunk must reach before it
+                is closed early at a section boundary (default: 0.5)
+            workers: Threads used to split pages in parallel (default: 4)
+        """
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.min_section_fill = min_section_fill
+        self.workers = workers or 4
+    
+    def settings(self) -> dict:
+        """Settings that determine the chunks produced (used to key stored embeddings)."""
+        return {
+            "chunker": "token",
+            "max_tokens": self.max_tokens,
+            "overlap_tokens": self.overlap_tokens,
+            "min_section_fill": self.min_section_fill,
+        }
+    
+    def _token_offsets(self, texts: list[str]) -> list[np.ndarray]:
+        """Tokenize a batch of texts and return the (start, end) character offsets of every token."""
+        encoded = self.tokenizer(
+            texts,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+        )
+        return [np.asarray(offsets, dtype=np.int64).reshape(-1, 2) for offsets in encoded["offset_mapping"]]
+    
+    def _spans(self, text: str, offsets: np.ndarray) -> list[tuple[int, int]]:
+        """Compute chunk token spans [start, end) for one text."""
+        n_tokens = len(offsets)
+        if n_tokens == 0:
+            return []
+        token_starts = offsets[:, 0]
+        
+        # Token index at which each candidate break point falls
+        sentence_cuts = np.unique(np.searchsorted(
+            token_starts,
+            np.fromiter((m.end() for m in SENTENCE_BOUNDARY.finditer(text)), dtype=np.int64),
+        ))
+        section_cuts = np.unique(np.searchsorted(
+            token_starts,
+            np.fromiter((m.end() for m in SECTION_BOUNDARY.finditer(text)), dtype=np.int64),
+        ))
+        cuts = np.union1d(sentence_cuts, section_cuts)
+        min_fill = int(self.max_tokens * self.min_section_fill)
+        
+        spans = []
+        start = 0
+        prev_end = 0
+        while start < n_tokens:
+            limit = start + self.max_tokens
+            if limit >= n_tokens:
+                spans.append((start, n_tokens))
+                break
+            
+            # Every chunk must end past the previous one, or overlap could repeat it
+            low = max(start, prev_end)
+            # Prefer the last section boundary past the minimum fill, then the last sentence end
+            end = self._last_cut(section_cuts, max(low, start + min_fill), limit)
+            at_section = end is not None
+            if end is None:
+                end = self._last_cut(cuts, low, limit)
+            if end is None:
+                end = limit
+            spans.append((start, end))
+            prev_end = end
+            
+            if at_section or self.overlap_tokens == 0:
+                start = end
+                continue
+            # Overlap starts at the first sentence boundary inside the overlap window,
+            # and never reaches back past the start of the current section
+            section_start = self._last_cut(section_cuts, start, end)
+            window_start = max(end - self.overlap_tokens, section_start or start + 1)
+            next_start = self._first_cut(cuts, window_start, end)
+            start = window_start if next_start is None else next_start
+        return spans
+    
+    @staticmethod
+    def _last_cut(cuts: np.ndarray, low: int, high: int) -> Optional[int]:
+        """Return the largest cut in (low, high], or None."""
+        i = np.searchsorted(cuts, high, side="right") - 1
+        if i >= 0 and cuts[i] > low:
+            return int(cuts[i])
+        return None
+    
+    @staticmethod
+    def _first_cut(cuts: np.ndarray, low: int, high: int) -> Optional[int]:
+        """Return the smallest cut in [low, high), or None."""
+        i = np.searchsorted(cuts, low, side="left")
+        if i < len(cuts) and cuts[i] < high:
+            return int(cuts[i])
+        return None
+    
+    def _split_batch(self, documents: list[Document]) -> list[list[Document]]:
+        texts = [doc.page_content for doc in documents]
+        chunked = []
+        for doc, text, offsets in zip(documents, texts, self._token_offsets(texts)):
+            chunks = []
+            for start, end in self._spans(text, offsets):
+                char_start = int(offsets[start, 0])
+                char_end = int(offsets[end - 1, 1])
+                content = text[char_start:char_end].strip()
+                if not content:
+                    continue
+                metadata = dict(doc.metadata)
+                metadata["start_index"] = char_start
+                metadata["token_count"] = end - start
+                chunks.append(Document(page_content=content, metadata=metadata))
+            chunked.append(chunks)
+        return chunked
+    
+    def split_text(self, text: str) -> list[str]:
+        """
+        Split a single text into chunks.
+        
+        Args:
+            text: The text to split
+            
+        Returns:
+            list[str]: Chunk texts in order
+        """
+        return [doc.page_content for doc in self.split_documents([Document(page_content=text)])]
+    
+    def split_documents(self, documents: list[Document]) -> list[Document]:
+        """
+        Split documents (e.g. PDF pages) into chunks, working on batches of pages in parallel.
+        
+        The fast tokenizer releases the GIL while encoding, so batches
+        tokenize concurrently across threads.
+        
+        Args:
+            documents: Documents to split
+            
+        Returns:
+            list[Document]: Chunks in document order, with the source metadata
+                plus 'start_index' and 'token_count'
+        """
+        if not documents:
+            return []
+        batch_size = max(1, -(-len(documents) // self.workers))
+        batches = [documents[i:i + batch_size] for i in range(0, len(documents), batch_size)]
+        logger.info(f"Splitting {len(documents)} documents in {len(batches)} batches")
+        
+        if len(batches) == 1:
+            results = [self._split_batch(batches[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                results = list(executor.map(self._split_batch, batches))
+        
+        chunks = [chunk for batch in results for doc_chunks in batch for chunk in doc_chunks]
+        logger.info(f"Split {len(documents)} documents into {len(chunks)} chunks")
+        return chunks
+
+
+class ParentChildChunker:
+    """
+    Split documents into small child chunks that link to larger parent spans.
+    
+    Parents are page- or section-sized spans cut without overlap; children are
+    cut from each parent and are what gets embedded. Every child carries its
+    parent's ``parent_id`` and ``parent_text`` so retrieval can match on the
+    small chunk and hand the whole parent to the LLM (see
+    ``retrieve_from_pinecone.collapse_to_parents``). Before the children are
+    stored, :func:`extract_parents` moves the parent texts out of their
+    metadata so each parent is stored once.
+    """
+    
+    def __init__(self, parent_splitter: TokenChunker, child_splitter: TokenChunker):
+        """
+        Initialize the chunker.
+        
+        Args:
+            parent_splitter: Chunker producing the parent spans
+            child_splitter: Chunker producing the embedded child chunks
+        """
+        self.parent_splitter = parent_splitter
+        self.child_splitter = child_splitter
+    
+    def settings(self) -> dict:
+        """Settings that determine the chunks produced (used to key stored embeddings)."""
+        return {
+            "chunker": "parent_child",
+            "parent": self.parent_splitter.settings(),
+            "child": self.child_splitter.settings(),
+        }
+    
+    def split_text(self, text: str) -> list[str]:
+        """Split a single text into child chunk texts."""
+        return [doc.page_content for doc in self.split_documents([Document(page_content=text)])]
+    
+    def split_documents(self, documents: list[Document]) -> list[Document]:
+        """
+        Split documents into child chunks linked to their parents.
+        
+        Parent IDs are ``<source file name>_parent_<n>``, numbered per source
+        in document order, so they are stable across runs. The extension is
+        kept so that e.g. report.pdf and report.txt do not share IDs.
+        
+        Args:
+            documents: Documents to split (e.g. PDF pages)
+            
+        Returns:
+            list[Document]: Child chunks with the source metadata plus
+                'parent_id', 'parent_text' and 'parent_token_count'
+        """
+        parents = self.parent_splitter.split_documents(documents)
+        counters: dict[str, int] = {}
+        for parent in parents:
+            name = Path(str(parent.metadata.get("source", "document"))).name
+            n = counters.get(name, 0)
+            counters[name] = n + 1
+            parent.metadata = {
+                **parent.metadata,
+                "parent_id": f"{name}_parent_{n}",
+                "parent_token_count": parent.metadata["token_count"],
+            }
+        
+        children = self.child_splitter.split_documents(parents)
+        parent_texts = {parent.metadata["parent_id"]: parent.page_content for parent in parents}
+        for child in children:
+            child.metadata["parent_text"] = parent_texts[child.metadata["parent_id"]]
+        logger.info(f"Linked {len(children)} child chunks to {len(parents)} parents")
+        return children
+
+
+def extract_parents(chunks: list[Document]) -> dict[str, dict]:
+    """
+    Move parent spans out of child chunk metadata.
+    
+    Copying a parent into every child would store it once per child in the
+    vector store and can exceed per-vector metadata limits, so children keep
+    only 'parent_id' and the parents are stored once, keyed by it.
+    
+    Args:
+        chunks: Chunks from :class:`ParentChildChunker` (updated in place)
+        
+    Returns:
+        dict[str, dict]: Parents by parent_id, with 'text' and, if built,
+            'compact_text' (see ``compression.add_compact_forms``)
+    """
+    parents = {}
+    for chunk in chunks:
+        parent_text = chunk.metadata.pop("parent_text", None)
+        parent_compact_text = chunk.metadata.pop("parent_compact_text", None)
+        if parent_text is None or chunk.metadata["parent_id"] in parents:
+            continue
+        parent = {"text": parent_text}
+        if parent_compact_text:
+            parent["compact_text"] = parent_compact_text
+        parents[chunk.metadata["parent_id"]] = parent
+    return parents
+
+
+def create_token_chunker(embedding_model, overlap_tokens: int = 32, max_tokens: Optional[int] = None, workers: Optional[int] = None) -> TokenChunker:
+    """
+    Create a chunker sized to a SentenceTransformer's token window.
+    
+    Args:
+        embedding_model: The SentenceTransformer used for embedding
+        overlap_tokens: Tokens shared between consecutive chunks (default: 32)
+        max_tokens: Maximum tokens per chunk (default: the model's max_seq_length
+            minus the two special tokens added at encode time)
+        workers: Threads used to split pages in parallel
+        
+    Returns:
+        TokenChunker: Configured chunker
+    """
+    if max_tokens is None:
+        max_tokens = embedding_model.max_seq_length - 2
+    return TokenChunker(embedding_model.tokenizer, max_tokens=max_tokens, overlap_tokens=overlap_tokens, workers=workers)
+
+
+def create_parent_child_chunker(
+    embedding_model,
+    child_max_tokens: int = 128,
+    parent_max_tokens: int = 1024,
+    overlap_tokens: int = 32,
+    workers: Optional[int] = None,
+) -> ParentChildChunker:
+    """
+    Create a small-to-big chunker for a SentenceTransformer.
+    
+    Args:
+        embedding_model: The SentenceTransformer used for embedding
+        child_max_tokens: Maximum tokens per embedded child chunk (default: 128,
+            capped at the model's window)
+        parent_max_tokens: Maximum tokens per parent span (default: 1024)
+        overlap_tokens: Tokens shared between consecutive child chunks (default: 32)
+        workers: Threads used to split pages in parallel
+        
+    Returns:
+        ParentChildChunker: Configured chunker
+    """
+    child_max_tokens = min(child_max_tokens, embedding_model.max_seq_length - 2)
+    return ParentChildChunker(
+        TokenChunker(embedding_model.tokenizer, max_tokens=parent_max_tokens, overlap_tokens=0, workers=workers),
+        TokenChunker(embedding_model.tokenizer, max_tokens=child_max_tokens, overlap_tokens=overlap_tokens, workers=workers),
+    )
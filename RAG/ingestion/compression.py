@@ -0,0 +1,213 @@
+"""
+Chunk text normalization and compression for ingestion.
+Strips repeated page headers/footers and page numbers, collapses whitespace and builds extractive compact forms.
+"""
+
+import re
+import logging
+from collections import Counter
+from typing import Optional
+from langchain_core.documents import Document
+from RAG.ingestion.chunking import SENTENCE_BOUNDARY
+
+logger = logging.getLogger(__name__)
+
+# Digits are masked so "Page 6" and "Page 7" count as the same line
+_DIGITS = re.compile(r"\d+")
+PAGE_NUMBER_LINE = re.compile(r"^(?:page\s*)?[-\u2013\u2014]?\s*#\s*[-\u2013\u2014]?(?:\s*(?:of|/)\s*#)?$", re.IGNORECASE)
+_HORIZONTAL_SPACE = re.compile(r"[ \t\u00a0\u2000-\u200b]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+# A word hyphenated across a line break
+_HYPHENATED_LINE = re.compile(r"(?<=[A-Za-z])-\n(?=[a-z])")
+# A hard-wrapped line: the next line continues the sentence in lower case
+_WRAPPED_LINE = re.compile(r"(?<=[^\s.!?:;])\n(?=[a-z(])")
+_WORD = re.compile(r"[A-Za-z][A-Za-z'-]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by can for from has have in is it its may not of on or that the their this "
+    "to was were which with will".split()
+)
+
+
+def _line_key(line: str) -> str:
+    return _DIGITS.sub("#", " ".join(line.split())).lower()
+
+
+def find_boilerplate_lines(documents: list[Document], edge_lines: int = 3, min_fraction: float = 0.5, min_pages: int = 3) -> set[str]:
+    """
+    Find header and footer lines repeated across pages.
+
+    Only the first and last ``edge_lines`` lines of each page are considered,
+    so repeated phrases in body text are never treated as boilerplate. Pages
+    with ``2 * edge_lines`` content lines or fewer are skipped: their edges
+    are the body.
+
+    Args:
+        documents: Pages of one source document
+        edge_lines: Lines at the top and bottom of each page to inspect (default: 3)
+        min_fraction: Fraction of pages a line must appear on (default: 0.5)
+        min_pages: Minimum pages a line must appear on (default: 3)
+
+    Returns:
+        set[str]: Normalized keys of boilerplate lines
+    """
+    counts = Counter()
+    for doc in documents:
+        lines = [line for line in doc.page_content.splitlines() if line.strip()]
+        if len(lines) <= 2 * edge_lines:
+            continue
+        counts.update({_line_key(line) for line in lines[:edge_lines] + lines[-edge_lines:]})
+    threshold = max(min_pages, min_fraction * len(documents))
+    return {key for key, count in counts.items() if count >= threshold}
+
+
+def clean_text(text: str, boilerplate: frozenset[str] | set[str] = frozenset(), edge_lines: int = 3) -> str:
+    """
+    Normalize extracted page text.
+
+    Boilerplate and page-number lines are dropped from the top and bottom of
+    pages with more than ``2 * edge_lines`` content lines, runs of spaces are
+    collapsed, hyphenated words and hard-wrapped lines are rejoined and blank
+    line runs are reduced to one, so paragraph and heading breaks (which the
+    chunker splits on) are kept. A page is never cleaned down to nothing: if
+    every line would be dropped, they are all kept.
+
+    Args:
+        text: Page text
+        boilerplate: Line keys from :func:`find_boilerplate_lines`
+        edge_lines: Lines at the top and bottom of the page to check (default: 3)
+
+    Returns:
+        str: Cleaned text
+    """
+    lines = [_HORIZONTAL_SPACE.sub(" ", line).strip() for line in text.splitlines()]
+    content = [i for i, line in enumerate(lines) if line]
+    # On a short page the top and bottom lines are the body, not a header or footer
+    edges = set(content[:edge_lines] + content[-edge_lines:]) if len(content) > 2 * edge_lines else set()
+    kept = []
+    for i, line in enumerate(lines):
+        if i in edges:
+            key = _line_key(line)
+            if key in boilerplate or PAGE_NUMBER_LINE.match(key):
+                continue
+        kept.append(line)
+    if not any(kept):
+        kept = lines
+    text = "\n".join(kept)
+    text = _HYPHENATED_LINE.sub("", text)
+    text = _WRAPPED_LINE.sub(" ", text)
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+def clean_documents(documents: list[Document], edge_lines: int = 3, min_fraction: float = 0.5) -> list[Document]:
+    """
+    Clean the pages of one source document (see :func:`clean_text`).
+
+    Args:
+        documents: Pages of one source document
+        edge_lines: Lines at the top and bottom of each page to inspect (default: 3)
+        min_fraction: Fraction of pages a header or footer line must appear on (default: 0.5)
+
+    Returns:
+        list[Document]: Cleaned pages with the original metadata; blank pages are dropped
+    """
+    boilerplate = find_boilerplate_lines(documents, edge_lines=edge_lines, min_fraction=min_fraction)
+    cleaned = []
+    before = after = 0
+    for doc in documents:
+        text = clean_text(doc.page_content, boilerplate, edge_lines=edge_lines)
+        original = len(doc.page_content.strip())
+        before += len(doc.page_content)
+        after += len(text)
+        if original and len(text) < 0.5 * original:
+            logger.warning(
+                f"Cleaning removed {1 - len(text) / original:.0%} of page {doc.metadata.get('page', '?')} "
+                f"of {doc.metadata.get('source', 'document')}"
+            )
+        if text:
+            cleaned.append(Document(page_content=text, metadata=dict(doc.metadata)))
+    logger.info(
+        f"Cleaned {len(documents)} pages: {len(boilerplate)} boilerplate lines, "
+        f"{before} -> {after} characters"
+    )
+    return cleaned
+
+
+def condense_text(text: str, ratio: float = 0.5, min_chars: int = 400) -> Optional[str]:
+    """
+    Build an extractive compact form of a text.
+
+    Sentences are scored by the average in-text frequency of their content
+    words, and the best ones are kept, in their original order, up to
+    ``ratio`` of the original length. The first sentence (usually the
+    heading or topic sentence) is always kept.
+
+    Args:
+        text: Text to condense
+        ratio: Target length as a fraction of the original (default: 0.5)
+        min_chars: Texts shorter than this are not condensed (default: 400)
+
+    Returns:
+        str | None: The compact form, or None if the text is too short or
+            condensing would not make it meaningfully shorter
+    """
+    if len(text) < min_chars:
+        return None
+    sentences = [s.strip() for s in SENTENCE_BOUNDARY.split(text) if s.strip()]
+    if len(sentences) < 3:
+        return None
+
+    words = [[w.lower() for w in _WORD.findall(s) if w.lower() not in STOPWORDS] for s in sentences]
+    frequencies = Counter(w for sentence_words in words for w in sentence_words)
+    scores = [
+        sum(frequencies[w] for w in sentence_words) / len(sentence_words) if sentence_words else 0.0
+        for sentence_words in words
+    ]
+
+    budget = ratio * len(text)
+    kept = {0}
+    used = len(sentences[0])
+    for i in sorted(range(1, len(sentences)), key=lambda i: scores[i], reverse=True):
+        if used + len(sentences[i]) > budget:
+            continue
+        kept.add(i)
+        used += len(sentences[i]) + 1
+
+    compact = " ".join(sentences[i] for i in sorted(kept))
+    if len(compact) > 0.9 * len(text):
+        return None
+    return compact
+
+
+def add_compact_forms(chunks: list[Document], ratio: float = 0.5) -> list[Document]:
+    """
+    Store compact forms of the text used as context in chunk metadata.
+
+    Chunks linked to a parent get 'parent_compact_text' (computed once per
+    parent); other chunks get 'compact_text'. Retrieval switches to these
+    when the full texts do not fit the context token budget.
+
+    Args:
+        chunks: Chunks from the splitter
+        ratio: Target length of compact forms (default: 0.5)
+
+    Returns:
+        list[Document]: The same chunks, updated in place
+    """
+    parent_compact = {}
+    compacted = 0
+    for chunk in chunks:
+        metadata = chunk.metadata
+        if "parent_text" in metadata:
+            parent_id = metadata["parent_id"]
+            if parent_id not in parent_compact:
+                parent_compact[parent_id] = condense_text(metadata["parent_text"], ratio)
+            compact = parent_compact[parent_id]
+            if compact:
+                metadata["parent_compact_text"] = compact
+        else:
+            compact = condense_text(chunk.page_content, ratio)
+            if compact:
+                metadata["compact_text"] = compact
+        compacted += bool(compact)
+    logger.info(f"Added compact forms to {compacted} of {len(chunks)} chunks")
+    return chunks
@@ -1,68 +1,242 @@
 import os
+import sys
+import argparse
 from pathlib import Path
 from pinecone import Pinecone
 from langchain_community.document_loaders import PyPDFLoader, TextLoader
-from langchain_text_splitters import CharacterTextSplitter
 from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
 
-load_dotenv()
-
-# Get Pinecone index name from environment
-PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
-if not PINECONE_INDEX_NAME:
-    raise ValueError("PINECONE_INDEX_NAME environment variable is required")
-
-embedding_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-
-pc = Pinecone()
-
+# Add project root to path for imports
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+from RAG.ingestion.chunking import create_token_chunker, create_parent_child_chunker, extract_parents
+from RAG.ingestion.compression import clean_documents, add_compact_forms
+from RAG.ingestion.journal import IngestionJournal, file_key, target_key
+from RAG.ingestion.rate_limit import TokenBucket, retry_with_backoff
+from RAG.ingestion.artifacts import artifact_key, artifact_exists, save_artifact, load_artifact, set_current_artifact
+from RAG.ingestion.reduction import ensure_projection
+from config.settings import (
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_REDUCTION,
+    EMBEDDING_REDUCED_DIM,
+    CHUNK_MAX_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
+    CHUNK_WORKERS,
+    CHUNK_SMALL_TO_BIG,
+    CHUNK_CHILD_MAX_TOKENS,
+    CHUNK_PARENT_MAX_TOKENS,
+    CHUNK_CLEAN_TEXT,
+    CHUNK_COMPACT_RATIO,
+    INGEST_BATCH_SIZE,
+    INGEST_UPSERTS_PER_SECOND,
+    INGEST_UPSERT_BURST,
+    INGEST_MAX_RETRIES,
+    INGEST_BACKOFF_BASE_SECONDS,
+    INGEST_BACKOFF_MAX_SECONDS,
+    EMBEDDING_ARTIFACTS_DIR,
+)
 
+load_dotenv()
 
 script_dir = Path(__file__).parent
-pdf_path = script_dir.parent / "sample_rag_nist_ai_rmf_1_0.pdf"
-
-text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-
-loader = PyPDFLoader(str(pdf_path))
-print("loading document.....")
-
-documents = loader.load()
-
-print("document loaded.....")
-
-print("splitting document.....")
-chunks = text_splitter.split_documents(documents)
-print("splitting document done.....")
-
-texts = [chunk.page_content for chunk in chunks]
-print("encoding document.....")
-vectors = embedding_model.encode(texts, normalize_embeddings=True) 
-print("encoding document done.....")
-
-to_upsert = []
-id = 0
-for chunk, vector in zip(chunks, vectors):
-    chunk_id = f"chunk_{id}"
-    id += 1
-    chunk_metadata = chunk.metadata
-    chunk_page_content = chunk.page_content
-    chunk_metadata["page_content"] = chunk_page_content
-    to_upsert.append({
-        "id": chunk_id,
-        "values": vector.tolist(),
-        "metadata": chunk_metadata
-    })
-
-print(f"Upserting {len(to_upsert)} chunks into Pinecone")
-
-index = pc.Index(PINECONE_INDEX_NAME)
-
-PINECONE_NAMESPACE = os.getenv("PINECONE_NAMESPACE")
-if not PINECONE_NAMESPACE:
-    raise ValueError("PINECONE_NAMESPACE environment variable is required")
-# Batch size for upserting
-BATCH_SIZE = 10
-for i in range(0, len(to_upsert), BATCH_SIZE):
-    print(f"Upserting batch {i//BATCH_SIZE+1} of {len(to_upsert)//BATCH_SIZE}")
-    index.upsert(vectors=to_upsert[i:i+BATCH_SIZE], namespace=PINECONE_NAMESPACE)
\ No newline at end of file
+DEFAULT_PDF_PATH = script_dir.parent / "sample_rag_nist_ai_rmf_1_0.pdf"
+DEFAULT_JOURNAL_PATH = Path(os.getenv("INGEST_JOURNAL_PATH", script_dir / "ingest_journal.jsonl"))
+
+
+# Bump when the stored chunk IDs or metadata change so existing artifacts are rebuilt
+METADATA_VERSION = 4
+
+
+def load_documents(path: Path):
+    """
+    Load a PDF (one document per page) or a plain text file.
+    
+    Every document is tagged with ``file_name`` and ``doc_type`` so queries can
+    filter on them in the vector store.
+    """
+    if path.suffix.lower() == ".pdf":
+        documents = PyPDFLoader(str(path)).load()
+    else:
+        documents = TextLoader(str(path), encoding="utf-8").load()
+    for document in documents:
+        document.metadata["file_name"] = path.name
+        document.metadata["doc_type"] = path.suffix.lower().lstrip(".") or "txt"
+    return documents
+
+
+def build_artifact(path: Path, key: str, embedding_model, text_splitter, artifacts_dir: Path, clean_text: bool = CHUNK_CLEAN_TEXT, compact_ratio: float | None = CHUNK_COMPACT_RATIO):
+    """
+    Chunk and encode a file once and persist the vectors and metadata as an artifact.
+    
+    With ``clean_text`` page headers/footers are stripped before splitting; with
+    ``compact_ratio`` each chunk also stores an extractive compact form that
+    retrieval falls back to when the context token budget is tight.
+    """
+    print(f"loading document {path.name}.....")
+    documents = load_documents(path)
+    print("document loaded.....")
+
+    if clean_text:
+        documents = clean_documents(documents)
+
+    print("splitting document.....")
+    chunks = text_splitter.split_documents(documents)
+    print("splitting document done.....")
+
+    if compact_ratio:
+        add_compact_forms(chunks, ratio=compact_ratio)
+
+    parents = extract_parents(chunks)
+    texts = [chunk.page_content for chunk in chunks]
+    print("encoding document.....")
+    vectors = embedding_model.encode(texts, normalize_embeddings=True)
+    print("encoding document done.....")
+
+    save_artifact(
+        artifacts_dir,
+        key,
+        # The full file name keeps report.pdf and report.txt apart (as in the artifact manifest)
+        ids=[f"{path.name}_chunk_{i}" for i in range(len(chunks))],
+        vectors=vectors,
+        texts=texts,
+        metadatas=[dict(chunk.metadata) for chunk in chunks],
+        parents=parents,
+    )
+
+
+def current_artifact_key(path: Path, text_splitter) -> str:
+    """Return the artifact key for the file's content and the current chunking and embedding settings."""
+    settings = text_splitter.settings() if hasattr(text_splitter, "settings") else {}
+    settings.update(clean_text=CHUNK_CLEAN_TEXT, compact_ratio=CHUNK_COMPACT_RATIO)
+    return artifact_key(file_key(path), EMBEDDING_MODEL_NAME, metadata_version=METADATA_VERSION, **settings)
+
+
+def prepare_artifact(path: Path, embedding_model, text_splitter, artifacts_dir: Path) -> str:
+    """
+    Return the key of the file's embedding artifact, building it (chunking and encoding) only if it does not exist.
+    
+    The artifact is recorded as the file's current one in the artifact manifest.
+    """
+    vectors_key = current_artifact_key(path, text_splitter)
+    if artifact_exists(artifacts_dir, vectors_key):
+        print(f"Using stored embeddings for {path.name} ({vectors_key})")
+    else:
+        build_artifact(path, vectors_key, embedding_model, text_splitter, artifacts_dir)
+    set_current_artifact(artifacts_dir, path.name, vectors_key)
+    return vectors_key
+
+
+def ingest_file(path: Path, index, namespace: str, embedding_model, text_splitter, journal: IngestionJournal, bucket: TokenBucket, artifacts_dir: Path = Path(EMBEDDING_ARTIFACTS_DIR), projection=None, index_name: str = ""):
+    """
+    Ingest one file, skipping batches the journal records as already upserted.
+    
+    Vectors come from the file's embedding artifact, which is built (chunked
+    and encoded) only if it does not exist yet, so a resumed or repeated run
+    never re-encodes. Chunk IDs and batch numbers are stable across runs.
+    With a ``projection`` the vectors are reduced before upserting.
+    
+    Journal entries are keyed on the index name, the namespace, the
+    artifact key and the projection, so progress only carries over to a run
+    upserting the same vectors into the same place.
+    """
+    key = target_key(
+        path.name,
+        index=index_name,
+        namespace=namespace,
+        artifact=current_artifact_key(path, text_splitter),
+        projection=projection.signature() if projection is not None else None,
+    )
+    if journal.is_file_done(key):
+        print(f"Skipping {path.name}: already ingested into {index_name or 'the index'} (namespace {namespace})")
+        return
+
+    artifact = load_artifact(artifacts_dir, prepare_artifact(path, embedding_model, text_splitter, artifacts_dir))
+
+    done = journal.batches_done(key)
+    num_batches = (len(artifact) + INGEST_BATCH_SIZE - 1) // INGEST_BATCH_SIZE
+    if done:
+        print(f"Resuming {path.name}: {len(done)} of {num_batches} batches already upserted")
+
+    for batch in range(num_batches):
+        if batch in done:
+            continue
+        start = batch * INGEST_BATCH_SIZE
+        to_upsert = artifact.records(start, start + INGEST_BATCH_SIZE, projection)
+
+        print(f"Upserting batch {batch + 1} of {num_batches}")
+        bucket.acquire()
+        retry_with_backoff(
+            lambda: index.upsert(vectors=to_upsert, namespace=namespace),
+            max_retries=INGEST_MAX_RETRIES,
+            base_delay=INGEST_BACKOFF_BASE_SECONDS,
+            max_delay=INGEST_BACKOFF_MAX_SECONDS,
+        )
+        journal.mark_batch(key, batch)
+
+    journal.mark_file_done(key, len(artifact))
+    print(f"Ingested {len(artifact)} chunks from {path.name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest documents into Pinecone. Interrupted runs resume from the journal.")
+    parser.add_argument("files", nargs="*", type=Path, default=[DEFAULT_PDF_PATH], help="PDF or text files to ingest")
+    parser.add_argument("--namespace", default=os.getenv("PINECONE_NAMESPACE"), help="Target namespace (default: PINECONE_NAMESPACE)")
+    parser.add_argument("--journal", type=Path, default=DEFAULT_JOURNAL_PATH, help="Checkpoint journal path")
+    parser.add_argument("--restart", action="store_true", help="Ignore the journal and ingest everything again")
+    parser.add_argument("--artifacts-dir", type=Path, default=Path(EMBEDDING_ARTIFACTS_DIR), help="Where embedding artifacts are stored")
+    args = parser.parse_args()
+
+    # Get Pinecone index name from environment
+    PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
+    if not PINECONE_INDEX_NAME:
+        raise ValueError("PINECONE_INDEX_NAME environment variable is required")
+    if not args.namespace:
+        raise ValueError("PINECONE_NAMESPACE environment variable is required")
+
+    journal = IngestionJournal(args.journal)
+    if args.restart:
+        journal.reset()
+
+    embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    # Chunks are sized in embedding-model tokens so nothing is truncated at encode time
+    if CHUNK_SMALL_TO_BIG:
+        # Small chunks are embedded for precise matching; retrieval returns their parent spans
+        text_splitter = create_parent_child_chunker(
+            embedding_model,
+            child_max_tokens=CHUNK_CHILD_MAX_TOKENS,
+            parent_max_tokens=CHUNK_PARENT_MAX_TOKENS,
+            overlap_tokens=CHUNK_OVERLAP_TOKENS,
+            workers=CHUNK_WORKERS,
+        )
+    else:
+        text_splitter = create_token_chunker(
+            embedding_model,
+            max_tokens=CHUNK_MAX_TOKENS,
+            overlap_tokens=CHUNK_OVERLAP_TOKENS,
+            workers=CHUNK_WORKERS,
+        )
+
+    pc = Pinecone()
+    index = pc.Index(PINECONE_INDEX_NAME)
+    bucket = TokenBucket(rate=INGEST_UPSERTS_PER_SECOND, capacity=INGEST_UPSERT_BURST)
+
+    projection = None
+    if EMBEDDING_REDUCTION:
+        # The projection is fitted over the whole corpus, so every artifact is built first
+        for path in args.files:
+            prepare_artifact(path, embedding_model, text_splitter, args.artifacts_dir)
+        projection = ensure_projection(
+            args.artifacts_dir, EMBEDDING_REDUCED_DIM, method=EMBEDDING_REDUCTION, model_name=EMBEDDING_MODEL_NAME
+        )
+        print(f"Reducing vectors to {projection.dim} dimensions ({projection.method})")
+
+    for path in args.files:
+        ingest_file(
+            path, index, args.namespace, embedding_model, text_splitter, journal, bucket, args.artifacts_dir, projection,
+            index_name=PINECONE_INDEX_NAME,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Checkpoint journal for resumable ingestion.
+Records completed batches and files in an append-only JSON Lines file so an interrupted run can resume.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def file_key(path: Path) -> str:
+    """
+    Build a journal key for a file from its name and content hash.
+    
+    A file whose content changes gets a new key and is ingested again.
+    
+    Args:
+        path: Path to the source file
+        
+    Returns:
+        str: Key of the form '<file name>:<sha256 prefix>'
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return f"{path.name}:{digest.hexdigest()[:16]}"
+
+
+def target_key(source: str, **target) -> str:
+    """
+    Build a journal key for ingesting a source file into one target.
+    
+    Progress is only valid for the exact vectors upserted into the exact
+    index and namespace, so all of them go into the key: ingesting into
+    another namespace, or with settings that change the chunks, starts over
+    instead of being skipped or resumed from unrelated batch numbers.
+    
+    Args:
+        source: Source file name (kept readable in the journal)
+        **target: What was upserted where, e.g. index, namespace and artifact key
+        
+    Returns:
+        str: Key of the form '<file name>:<sha256 prefix of the target>'
+    """
+    payload = json.dumps(target, sort_keys=True)
+    return f"{source}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]}"
+
+
+class IngestionJournal:
+    """
+    Durable record of ingestion progress.
+    
+    Every entry is appended and fsynced before the call returns, so a crash
+    loses at most the batch that was in flight. A torn final line left by a
+    crash is ignored on load.
+    """
+    
+    def __init__(self, path: Path):
+        """
+        Open (or create) the journal.
+        
+        Args:
+            path: Location of the JSON Lines journal file
+        """
+        self.path = Path(path)
+        self.completed_files: dict[str, int] = {}
+        self.completed_batches: dict[str, set[int]] = {}
+        self._load()
+    
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Ignoring unreadable journal line {line_number} in {self.path}")
+                    continue
+                if entry.get("event") == "batch":
+                    self.completed_batches.setdefault(entry["file"], set()).add(entry["batch"])
+                elif entry.get("event") == "file_done":
+                    self.completed_files[entry["file"]] = entry["chunks"]
+        logger.info(
+            f"Loaded journal {self.path}: {len(self.completed_files)} files done, "
+            f"{sum(len(b) for b in self.completed_batches.values())} batches done"
+        )
+    
+    def _append(self, entry: dict) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def is_file_done(self, key: str) -> bool:
+        """Return True if every batch of the file has been upserted."""
+        return key in self.completed_files
+    
+    def batches_done(self, key: str) -> set[int]:
+        """Return the batch numbers already upserted for a file."""
+        return self.completed_batches.get(key, set())
+    
+    def mark_batch(self, key: str, batch: int) -> None:
+        """Record that a batch has been upserted."""
+        self._append({"event": "batch", "file": key, "batch": batch})
+        self.completed_batches.setdefault(key, set()).add(batch)
+    
+    def mark_file_done(self, key: str, chunks: int) -> None:
+        """Record that a file has been fully ingested."""
+        self._append({"event": "file_done", "file": key, "chunks": chunks})
+        self.completed_files[key] = chunks
+    
+    def reset(self) -> None:
+        """Forget all progress and start a fresh journal."""
+        if self.path.exists():
+            self.path.unlink()
+        self.completed_files.clear()
+        self.completed_batches.clear()
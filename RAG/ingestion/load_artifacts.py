@@ -0,0 +1,52 @@
+"""
+Bulk-load stored embedding artifacts into Pinecone without running the embedding model.
+
+Usage:
+    uv run python RAG/ingestion/load_artifacts.py [--namespace NS] [--artifacts-dir DIR]
+"""
+
+import os
+import sys
+import argparse
+from pathlib import Path
+from pinecone import Pinecone
+from dotenv import load_dotenv
+
+# Add project root to path for imports
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+from RAG.ingestion.artifacts import bulk_load, list_artifacts
+from RAG.ingestion.reduction import ensure_projection
+from config.settings import EMBEDDING_ARTIFACTS_DIR, EMBEDDING_MODEL_NAME, EMBEDDING_REDUCTION, EMBEDDING_REDUCED_DIM
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upsert stored embedding artifacts into Pinecone.")
+    parser.add_argument("--namespace", default=os.getenv("PINECONE_NAMESPACE"), help="Target namespace (default: PINECONE_NAMESPACE)")
+    parser.add_argument("--artifacts-dir", type=Path, default=Path(EMBEDDING_ARTIFACTS_DIR), help="Where embedding artifacts are stored")
+    parser.add_argument("--batch-size", type=int, default=100, help="Vectors per upsert request")
+    args = parser.parse_args()
+
+    PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
+    if not PINECONE_INDEX_NAME:
+        raise ValueError("PINECONE_INDEX_NAME environment variable is required")
+    if not args.namespace:
+        raise ValueError("PINECONE_NAMESPACE environment variable is required")
+
+    keys = list_artifacts(args.artifacts_dir)
+    print(f"Loading {len(keys)} artifacts from {args.artifacts_dir} into namespace {args.namespace}")
+    projection = None
+    if EMBEDDING_REDUCTION:
+        projection = ensure_projection(
+            args.artifacts_dir, EMBEDDING_REDUCED_DIM, method=EMBEDDING_REDUCTION, model_name=EMBEDDING_MODEL_NAME
+        )
+        print(f"Reducing vectors to {projection.dim} dimensions ({projection.method})")
+    index = Pinecone().Index(PINECONE_INDEX_NAME)
+    total = bulk_load(index, args.artifacts_dir, namespace=args.namespace, batch_size=args.batch_size, keys=keys, projection=projection)
+    print(f"Upserted {total} vectors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Rate limiting and retries for vector store writes.
+"""
+
+import time
+import random
+import logging
+import threading
+from typing import Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter.
+    
+    Tokens refill continuously at ``rate`` per second up to ``capacity``;
+    ``acquire`` blocks until enough tokens are available.
+    """
+    
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum tokens held, i.e. the allowed burst
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self, tokens: float = 1.0) -> None:
+        """Block until ``tokens`` can be taken from the bucket."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Decide whether a failed request is worth retrying.
+    
+    Client errors (4xx) other than 429 Too Many Requests are not retried;
+    everything else (rate limits, server errors, connection errors) is.
+    """
+    status = getattr(error, "status", None) or getattr(error, "status_code", None)
+    if isinstance(status, int) and 400 <= status < 500 and status != 429:
+        return False
+    return True
+
+
+def retry_with_backoff(
+    fn: Callable[[], T],
+    max_retries: int = 5,
+    base_delay: float = 0.5,
+    max_delay: float = 30.0,
+) -> T:
+    """
+    Call ``fn``, retrying retryable failures with exponential backoff and full jitter.
+    
+    Args:
+        fn: Zero-argument callable to run
+        max_retries: Retries after the first attempt (default: 5)
+        base_delay: Delay cap for the first retry in seconds (default: 0.5)
+        max_delay: Upper bound on any single delay in seconds (default: 30.0)
+        
+    Returns:
+        The return value of ``fn``
+        
+    Raises:
+        Exception: The last error, once retries are exhausted or the error is not retryable
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == max_retries or not is_retryable(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            logger.warning(f"Attempt {attempt + 1} failed ({type(e).__name__}: {e}); retrying in {delay:.2f}s")
+            time.sleep(delay)
@@ -0,0 +1,170 @@
+"""
+Embedding dimensionality reduction.
+Fits a PCA or truncation projection over the stored chunk embeddings and persists it next to the artifacts,
+so stored vectors and query embeddings are reduced the same way.
+"""
+
+import os
+import hashlib
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+import numpy as np
+from RAG.ingestion.artifacts import iter_artifacts
+
+logger = logging.getLogger(__name__)
+
+PROJECTION_FILE = "projection.npz"
+METHODS = ("pca", "truncate")
+
+
+@dataclass
+class EmbeddingProjection:
+    """
+    Linear projection of embeddings to fewer dimensions.
+
+    "pca" projects onto the top principal components of the corpus;
+    "truncate" keeps the leading dimensions (exact for Matryoshka-trained
+    models, lossier for others). Both re-normalize, so cosine similarity
+    stays a dot product.
+
+    Vectors are not centered before projecting, so query-chunk dot products
+    are preserved within the kept subspace; subtracting the corpus mean
+    shifts them and changes the ranking.
+    """
+    method: str
+    dim: int
+    model_name: str
+    components: Optional[np.ndarray] = None  # (dim, full_dim), PCA only
+
+    def apply(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Reduce one embedding or a matrix of embeddings.
+
+        Args:
+            vectors: Array of shape (full_dim,) or (n, full_dim)
+
+        Returns:
+            np.ndarray: Unit-length float32 array of shape (dim,) or (n, dim)
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.method == "pca":
+            reduced = vectors @ self.components.T
+        else:
+            reduced = vectors[..., :self.dim]
+        norms = np.linalg.norm(reduced, axis=-1, keepdims=True)
+        return (reduced / np.where(norms == 0, 1, norms)).astype(np.float32)
+
+    def save(self, directory: Path) -> Path:
+        """Write the projection to ``directory`` (atomically) and return its path."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / PROJECTION_FILE
+        arrays = {"method": np.array(self.method), "dim": np.array(self.dim), "model_name": np.array(self.model_name)}
+        if self.method == "pca":
+            arrays["components"] = self.components
+        tmp_path = path.with_suffix(".npz.tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+        logger.info(f"Saved {self.method} projection to {self.dim} dimensions at {path}")
+        return path
+
+    def signature(self) -> str:
+        """
+        Identify the vectors this projection produces.
+
+        Two PCA projections with the same settings but fitted over different
+        corpora reduce vectors differently, so the components are hashed in.
+        """
+        signature = f"{self.method}:{self.dim}:{self.model_name}"
+        if self.components is not None:
+            signature += ":" + hashlib.sha256(np.ascontiguousarray(self.components).tobytes()).hexdigest()[:16]
+        return signature
+
+    def matches(self, method: str, dim: int, model_name: str) -> bool:
+        """Return True if this projection was fitted with these settings."""
+        return (self.method, self.dim, self.model_name) == (method, dim, model_name)
+
+
+def fit_projection(vectors: np.ndarray, dim: int, method: str = "pca", model_name: str = "") -> EmbeddingProjection:
+    """
+    Fit a projection over a corpus of embeddings.
+
+    Args:
+        vectors: Embedding matrix of shape (n, full_dim)
+        dim: Target dimension
+        method: "pca" or "truncate" (default: "pca")
+        model_name: Embedding model the vectors come from (recorded for validation)
+
+    Returns:
+        EmbeddingProjection: The fitted projection
+
+    Raises:
+        ValueError: If the method is unknown or ``dim`` is out of range
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown reduction method {method!r}; expected one of {METHODS}")
+    vectors = np.asarray(vectors, dtype=np.float32)
+    full_dim = vectors.shape[1]
+    if method == "truncate":
+        if not 0 < dim <= full_dim:
+            raise ValueError(f"Cannot truncate {full_dim}-dimensional embeddings to {dim}")
+        return EmbeddingProjection("truncate", dim, model_name)
+    if not 0 < dim <= min(len(vectors), full_dim):
+        raise ValueError(f"PCA to {dim} dimensions needs at least {dim} vectors of at least {dim} dimensions "
+                         f"(got {len(vectors)} x {full_dim})")
+    # Rows of vt are the principal directions, by decreasing explained variance
+    _, singular_values, vt = np.linalg.svd(vectors - vectors.mean(axis=0), full_matrices=False)
+    explained = (singular_values[:dim] ** 2).sum() / (singular_values ** 2).sum()
+    logger.info(f"PCA to {dim} of {full_dim} dimensions keeps {explained:.1%} of the variance ({len(vectors)} vectors)")
+    return EmbeddingProjection("pca", dim, model_name, components=vt[:dim].astype(np.float32))
+
+
+def load_projection(directory: Path) -> Optional[EmbeddingProjection]:
+    """Load the projection stored in ``directory``, or None if there is none."""
+    path = Path(directory) / PROJECTION_FILE
+    if not path.exists():
+        return None
+    with np.load(path) as data:
+        method = str(data["method"])
+        return EmbeddingProjection(
+            method=method,
+            dim=int(data["dim"]),
+            model_name=str(data["model_name"]),
+            components=data["components"] if method == "pca" else None,
+        )
+
+
+def fit_artifacts_projection(directory: Path, dim: int, method: str = "pca", model_name: str = "") -> EmbeddingProjection:
+    """
+    Fit a projection over the vectors of the current artifact of each source
+    file in ``directory`` (see :func:`fit_projection`). Superseded artifacts
+    are left out, so old versions of a file do not skew the fit.
+    """
+    matrices = [np.asarray(artifact.vectors) for artifact in iter_artifacts(directory)]
+    if not matrices:
+        raise ValueError(f"No embedding artifacts in {directory} to fit a projection on")
+    return fit_projection(np.vstack(matrices), dim, method=method, model_name=model_name)
+
+
+def ensure_projection(directory: Path, dim: int, method: str = "pca", model_name: str = "") -> EmbeddingProjection:
+    """
+    Load the projection stored in ``directory``, fitting and saving a new one
+    over the artifacts if there is none or it was fitted with other settings.
+
+    Vectors reduced by a replaced projection are no longer comparable with
+    new query embeddings, so an index holding them must be re-ingested.
+    """
+    projection = load_projection(directory)
+    if projection is not None and projection.matches(method, dim, model_name):
+        return projection
+    if projection is not None:
+        logger.warning(
+            f"Replacing the {projection.method} projection to {projection.dim} dimensions in {directory}; "
+            f"vectors already upserted with it must be re-ingested"
+        )
+    projection = fit_artifacts_projection(directory, dim, method=method, model_name=model_name)
+    projection.save(directory)
+    return projection
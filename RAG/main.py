@@ -5,14 +5,18 @@ This class integrates:
 - Document retrieval from Pinecone
 - Query augmentation with retrieved context
 - LLM model for generating answers
+- Optional session-scoped conversation memory
 """
 
 import sys
+import json
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
 from dotenv import load_dotenv
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -24,17 +28,63 @@ sys.path.insert(0, str(project_root))
 logger.info(f"RAG module: Project root set to {project_root}")
 
 try:
-    from RAG.augmentation.augment import get_augmented_system_prompt, get_augmented_prompt_template
+    from RAG.augmentation.augment import get_augmented_system_prompt, get_augmented_prompt_template, NO_CONTEXT_SYSTEM_PROMPT
     logger.info("Successfully imported augmentation functions")
 except Exception as e:
     logger.error(f"Failed to import augmentation functions: {e}", exc_info=True)
     raise
 
 try:
-    from models.ollama_model import create_ollama_model
-    logger.info("Successfully imported create_ollama_model")
+    from models.ollama_model import get_ollama_model
+    from models.usage import combine_usage, ollama_usage, record_usage
+    logger.info("Successfully imported get_ollama_model")
 except Exception as e:
-    logger.error(f"Failed to import create_ollama_model: {e}", exc_info=True)
+    logger.error(f"Failed to import get_ollama_model: {e}", exc_info=True)
+    raise
+
+try:
+    from RAG.memory import ConversationMemory
+    from config.settings import (
+        MEMORY_MAX_HISTORY_TOKENS,
+        MEMORY_MAX_SESSIONS,
+        MEMORY_SESSION_TTL_SECONDS,
+        MEMORY_CONDENSE_BUDGET_SHARE,
+    )
+    logger.info("Successfully imported ConversationMemory")
+except Exception as e:
+    logger.error(f"Failed to import ConversationMemory: {e}", exc_info=True)
+    raise
+
+try:
+    from RAG.singleflight import SingleFlight
+    logger.info("Successfully imported SingleFlight")
+except Exception as e:
+    logger.error(f"Failed to import SingleFlight: {e}", exc_info=True)
+    raise
+
+try:
+    from RAG.resilience import CircuitBreaker, Deadline, call_with_timeout
+    from RAG.tokens import estimate_tokens
+    from tools.search_cache import SearchCache, normalize_query
+    from RAG.warmup import QueryLog
+    from metrics import metrics
+    from config.settings import (
+        REQUEST_TIMEOUT_SECONDS,
+        RETRIEVAL_BUDGET_SHARE,
+        RETRIEVAL_TIMEOUT_SECONDS,
+        BREAKER_FAILURE_THRESHOLD,
+        BREAKER_RESET_SECONDS,
+        ANSWER_CACHE_TTL_SECONDS,
+        ANSWER_CACHE_MAX_ENTRIES,
+        LLM_MAX_CONCURRENCY,
+        LLM_TIMEOUT_SECONDS,
+        QUERY_LOG_PATH,
+        QUERY_LOG_MAX_ENTRIES,
+        QUERY_LOG_FLUSH_EVERY,
+    )
+    logger.info("Successfully imported resilience helpers")
+except Exception as e:
+    logger.error(f"Failed to import resilience helpers: {e}", exc_info=True)
     raise
 
 load_dotenv()
@@ -49,20 +99,54 @@ class RAG:
     1. Retrieves relevant documents from Pinecone based on user query
     2. Augments the prompt with retrieved context
     3. Uses an LLM model to generate answers based on the augmented context
+    
+    Queries that carry a session ID are answered with the session's
+    conversation history, and follow-ups are condensed into standalone
+    queries before retrieval.
+    
+    Concurrent stateless queries with the same normalized text and options
+    are coalesced: only the first one runs retrieval and generation, and the
+    others receive its answer.
+    
+    Each query has a total time budget that retrieval and generation draw
+    their deadlines from. If retrieval fails or times out, the question is
+    answered without context; if the LLM fails, times out or its circuit is
+    open, the last good answer to the same query is served when there is one.
     """
     
-    def __init__(self, k: int = 5):
+    def __init__(self, k: int = 5, query_log_path: Optional[str] = QUERY_LOG_PATH):
         """
         Initialize the RAG system.
         
         Args:
             k: Number of relevant documents to retrieve from Pinecone (default: 5)
+            query_log_path: File recording popular stateless queries for startup
+                warmup, or None to not record them (default: QUERY_LOG_PATH)
         """
         logger.info(f"Initializing RAG with k={k}")
         self.k = k
         self.llm = None
+        self.memory = None
+        self.singleflight = SingleFlight("rag_query")
+        self.llm_breaker = CircuitBreaker(
+            "llm",
+            failure_threshold=BREAKER_FAILURE_THRESHOLD,
+            reset_timeout_seconds=BREAKER_RESET_SECONDS,
+        )
+        self.llm_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm")
+        self.answer_cache = SearchCache(ttl_seconds=ANSWER_CACHE_TTL_SECONDS, max_entries=ANSWER_CACHE_MAX_ENTRIES)
+        self.query_log = (
+            QueryLog(query_log_path, max_entries=QUERY_LOG_MAX_ENTRIES, flush_every=QUERY_LOG_FLUSH_EVERY)
+            if query_log_path else None
+        )
         try:
             self._initialize_model()
+            self.memory = ConversationMemory(
+                self.llm,
+                max_history_tokens=MEMORY_MAX_HISTORY_TOKENS,
+                max_sessions=MEMORY_MAX_SESSIONS,
+                session_ttl_seconds=MEMORY_SESSION_TTL_SECONDS,
+            )
             logger.info("RAG initialization completed successfully")
         except Exception as e:
             logger.error(f"RAG initialization failed: {e}", exc_info=True)
@@ -72,14 +156,74 @@ class RAG:
         """Initialize the LLM model."""
         logger.info("Starting model initialization...")
         try:
-            logger.info("Calling create_ollama_model()...")
-            self.llm = create_ollama_model()
+            logger.info("Calling get_ollama_model()...")
+            self.llm = get_ollama_model()
             logger.info(f"Model created successfully. Model type: {type(self.llm)}")
         except Exception as e:
             logger.error(f"Model initialization failed: {e}", exc_info=True)
             raise
     
-    def query(self, user_query: str, use_rag: bool = True) -> str:
+    def _invoke_llm(self, name: str, prompt, deadline: Deadline, share: float = 1.0, usages: Optional[list] = None):
+        """
+        Call the LLM through its circuit breaker, within a share of the request deadline.
+        
+        Args:
+            name: Call name used in metric names, e.g. "llm.invoke"
+            prompt: Messages or prompt text
+            deadline: The request's time budget
+            share: Fraction of the remaining budget the call may use (default: all of it)
+            usages: If given, the call's Ollama usage is appended to it
+            
+        Returns:
+            The model response
+        """
+        response = self.llm_breaker.call(
+            call_with_timeout,
+            name,
+            lambda: self.llm.invoke(prompt),
+            timeout_seconds=deadline.stage(name, share, LLM_TIMEOUT_SECONDS),
+            executor=self.llm_executor,
+            limit_seconds=LLM_TIMEOUT_SECONDS,
+        )
+        if usages is not None:
+            usages.append(ollama_usage(response))
+        return response
+    
+    def _query_options(self, options: dict) -> dict:
+        """Fill in defaults for the retrieval options of :meth:`query`, so equivalent calls share a key."""
+        return dict(
+            k=self.k if options.get("k") is None else options["k"],
+            min_score=options.get("min_score"),
+            min_k=options.get("min_k"),
+            max_k=options.get("max_k"),
+            namespaces=options.get("namespaces"),
+            metadata_filter=options.get("metadata_filter"),
+        )
+    
+    def _query_key(self, user_query: str, use_rag: bool, options: dict) -> tuple:
+        """Key identifying equivalent queries for coalescing."""
+        return (
+            normalize_query(user_query),
+            use_rag,
+            tuple(sorted(
+                (name, json.dumps(value, sort_keys=True) if isinstance(value, (list, dict)) else value)
+                for name, value in options.items()
+            )),
+        )
+    
+    def query(
+        self,
+        user_query: str,
+        use_rag: bool = True,
+        session_id: Optional[str] = None,
+        k: Optional[int] = None,
+        min_score: Optional[float] = None,
+        min_k: Optional[int] = None,
+        max_k: Optional[int] = None,
+        namespaces: Optional[list[str]] = None,
+        metadata_filter: Optional[dict] = None,
+        timeout_seconds: Optional[float] = None,
+    ) -> str:
         """
         Query the RAG system with a user question.
         
@@ -87,45 +231,241 @@ class RAG:
             user_query: The user's question/query
             use_rag: If True, retrieve context from Pinecone and augment the prompt.
                     If False, use the model without RAG augmentation (default: True)
+            session_id: Optional conversation session ID. When set, prior turns of
+                    the session are included and this exchange is recorded (default: None)
+            k: Number of documents to retrieve (default: self.k)
+            min_score: Minimum similarity score for retrieved documents (default: from settings)
+            min_k: Minimum documents kept when cutting at a score gap (default: from settings)
+            max_k: Maximum documents to use as context (default: k)
+            namespaces: Pinecone namespaces to search (default: PINECONE_NAMESPACE)
+            metadata_filter: Pinecone-style metadata filter, e.g. {"file_name": "report.pdf"} (default: None)
+            timeout_seconds: Total time budget for the query (default: REQUEST_TIMEOUT_SECONDS)
+        
+        Returns:
+            str: The answer to the user's question
+            
+        Raises:
+            DeadlineExceededError: If the budget runs out and no cached answer exists
+            CircuitOpenError: If the LLM circuit is open and no cached answer exists
+        """
+        return self.query_detailed(
+            user_query,
+            use_rag,
+            session_id,
+            timeout_seconds=timeout_seconds,
+            k=k,
+            min_score=min_score,
+            min_k=min_k,
+            max_k=max_k,
+            namespaces=namespaces,
+            metadata_filter=metadata_filter,
+        )["answer"]
+    
+    def query_detailed(
+        self,
+        user_query: str,
+        use_rag: bool = True,
+        session_id: Optional[str] = None,
+        timeout_seconds: Optional[float] = None,
+        **options,
+    ) -> dict:
+        """
+        Like :meth:`query`, but also return what the query cost.
+        
+        Returns:
+            dict: 'answer' and 'debug'. The debug dict holds the LLM usage
+                reported by Ollama ('llm': prompt and completion tokens, prefill
+                and decode tokens/sec), 'context_tokens' contributed by
+                retrieval, the number of 'documents' used and whether the
+                answer was 'cached'.
+        """
+        if self._record_query(user_query, use_rag, session_id):
+            self.query_log.flush()
+        return self._query_detailed(user_query, use_rag, session_id, timeout_seconds, **options)
+    
+    def _record_query(self, user_query: str, use_rag: bool, session_id: Optional[str]) -> bool:
+        """Log a query for startup warmup; returns True when the log should be flushed."""
+        # Follow-ups only make sense within their session, so only stateless RAG queries are worth replaying
+        if self.query_log is None or not use_rag or session_id:
+            return False
+        return self.query_log.record(user_query)
+    
+    def _query_detailed(
+        self,
+        user_query: str,
+        use_rag: bool,
+        session_id: Optional[str],
+        timeout_seconds: Optional[float],
+        **options,
+    ) -> dict:
+        deadline = Deadline(REQUEST_TIMEOUT_SECONDS if timeout_seconds is None else timeout_seconds)
+        options = self._query_options(options)
+        if session_id:
+            # Answers depend on the session history, so they are never shared or cached
+            return self._run_query(user_query, use_rag, session_id, deadline=deadline, **options)
+        key = self._query_key(user_query, use_rag, options)
+        return self.singleflight.do(
+            key,
+            lambda: self._run_query_with_fallback(key, user_query, use_rag, deadline, options),
+        )
+    
+    def _run_query_with_fallback(self, key: tuple, user_query: str, use_rag: bool, deadline: Deadline, options: dict) -> dict:
+        """Run a stateless query, falling back to the last good answer for ``key`` if it fails."""
+        cache_key = json.dumps(key)
+        try:
+            result = self._run_query(user_query, use_rag, None, deadline=deadline, **options)
+        except Exception as e:
+            cached = self.answer_cache.get(cache_key)
+            if cached is None:
+                raise
+            logger.warning(f"Query failed ({e}); serving cached answer")
+            metrics.inc("fallback.cached_answer")
+            return {"answer": cached, "debug": {"llm": None, "context_tokens": 0, "documents": 0, "cached": True}}
+        self.answer_cache.set(cache_key, result["answer"])
+        return result
+    
+    async def aquery(
+        self,
+        user_query: str,
+        use_rag: bool = True,
+        session_id: Optional[str] = None,
+        k: Optional[int] = None,
+        min_score: Optional[float] = None,
+        min_k: Optional[int] = None,
+        max_k: Optional[int] = None,
+        namespaces: Optional[list[str]] = None,
+        metadata_filter: Optional[dict] = None,
+        timeout_seconds: Optional[float] = None,
+    ) -> str:
+        """
+        Async version of :meth:`query`.
+        
+        The work runs in a worker thread so the event loop is never blocked.
+        Identical queries are coalesced across coroutines before a thread is
+        used, and the thread then goes through the same coalescing as
+        :meth:`query`, so sync and async callers share in-flight work.
         
         Returns:
             str: The answer to the user's question
         """
-        logger.info(f"Query called: query='{user_query}', use_rag={use_rag}, k={self.k}")
+        result = await self.aquery_detailed(
+            user_query,
+            use_rag,
+            session_id,
+            timeout_seconds=timeout_seconds,
+            k=k,
+            min_score=min_score,
+            min_k=min_k,
+            max_k=max_k,
+            namespaces=namespaces,
+            metadata_filter=metadata_filter,
+        )
+        return result["answer"]
+    
+    async def aquery_detailed(
+        self,
+        user_query: str,
+        use_rag: bool = True,
+        session_id: Optional[str] = None,
+        timeout_seconds: Optional[float] = None,
+        **options,
+    ) -> dict:
+        """Async version of :meth:`query_detailed` (see :meth:`aquery`)."""
+        if self._record_query(user_query, use_rag, session_id):
+            await asyncio.to_thread(self.query_log.flush)
+        run = lambda: asyncio.to_thread(self._query_detailed, user_query, use_rag, session_id, timeout_seconds, **options)
+        if session_id:
+            return await run()
+        key = self._query_key(user_query, use_rag, self._query_options(options))
+        return await self.singleflight.ado(key, run)
+    
+    def _run_query(
+        self,
+        user_query: str,
+        use_rag: bool,
+        session_id: Optional[str],
+        k: int,
+        min_score: Optional[float] = None,
+        min_k: Optional[int] = None,
+        max_k: Optional[int] = None,
+        namespaces: Optional[list[str]] = None,
+        metadata_filter: Optional[dict] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> dict:
+        """Run retrieval and generation for a query (see :meth:`query` and :meth:`query_detailed`)."""
+        if deadline is None:
+            deadline = Deadline(REQUEST_TIMEOUT_SECONDS)
+        logger.info(f"Query called: query='{user_query}', use_rag={use_rag}, k={k}, session_id={session_id}")
         
         if not self.llm:
             logger.error("Model not initialized")
             raise RuntimeError("Model not initialized. Call _initialize_model() first.")
         
         try:
+            history = []
+            documents = []
+            # Usage of every LLM call this request makes, including condensing and summarizing
+            usages = []
+            retrieval_query = user_query
+            if session_id:
+                history = self.memory.get_history_messages(session_id)
+                logger.info(f"Loaded {len(history)} history messages for session {session_id}")
+                if use_rag:
+                    retrieval_query = self.memory.condense_query(
+                        session_id,
+                        user_query,
+                        invoke=lambda prompt: self._invoke_llm("llm.condense", prompt, deadline, MEMORY_CONDENSE_BUDGET_SHARE, usages),
+                    )
+            
             if use_rag:
                 logger.info("Using RAG mode - retrieving context from Pinecone...")
                 # Get augmented prompt with context from Pinecone
-                logger.info(f"Calling get_augmented_prompt_template with k={self.k}...")
-                augmented_prompt = get_augmented_prompt_template(user_query, k=self.k)
-                logger.info(f"Augmented prompt retrieved. System prompt length: {len(augmented_prompt.get('system', ''))}")
+                logger.info(f"Calling get_augmented_prompt_template with k={k}...")
+                try:
+                    augmented_prompt = get_augmented_prompt_template(
+                        retrieval_query,
+                        k=k,
+                        min_score=min_score,
+                        min_k=min_k,
+                        max_k=max_k,
+                        namespaces=namespaces,
+                        metadata_filter=metadata_filter,
+                        timeout_seconds=deadline.stage("retrieval", RETRIEVAL_BUDGET_SHARE, RETRIEVAL_TIMEOUT_SECONDS),
+                    )
+                except Exception as e:
+                    # A slow or failing vector store degrades the answer instead of failing the request
+                    logger.error(f"Retrieval failed, answering without context: {e}")
+                    metrics.inc("fallback.llm_only")
+                    augmented_prompt = {"system": NO_CONTEXT_SYSTEM_PROMPT, "user": user_query, "documents": []}
+                documents = augmented_prompt.get("documents", [])
+                logger.info(
+                    f"Augmented prompt retrieved. Documents: {len(documents)}, "
+                    f"system prompt length: {len(augmented_prompt.get('system', ''))}"
+                )
                 
-                # Create prompt template with system and user messages
+                # Create prompt template with system, history and user messages
                 logger.info("Creating ChatPromptTemplate...")
                 prompt = ChatPromptTemplate.from_messages([
                     ("system", augmented_prompt["system"]),
-                    ("user", augmented_prompt["user"])
+                    MessagesPlaceholder("history"),
+                    ("user", user_query)
                 ])
             else:
                 logger.info("Using LLM-only mode (no RAG)...")
                 # Use model without RAG augmentation
                 prompt = ChatPromptTemplate.from_messages([
                     ("system", "You are a helpful assistant."),
+                    MessagesPlaceholder("history"),
                     ("user", user_query)
                 ])
             
             # Invoke model with prompt
             logger.info("Formatting messages...")
-            messages = prompt.format_messages()
+            messages = prompt.format_messages(history=history)
             logger.info(f"Messages formatted. Number of messages: {len(messages)}")
             
             logger.info("Invoking LLM...")
-            response = self.llm.invoke(messages)
+            response = self._invoke_llm("llm.invoke", messages, deadline, usages=usages)
             logger.info(f"LLM response received. Response type: {type(response)}")
             
             # Extract content from response
@@ -140,8 +480,29 @@ class RAG:
                 answer = str(response)
                 logger.info(f"Converted response to string. Length: {len(answer)}")
             
+            if session_id:
+                # Summarizing evicted turns gets whatever budget the answer left
+                self.memory.add_exchange(
+                    session_id,
+                    user_query,
+                    answer,
+                    invoke=lambda prompt: self._invoke_llm("llm.summarize", prompt, deadline, usages=usages),
+                )
+            
+            context_tokens = sum(
+                estimate_tokens((doc.get("metadata") or {}).get("page_content", "")) for doc in documents
+            )
+            metrics.observe("rag.context_tokens", context_tokens)
+            debug = {
+                "llm": record_usage("rag", combine_usage(usages)),
+                "context_tokens": context_tokens,
+                "documents": len(documents),
+                "compacted_documents": sum(bool((doc.get("metadata") or {}).get("compacted")) for doc in documents),
+                "cached": False,
+            }
+            
             logger.info("Query completed successfully")
-            return answer
+            return {"answer": answer, "debug": debug}
             
         except Exception as e:
             logger.error(f"Error in query method: {e}", exc_info=True)
@@ -0,0 +1,7 @@
+"""Conversation memory module for RAG."""
+
+from .conversation import ConversationMemory
+
+__all__ = [
+    "ConversationMemory",
+]
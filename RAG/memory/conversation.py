@@ -0,0 +1,218 @@
+"""
+Session-scoped conversation memory for RAG.
+Keeps recent turns verbatim within a token budget and folds older turns into a rolling summary.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from RAG.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a user and an assistant.
+
+Current summary:
+{summary}
+
+New turns to fold into the summary:
+{turns}
+
+Write the updated summary in a few sentences. Keep names, facts and open questions the user may refer back to. Return only the summary."""
+
+CONDENSE_PROMPT = """Given the conversation so far and a follow-up question, rewrite the follow-up as a standalone question that can be understood without the conversation.
+
+Conversation summary:
+{summary}
+
+Recent turns:
+{turns}
+
+Follow-up question: {query}
+
+Return only the standalone question."""
+
+
+@dataclass
+class Turn:
+    """A single message in a conversation."""
+    role: str
+    content: str
+    tokens: int
+
+
+@dataclass
+class Session:
+    """State for one conversation session."""
+    turns: list[Turn] = field(default_factory=list)
+    summary: str = ""
+    last_used: float = field(default_factory=time.time)
+    condensed: dict[str, str] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    @property
+    def history_tokens(self) -> int:
+        return sum(turn.tokens for turn in self.turns)
+
+
+class ConversationMemory:
+    """
+    Token-bounded conversation memory keyed by session ID.
+    
+    Recent turns are kept verbatim while they fit in ``max_history_tokens``.
+    Older turns are folded into a rolling summary with one LLM call at the
+    time they are evicted; the summary is then cached on the session and
+    reused for every later turn, so prompt size stays roughly constant.
+    
+    Methods that call the LLM accept an ``invoke`` callable (prompt ->
+    response) so the caller can run those calls under its own deadline and
+    circuit breaker; by default ``llm.invoke`` is called directly.
+    """
+    
+    def __init__(self, llm, max_history_tokens: int = 1024, max_sessions: int = 1000, session_ttl_seconds: float = 3600):
+        """
+        Initialize the conversation memory.
+        
+        Args:
+            llm: Chat model used for summaries and query condensation
+            max_history_tokens: Token budget for verbatim history (default: 1024)
+            max_sessions: Maximum number of sessions kept in memory (default: 1000)
+            session_ttl_seconds: Idle time after which a session is dropped (default: 3600)
+        """
+        self.llm = llm
+        self.max_history_tokens = max_history_tokens
+        self.max_sessions = max_sessions
+        self.session_ttl_seconds = session_ttl_seconds
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _get_session(self, session_id: str) -> Session:
+        """Get or create a session, evicting idle and least recently used sessions."""
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and now - session.last_used > self.session_ttl_seconds:
+                logger.info(f"Session {session_id} expired")
+                session = None
+            if session is None:
+                session = Session()
+                self._sessions[session_id] = session
+            session.last_used = now
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return session
+    
+    def has_history(self, session_id: str) -> bool:
+        """Return True if the session has any prior turns or summary."""
+        session = self._get_session(session_id)
+        return bool(session.turns or session.summary)
+    
+    def get_history_messages(self, session_id: str) -> list[BaseMessage]:
+        """
+        Get the session history as chat messages.
+        
+        Args:
+            session_id: The conversation session ID
+            
+        Returns:
+            list[BaseMessage]: Summary (as a system message, if any) followed by recent turns
+        """
+        session = self._get_session(session_id)
+        with session.lock:
+            messages: list[BaseMessage] = []
+            if session.summary:
+                messages.append(SystemMessage(content=f"Summary of the earlier conversation:\n{session.summary}"))
+            for turn in session.turns:
+                message_cls = HumanMessage if turn.role == "user" else AIMessage
+                messages.append(message_cls(content=turn.content))
+            return messages
+    
+    def add_exchange(self, session_id: str, user_query: str, answer: str, invoke: Optional[Callable[[str], Any]] = None) -> None:
+        """
+        Record a user question and the assistant's answer.
+        
+        Args:
+            session_id: The conversation session ID
+            user_query: The user's question
+            answer: The assistant's answer
+            invoke: Makes the summary LLM call, if one is needed (default: ``llm.invoke``)
+        """
+        session = self._get_session(session_id)
+        with session.lock:
+            session.turns.append(Turn("user", user_query, estimate_tokens(user_query)))
+            session.turns.append(Turn("assistant", answer, estimate_tokens(answer)))
+            session.condensed.clear()
+            self._compact(session, invoke or self.llm.invoke)
+    
+    def _compact(self, session: Session, invoke: Callable[[str], Any]) -> None:
+        """Fold the oldest turns into the summary until history fits the token budget."""
+        folded = []
+        # Keep at least the latest exchange verbatim
+        while session.history_tokens > self.max_history_tokens and len(session.turns) > 2:
+            folded.append(session.turns.pop(0))
+        if not folded:
+            return
+        logger.info(f"Folding {len(folded)} turns into conversation summary")
+        session.summary = self._summarize(session.summary, folded, invoke)
+    
+    def _summarize(self, summary: str, turns: list[Turn], invoke: Callable[[str], Any]) -> str:
+        """Produce an updated rolling summary with a single LLM call."""
+        prompt = SUMMARY_PROMPT.format(
+            summary=summary or "(none)",
+            turns=self._format_turns(turns),
+        )
+        try:
+            response = invoke(prompt)
+            return getattr(response, "content", str(response)).strip()
+        except Exception as e:
+            # Keep the conversation going with a truncated transcript rather than failing the request
+            logger.error(f"Failed to summarize conversation: {e}", exc_info=True)
+            return (summary + "\n" + self._format_turns(turns)).strip()[-4 * self.max_history_tokens:]
+    
+    def condense_query(self, session_id: str, user_query: str, invoke: Optional[Callable[[str], Any]] = None) -> str:
+        """
+        Rewrite a follow-up question into a standalone query for retrieval.
+        
+        The first question in a session is returned unchanged. Condensed
+        queries are cached until the session history changes.
+        
+        Args:
+            session_id: The conversation session ID
+            user_query: The user's follow-up question
+            invoke: Makes the condensing LLM call (default: ``llm.invoke``)
+            
+        Returns:
+            str: A standalone query suitable for retrieval
+        """
+        session = self._get_session(session_id)
+        with session.lock:
+            if not session.turns and not session.summary:
+                return user_query
+            cached = session.condensed.get(user_query)
+            if cached is not None:
+                return cached
+            prompt = CONDENSE_PROMPT.format(
+                summary=session.summary or "(none)",
+                turns=self._format_turns(session.turns),
+                query=user_query,
+            )
+        try:
+            response = (invoke or self.llm.invoke)(prompt)
+            condensed = getattr(response, "content", str(response)).strip() or user_query
+        except Exception as e:
+            logger.error(f"Failed to condense follow-up query: {e}", exc_info=True)
+            return user_query
+        logger.info(f"Condensed follow-up query: '{user_query}' -> '{condensed}'")
+        with session.lock:
+            session.condensed[user_query] = condensed
+        return condensed
+    
+    @staticmethod
+    def _format_turns(turns: list[Turn]) -> str:
+        return "\n".join(f"{turn.role}: {turn.content}" for turn in turns)
@@ -0,0 +1,345 @@
+"""
+Deadlines, hedged calls and circuit breakers for calls to external dependencies.
+A request gets one total time budget; each stage takes its share and fails fast once the budget is spent.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Optional
+
+from metrics import metrics
+
+try:
+    from urllib3.exceptions import HTTPError as TransportError
+except ImportError:  # pragma: no cover - optional dependency
+    TransportError = OSError
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when a call or stage runs out of its time budget."""
+
+
+class BudgetExceededError(DeadlineExceededError):
+    """
+    Raised when a call times out only because the caller's budget left it
+    less than the dependency's own time limit.
+
+    It says nothing about the dependency's health, so circuit breakers do
+    not count it; otherwise one client sending tiny budgets could open a
+    shared circuit for everyone.
+    """
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a call is rejected because the dependency's circuit is open."""
+
+
+def is_dependency_failure(error: Exception) -> bool:
+    """
+    Decide whether an error means the dependency itself is unhealthy.
+
+    Timeouts, connection and transport errors and 5xx responses are; client
+    errors (4xx), errors in the request itself (a malformed filter, a
+    dimension mismatch, a ValueError) and timeouts cut short by the caller's
+    budget (:class:`BudgetExceededError`) are not.
+    """
+    if isinstance(error, BudgetExceededError):
+        return False
+    status = getattr(error, "status", None) or getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status >= 500
+    return isinstance(error, (TimeoutError, OSError, TransportError))
+
+
+class Deadline:
+    """
+    Total time budget for one request, split into per-stage timeouts.
+    """
+
+    def __init__(self, total_seconds: float):
+        """
+        Args:
+            total_seconds: Time budget for the whole request
+        """
+        self.total_seconds = total_seconds
+        self.expires_at = time.monotonic() + total_seconds
+
+    def remaining(self) -> float:
+        """Seconds left in the budget (never negative)."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def stage(self, name: str, share: float = 1.0, max_seconds: Optional[float] = None) -> float:
+        """
+        Timeout for the next stage of the request.
+
+        Args:
+            name: Stage name used in metric names
+            share: Fraction of the remaining budget the stage may use (default: all of it)
+            max_seconds: Upper bound on the stage timeout (default: none)
+
+        Returns:
+            float: Stage timeout in seconds
+
+        Raises:
+            DeadlineExceededError: If the budget is already spent
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            metrics.inc(f"deadline.{name}.exceeded")
+            raise DeadlineExceededError(f"Request deadline of {self.total_seconds}s exceeded before {name}")
+        timeout = remaining * share
+        return timeout if max_seconds is None else min(timeout, max_seconds)
+
+
+class CircuitBreaker:
+    """
+    Fail fast while a dependency is unhealthy.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls are rejected with ``CircuitOpenError``. Once ``reset_timeout_seconds``
+    have passed, one trial call is let through (half-open): success closes
+    the circuit and failure opens it again. State changes, failures and
+    rejections are reported under ``breaker.<name>.*``; the state gauge is
+    0 (closed), 1 (half-open) or 2 (open).
+
+    With ``is_failure`` (e.g. :func:`is_dependency_failure`) only matching
+    errors count as failures; other errors are raised without affecting the
+    circuit. :class:`BudgetExceededError` is never counted.
+    """
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout_seconds: float = 30.0,
+        is_failure: Optional[Callable[[Exception], bool]] = None,
+    ):
+        """
+        Args:
+            name: Dependency name used in logs and metric names
+            failure_threshold: Consecutive failures that open the circuit (default: 5)
+            reset_timeout_seconds: Time the circuit stays open before a trial call (default: 30)
+            is_failure: Predicate selecting the errors that count as failures (default: every error)
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.is_failure = is_failure
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        metrics.set_gauge(f"breaker.{name}.state", self._STATE_VALUES[self.CLOSED])
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def _set_state(self, state: str) -> None:
+        if state == self._state:
+            return
+        logger.warning(f"Circuit {self.name}: {self._state} -> {state}")
+        self._state = state
+        metrics.set_gauge(f"breaker.{self.name}.state", self._STATE_VALUES[state])
+        if state == self.OPEN:
+            self._opened_at = time.monotonic()
+            metrics.inc(f"breaker.{self.name}.opened")
+
+    def allow(self) -> bool:
+        """Return True if a call may proceed now."""
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout_seconds:
+                self._set_state(self.HALF_OPEN)
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            self._set_state(self.CLOSED)
+
+    def record_ignored(self) -> None:
+        """Release a half-open trial whose outcome says nothing about the dependency."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        metrics.inc(f"breaker.{self.name}.failures")
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._set_state(self.OPEN)
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Call ``fn`` through the breaker.
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        if not self.allow():
+            metrics.inc(f"breaker.{self.name}.rejected")
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if isinstance(e, BudgetExceededError):
+                self.record_ignored()
+            elif self.is_failure is None or self.is_failure(e):
+                self.record_failure()
+            else:
+                # The dependency answered; the request itself was bad
+                self.record_success()
+            raise
+        self.record_success()
+        return result
+
+
+def hedge_delay(name: str, percentile: float, default_seconds: float, min_seconds: float, min_samples: int) -> float:
+    """
+    Delay before hedging a call, taken from its observed latency.
+
+    Args:
+        name: Call name (latencies are recorded as ``<name>.seconds``)
+        percentile: Latency percentile to wait for, e.g. 95
+        default_seconds: Delay used until ``min_samples`` latencies are recorded
+        min_seconds: Lower bound on the delay
+        min_samples: Observations needed before the percentile is trusted
+
+    Returns:
+        float: Hedge delay in seconds
+    """
+    observed = metrics.percentile(f"{name}.seconds", percentile, min_count=min_samples)
+    if observed is None:
+        return default_seconds
+    return max(min_seconds, observed)
+
+
+def _timeout_error(name: str, timeout_seconds: float, limit_seconds: Optional[float]) -> DeadlineExceededError:
+    """The error for a call that ran out of time: BudgetExceededError if the caller's budget clipped its limit."""
+    if limit_seconds is not None and timeout_seconds < limit_seconds:
+        return BudgetExceededError(
+            f"{name} did not complete within the {timeout_seconds:.2f}s left in the request budget "
+            f"(limit {limit_seconds:.2f}s)"
+        )
+    return DeadlineExceededError(f"{name} did not complete within {timeout_seconds:.2f}s")
+
+
+def hedged_call(
+    name: str,
+    fn: Callable[[], Any],
+    timeout_seconds: float,
+    hedge_delay_seconds: float,
+    executor: ThreadPoolExecutor,
+    limit_seconds: Optional[float] = None,
+) -> Any:
+    """
+    Call ``fn`` with a deadline, firing a duplicate call if it is slow.
+
+    If the first call has not returned after ``hedge_delay_seconds`` (or
+    fails before that), a second identical call is started and the first
+    successful result wins. Both calls share the deadline; calls still
+    running when it passes are abandoned. ``fn`` must be idempotent.
+
+    Latencies of successful calls are recorded as ``<name>.seconds`` and
+    hedges, retries, wins and timeouts are counted under ``hedge.<name>.*``.
+
+    Args:
+        name: Call name used in metric names
+        fn: Idempotent call to make
+        timeout_seconds: Deadline for the call, including the hedge
+        hedge_delay_seconds: Time to wait before firing the duplicate
+        executor: Pool the calls run on
+        limit_seconds: The dependency's own time limit, if ``timeout_seconds``
+            may be clipped by a request budget (default: none)
+
+    Returns:
+        Any: The first successful result
+
+    Raises:
+        BudgetExceededError: If the deadline passes and it was shorter than ``limit_seconds``
+        DeadlineExceededError: If no call succeeds before the deadline
+        Exception: The last error, if both calls fail
+    """
+    start = time.monotonic()
+    deadline = start + timeout_seconds
+    pending = {executor.submit(fn)}
+    backup = None
+    error = None
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        if backup is None:
+            remaining = min(remaining, max(0.0, start + hedge_delay_seconds - time.monotonic()))
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                metrics.observe(f"{name}.seconds", time.monotonic() - start)
+                if future is backup:
+                    metrics.inc(f"hedge.{name}.won")
+                for other in pending:
+                    other.cancel()
+                return future.result()
+            error = future.exception()
+            logger.warning(f"{name} call failed: {error}")
+
+        if backup is None and (error is not None or time.monotonic() >= start + hedge_delay_seconds):
+            metrics.inc(f"hedge.{name}.retried" if error is not None else f"hedge.{name}.fired")
+            backup = executor.submit(fn)
+            pending.add(backup)
+
+    if not pending and error is not None:
+        raise error
+    for future in pending:
+        future.cancel()
+    metrics.inc(f"hedge.{name}.timeouts")
+    raise _timeout_error(name, timeout_seconds, limit_seconds)
+
+
+def call_with_timeout(
+    name: str,
+    fn: Callable[[], Any],
+    timeout_seconds: float,
+    executor: ThreadPoolExecutor,
+    limit_seconds: Optional[float] = None,
+) -> Any:
+    """
+    Call ``fn`` on ``executor`` and stop waiting for it after ``timeout_seconds``.
+
+    Latencies of completed calls are recorded as ``<name>.seconds``. Pass the
+    dependency's own time limit as ``limit_seconds`` when ``timeout_seconds``
+    comes from a request budget, so a timeout the budget caused is reported
+    as :class:`BudgetExceededError`.
+
+    Raises:
+        BudgetExceededError: If the call does not finish in a timeout shorter than ``limit_seconds``
+        DeadlineExceededError: If the call does not finish in time
+    """
+    start = time.monotonic()
+    future = executor.submit(fn)
+    done, _ = wait([future], timeout=timeout_seconds)
+    if not done:
+        future.cancel()
+        metrics.inc(f"deadline.{name}.exceeded")
+        raise _timeout_error(name, timeout_seconds, limit_seconds)
+    result = future.result()
+    metrics.observe(f"{name}.seconds", time.monotonic() - start)
+    return result
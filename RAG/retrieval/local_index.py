@@ -0,0 +1,298 @@
+"""
+In-process vector index with a Pinecone-compatible query interface.
+Used for tests, offline runs and local serving from stored embedding artifacts.
+"""
+
+import logging
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_RANGE_OPERATORS = ("$gt", "$gte", "$lt", "$lte")
+_NUMPY_RANGE = {"$gt": np.greater, "$gte": np.greater_equal, "$lt": np.less, "$lte": np.less_equal}
+
+_COMPARISONS = {
+    "$eq": lambda value, target: value == target,
+    "$ne": lambda value, target: value != target,
+    "$gt": lambda value, target: value is not None and value > target,
+    "$gte": lambda value, target: value is not None and value >= target,
+    "$lt": lambda value, target: value is not None and value < target,
+    "$lte": lambda value, target: value is not None and value <= target,
+    "$in": lambda value, target: value in target,
+    "$nin": lambda value, target: value not in target,
+}
+
+
+def matches_filter(metadata: dict, metadata_filter: Optional[dict]) -> bool:
+    """
+    Evaluate a Pinecone-style metadata filter against one metadata dict.
+    
+    Supports ``$eq``, ``$ne``, ``$gt``, ``$gte``, ``$lt``, ``$lte``, ``$in``,
+    ``$nin``, ``$exists``, ``$and`` and ``$or``; a bare value means ``$eq``.
+    
+    Args:
+        metadata: Metadata of a vector
+        metadata_filter: Filter, e.g. ``{"file_name": "a.pdf", "page": {"$gte": 3}}``
+        
+    Returns:
+        bool: True if the metadata satisfies the filter
+    """
+    if not metadata_filter:
+        return True
+    for field, condition in metadata_filter.items():
+        if field == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+        if field == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+        value = metadata.get(field)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, target in condition.items():
+            if operator == "$exists":
+                if (field in metadata) != bool(target):
+                    return False
+            elif operator in _COMPARISONS:
+                try:
+                    if not _COMPARISONS[operator](value, target):
+                        return False
+                except TypeError:
+                    return False
+            else:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+    return True
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class _Column:
+    """
+    Columnar view of one metadata field across a namespace's rows.
+    
+    Equality and membership tests are answered from a value -> rows map and
+    range tests from a float array, so a filter becomes a boolean row mask
+    without looking at each row's metadata dict.
+    """
+    
+    def __init__(self, field: str, metadatas: list[dict]):
+        self.values = [metadata.get(field) for metadata in metadatas]
+        self.present = np.fromiter((field in metadata for metadata in metadatas), dtype=bool, count=len(metadatas))
+        self.numbers = np.array([value if _is_number(value) else np.nan for value in self.values], dtype=np.float64)
+        self.postings: Optional[dict] = {}
+        try:
+            rows_by_value: dict = {}
+            for row, value in enumerate(self.values):
+                rows_by_value.setdefault(value, []).append(row)
+        except TypeError:
+            # Unhashable values (e.g. lists): fall back to comparing each row
+            self.postings = None
+        else:
+            self.postings = {value: np.array(rows, dtype=np.int64) for value, rows in rows_by_value.items()}
+    
+    def _rows_equal(self, targets) -> np.ndarray:
+        mask = np.zeros(len(self.values), dtype=bool)
+        for target in targets:
+            rows = self.postings.get(target)
+            if rows is not None:
+                mask[rows] = True
+        return mask
+    
+    def _scan(self, operator: str, target) -> np.ndarray:
+        compare = _COMPARISONS[operator]
+        
+        def test(value) -> bool:
+            try:
+                return bool(compare(value, target))
+            except TypeError:
+                return False
+        return np.fromiter((test(value) for value in self.values), dtype=bool, count=len(self.values))
+    
+    def mask(self, operator: str, target) -> np.ndarray:
+        """Rows satisfying one operator (same semantics as :func:`matches_filter`)."""
+        if operator == "$exists":
+            return self.present if target else ~self.present
+        if operator not in _COMPARISONS:
+            raise ValueError(f"Unsupported filter operator: {operator}")
+        if operator in _RANGE_OPERATORS and _is_number(target):
+            with np.errstate(invalid="ignore"):
+                return _NUMPY_RANGE[operator](self.numbers, target)
+        if self.postings is not None:
+            try:
+                if operator in ("$eq", "$ne"):
+                    equal = self._rows_equal([target])
+                    return equal if operator == "$eq" else ~equal
+                if operator in ("$in", "$nin") and isinstance(target, (list, tuple, set, frozenset)):
+                    member = self._rows_equal(target)
+                    return member if operator == "$in" else ~member
+            except TypeError:
+                pass
+        return self._scan(operator, target)
+
+
+def filter_mask(ns: dict, metadata_filter: dict) -> np.ndarray:
+    """
+    Evaluate a metadata filter over a namespace as a boolean row mask.
+    
+    Columns are built per field on first use and cached until the namespace
+    changes; see :func:`matches_filter` for the supported operators.
+    """
+    mask = np.ones(len(ns["ids"]), dtype=bool)
+    for field, condition in metadata_filter.items():
+        if field == "$and":
+            for sub in condition:
+                mask &= filter_mask(ns, sub)
+            continue
+        if field == "$or":
+            any_mask = np.zeros(len(ns["ids"]), dtype=bool)
+            for sub in condition:
+                any_mask |= filter_mask(ns, sub)
+            mask &= any_mask
+            continue
+        column = ns["columns"].get(field)
+        if column is None:
+            column = ns["columns"][field] = _Column(field, ns["metadata"])
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, target in condition.items():
+            mask &= column.mask(operator, target)
+    return mask
+
+
+class LocalVectorIndex:
+    """
+    Exact (brute-force) cosine similarity index held in memory.
+    
+    Vectors are stored per namespace as one float32 matrix, so a query is a
+    single matrix-vector product. ``upsert`` and ``query`` accept the same
+    arguments as a Pinecone index and return objects with the same shape.
+    """
+    
+    def __init__(self):
+        self._namespaces: dict[Optional[str], dict] = {}
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_artifacts(cls, directory: Path, namespace: Optional[str] = None, projection=None) -> "LocalVectorIndex":
+        """
+        Build an index from stored embedding artifacts, without running the model.
+        
+        Args:
+            directory: Artifact directory
+            namespace: Namespace to load the vectors into
+            projection: EmbeddingProjection to reduce the vectors with (default: None)
+            
+        Returns:
+            LocalVectorIndex: Index containing the current artifact of each source file
+        """
+        from RAG.ingestion.artifacts import iter_artifacts
+        
+        index = cls()
+        for artifact in iter_artifacts(directory, mmap=False):
+            metadatas = []
+            for text, metadata in zip(artifact.texts, artifact.metadatas):
+                metadata = dict(metadata)
+                metadata["page_content"] = text
+                metadatas.append(metadata)
+            vectors = artifact.vectors if projection is None else projection.apply(artifact.vectors)
+            index.add(artifact.ids, vectors, metadatas, namespace=namespace)
+        logger.info(f"Built local index from {directory}: {index.count(namespace)} vectors")
+        return index
+    
+    def add(self, ids: list[str], vectors: np.ndarray, metadatas: list[dict], namespace: Optional[str] = None) -> None:
+        """
+        Add vectors in bulk. Existing IDs are replaced.
+        
+        Args:
+            ids: Vector IDs
+            vectors: Matrix of shape (len(ids), dim); rows are normalized on insert
+            metadatas: Metadata per vector
+            namespace: Target namespace
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        with self._lock:
+            ns = self._namespaces.setdefault(
+                namespace, {"ids": [], "vectors": None, "metadata": [], "positions": {}, "columns": {}}
+            )
+            replaced = [ns["positions"][i] for i in ids if i in ns["positions"]]
+            if replaced:
+                keep = np.ones(len(ns["ids"]), dtype=bool)
+                keep[replaced] = False
+                ns["ids"] = [i for i, k in zip(ns["ids"], keep) if k]
+                ns["metadata"] = [m for m, k in zip(ns["metadata"], keep) if k]
+                ns["vectors"] = ns["vectors"][keep]
+            ns["ids"].extend(ids)
+            ns["metadata"].extend(metadatas)
+            ns["vectors"] = vectors if ns["vectors"] is None else np.vstack([ns["vectors"], vectors])
+            ns["positions"] = {vector_id: i for i, vector_id in enumerate(ns["ids"])}
+            # Filter columns are rebuilt lazily for the new rows
+            ns["columns"] = {}
+    
+    def upsert(self, vectors: list[dict], namespace: Optional[str] = None) -> None:
+        """Pinecone-compatible upsert of ``{"id", "values", "metadata"}`` records."""
+        if not vectors:
+            return
+        self.add(
+            [v["id"] for v in vectors],
+            np.array([v["values"] for v in vectors], dtype=np.float32),
+            [v.get("metadata", {}) for v in vectors],
+            namespace=namespace,
+        )
+    
+    def count(self, namespace: Optional[str] = None) -> int:
+        """Number of vectors in a namespace."""
+        ns = self._namespaces.get(namespace)
+        return len(ns["ids"]) if ns else 0
+    
+    def query(self, vector: list[float], top_k: int = 10, namespace: Optional[str] = None, include_metadata: bool = True, filter: Optional[dict] = None, **kwargs) -> SimpleNamespace:
+        """
+        Pinecone-compatible similarity query.
+        
+        With a filter, the matching rows are selected first from per-field
+        columns (see :func:`filter_mask`) and only those are scored, so
+        search cost scales with the filtered subset.
+        
+        Args:
+            vector: Query embedding
+            top_k: Number of matches to return
+            namespace: Namespace to search
+            include_metadata: Whether to include metadata in matches
+            filter: Pinecone-style metadata filter (see matches_filter)
+            
+        Returns:
+            SimpleNamespace: Object with a ``matches`` list of (id, score, metadata) matches
+        """
+        ns = self._namespaces.get(namespace)
+        if not ns or ns["vectors"] is None or top_k <= 0:
+            return SimpleNamespace(matches=[])
+        if filter:
+            with self._lock:
+                rows = np.flatnonzero(filter_mask(ns, filter))
+        else:
+            rows = np.arange(len(ns["ids"]))
+        if len(rows) == 0:
+            return SimpleNamespace(matches=[])
+        
+        vectors = ns["vectors"] if len(rows) == len(ns["ids"]) else ns["vectors"][rows]
+        scores = vectors @ np.asarray(vector, dtype=np.float32)
+        top_k = min(top_k, len(scores))
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        return SimpleNamespace(matches=[
+            SimpleNamespace(
+                id=ns["ids"][rows[i]],
+                score=float(scores[i]),
+                metadata=ns["metadata"][rows[i]] if include_metadata else {},
+            )
+            for i in top
+        ])
@@ -1,5 +1,13 @@
 import os
+import sys
+import heapq
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache
+from itertools import chain
+from pathlib import Path
+from typing import Optional
 from pinecone import Pinecone
 from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
@@ -7,74 +15,518 @@ from dotenv import load_dotenv
 # Configure logging
 logger = logging.getLogger(__name__)
 
-load_dotenv()
+# Add project root to path for imports
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+from RAG.tokens import estimate_tokens
+from RAG.resilience import CircuitBreaker, hedge_delay, hedged_call, is_dependency_failure
+from RAG.ingestion.reduction import ensure_projection, load_projection
+from RAG.ingestion.artifacts import MANIFEST_FILE, load_parents
+from metrics import metrics
+from tools.search_cache import normalize_query
+from config.settings import (
+    RETRIEVAL_ADAPTIVE,
+    RETRIEVAL_MIN_SCORE,
+    RETRIEVAL_MIN_SCORE_GAP,
+    RETRIEVAL_MIN_K,
+    RETRIEVAL_OVERFETCH_FACTOR,
+    RETRIEVAL_TIMEOUT_SECONDS,
+    RETRIEVAL_MAX_WORKERS,
+    RETRIEVAL_HEDGE_PERCENTILE,
+    RETRIEVAL_HEDGE_DEFAULT_DELAY_SECONDS,
+    RETRIEVAL_HEDGE_MIN_DELAY_SECONDS,
+    RETRIEVAL_HEDGE_MIN_SAMPLES,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_SECONDS,
+    RETRIEVAL_CONTEXT_MAX_TOKENS,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_REDUCTION,
+    EMBEDDING_REDUCED_DIM,
+    VECTOR_STORE,
+    EMBEDDING_ARTIFACTS_DIR,
+)
 
-logger.info("Initializing Pinecone client...")
-pc = Pinecone()
+load_dotenv()
 
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
-if not PINECONE_INDEX_NAME:
-    logger.error("PINECONE_INDEX_NAME environment variable is required")
-    raise ValueError("PINECONE_INDEX_NAME environment variable is required")
 PINECONE_NAMESPACE = os.getenv("PINECONE_NAMESPACE")
-logger.info(f"Pinecone index: {PINECONE_INDEX_NAME}, namespace: {PINECONE_NAMESPACE}")
+
+pc = None
+if VECTOR_STORE == "pinecone":
+    logger.info("Initializing Pinecone client...")
+    pc = Pinecone()
+    if not PINECONE_INDEX_NAME:
+        logger.error("PINECONE_INDEX_NAME environment variable is required")
+        raise ValueError("PINECONE_INDEX_NAME environment variable is required")
+    logger.info(f"Pinecone index: {PINECONE_INDEX_NAME}, namespace: {PINECONE_NAMESPACE}")
+else:
+    logger.info(f"Using local vector index from {EMBEDDING_ARTIFACTS_DIR}, namespace: {PINECONE_NAMESPACE}")
 
 # Initialize embedding model (same as used in ingestion)
 logger.info("Loading embedding model...")
-embedding_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
 logger.info("Embedding model loaded successfully")
 
+# Reduces query embeddings to the dimension of the indexed vectors (see RAG/ingestion/reduction.py)
+embedding_projection = None
+if EMBEDDING_REDUCTION:
+    if VECTOR_STORE == "local":
+        # The local index is built from the artifacts, so a missing projection can be fitted now
+        embedding_projection = ensure_projection(
+            EMBEDDING_ARTIFACTS_DIR, EMBEDDING_REDUCED_DIM, method=EMBEDDING_REDUCTION, model_name=EMBEDDING_MODEL_NAME
+        )
+    else:
+        embedding_projection = load_projection(EMBEDDING_ARTIFACTS_DIR)
+        if embedding_projection is None or not embedding_projection.matches(
+            EMBEDDING_REDUCTION, EMBEDDING_REDUCED_DIM, EMBEDDING_MODEL_NAME
+        ):
+            raise ValueError(
+                f"No {EMBEDDING_REDUCTION} projection to {EMBEDDING_REDUCED_DIM} dimensions in {EMBEDDING_ARTIFACTS_DIR}; "
+                f"run ingestion with these settings first"
+            )
+    logger.info(f"Query embeddings are reduced to {embedding_projection.dim} dimensions ({embedding_projection.method})")
+
+# Shared pool for querying several namespaces concurrently
+namespace_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_MAX_WORKERS, thread_name_prefix="pinecone")
+# Pool the (possibly hedged) index queries themselves run on
+query_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_MAX_WORKERS * 2, thread_name_prefix="pinecone-query")
+# Fails retrieval fast while the vector store keeps timing out or erroring; bad requests
+# (malformed filters, dimension mismatches) do not count against it
+vector_store_breaker = CircuitBreaker(
+    "vector_store",
+    failure_threshold=BREAKER_FAILURE_THRESHOLD,
+    reset_timeout_seconds=BREAKER_RESET_SECONDS,
+    is_failure=is_dependency_failure,
+)
+
+
+@lru_cache(maxsize=EMBEDDING_CACHE_MAX_ENTRIES)
+def _encode_normalized(query: str) -> tuple[float, ...]:
+    metrics.inc("retrieval.embedding_cache.misses")
+    embedding = embedding_model.encode(query, normalize_embeddings=True)
+    if embedding_projection is not None:
+        embedding = embedding_projection.apply(embedding)
+    return tuple(embedding.tolist())
+
+
+def embed_query(query: str) -> list[float]:
+    """
+    Embed a search query, reusing the embedding of recent identical queries.
+    
+    Queries are normalized (lower-cased, whitespace collapsed) before
+    encoding; the embedding model is uncased, so this does not change the
+    vector, and trivially different spellings share a cache entry.
+    """
+    metrics.inc("retrieval.embedding_cache.requests")
+    return list(_encode_normalized(normalize_query(query)))
+
+
+@lru_cache(maxsize=None)
+def get_index():
+    """
+    Get the vector index, connecting (or loading it) on first use.
+    
+    Returns a Pinecone index handle, or a LocalVectorIndex built from the
+    embedding artifacts when VECTOR_STORE is "local".
+    """
+    if VECTOR_STORE == "local":
+        from RAG.retrieval.local_index import LocalVectorIndex
+        return LocalVectorIndex.from_artifacts(EMBEDDING_ARTIFACTS_DIR, namespace=PINECONE_NAMESPACE, projection=embedding_projection)
+    logger.info(f"Connecting to Pinecone index: {PINECONE_INDEX_NAME}")
+    return pc.Index(PINECONE_INDEX_NAME)
+
+
+# Parent spans and the artifact manifest version they were loaded from
+_parent_store = {"manifest_mtime": None, "parents": None}
+_parent_store_lock = threading.Lock()
+
+
+def get_parent_store() -> dict[str, dict]:
+    """
+    Get the parent spans of small-to-big chunks, loading them on first use.
+    
+    Parents are stored once per source in the embedding artifacts rather than
+    in every child's vector metadata, so they are read from
+    EMBEDDING_ARTIFACTS_DIR for either vector store. They are reloaded when
+    the artifact manifest changes, so files ingested after startup are found.
+    """
+    try:
+        manifest_mtime = (Path(EMBEDDING_ARTIFACTS_DIR) / MANIFEST_FILE).stat().st_mtime_ns
+    except FileNotFoundError:
+        manifest_mtime = None
+    with _parent_store_lock:
+        if _parent_store["parents"] is None or manifest_mtime != _parent_store["manifest_mtime"]:
+            _parent_store["parents"] = load_parents(EMBEDDING_ARTIFACTS_DIR)
+            _parent_store["manifest_mtime"] = manifest_mtime
+            logger.info(f"Loaded {len(_parent_store['parents'])} parent spans from {EMBEDDING_ARTIFACTS_DIR}")
+        return _parent_store["parents"]
+
+
+def query_namespace(
+    index,
+    query_embedding: list[float],
+    top_k: int,
+    namespace: Optional[str],
+    metadata_filter: Optional[dict] = None,
+    timeout_seconds: float = RETRIEVAL_TIMEOUT_SECONDS,
+) -> list[dict]:
+    """
+    Query a single Pinecone namespace.
+    
+    The query runs through the vector store circuit breaker with a deadline,
+    and is hedged: if it is slower than the observed p95 latency, a duplicate
+    query is fired and the first answer wins.
+    
+    Args:
+        index: Pinecone index handle
+        query_embedding: The encoded query
+        top_k: Number of matches to fetch
+        namespace: Namespace to search
+        metadata_filter: Pinecone metadata filter applied by the index before ranking
+        timeout_seconds: Deadline for the query (default: RETRIEVAL_TIMEOUT_SECONDS)
+        
+    Returns:
+        list[dict]: Scored documents tagged with their namespace
+        
+    Raises:
+        DeadlineExceededError: If the query does not return in time
+        CircuitOpenError: If the vector store circuit is open
+    """
+    logger.info(f"Querying Pinecone with top_k={top_k}, namespace={namespace}, filter={metadata_filter}...")
+    results = vector_store_breaker.call(
+        hedged_call,
+        "retrieval.query",
+        lambda: index.query(
+            vector=query_embedding,
+            top_k=top_k,
+            namespace=namespace,
+            filter=metadata_filter or None,
+            include_metadata=True
+        ),
+        timeout_seconds=timeout_seconds,
+        limit_seconds=RETRIEVAL_TIMEOUT_SECONDS,
+        hedge_delay_seconds=hedge_delay(
+            "retrieval.query",
+            percentile=RETRIEVAL_HEDGE_PERCENTILE,
+            default_seconds=RETRIEVAL_HEDGE_DEFAULT_DELAY_SECONDS,
+            min_seconds=RETRIEVAL_HEDGE_MIN_DELAY_SECONDS,
+            min_samples=RETRIEVAL_HEDGE_MIN_SAMPLES,
+        ),
+        executor=query_executor,
+    )
+    logger.info(f"Pinecone query completed. Results type: {type(results)}")
+    
+    # Extract documents from results (Pinecone returns a QueryResponse dataclass)
+    documents = []
+    # Access matches as attribute (dataclass), not dictionary key
+    if results and hasattr(results, 'matches') and results.matches:
+        logger.info(f"Processing {len(results.matches)} matches from namespace {namespace}")
+        for match in results.matches:
+            # Match is also a dataclass, access attributes directly
+            doc = {
+                "id": match.id if hasattr(match, 'id') else None,
+                "score": match.score if hasattr(match, 'score') else 0.0,
+                "metadata": match.metadata if hasattr(match, 'metadata') else {},
+                "namespace": namespace,
+            }
+            documents.append(doc)
+            logger.debug(f"Added document: id={doc['id']}, score={doc.get('score', 0):.4f}")
+    else:
+        logger.warning(f"No matches found in Pinecone results for namespace {namespace}")
+    return documents
+
+
+def query_namespaces(
+    index,
+    query_embedding: list[float],
+    top_k: int,
+    namespaces: list[Optional[str]],
+    timeout_seconds: float = RETRIEVAL_TIMEOUT_SECONDS,
+    metadata_filter: Optional[dict] = None,
+) -> list[dict]:
+    """
+    Query several namespaces concurrently and merge them into a global top-k.
+    
+    All namespaces share one deadline. Namespaces that fail or miss the
+    deadline are skipped and the remaining results are returned.
+    
+    Args:
+        index: Pinecone index handle
+        query_embedding: The encoded query
+        top_k: Number of matches to return across all namespaces
+        namespaces: Namespaces to search
+        timeout_seconds: Shared deadline for all namespace queries
+        metadata_filter: Pinecone metadata filter applied in every namespace
+        
+    Returns:
+        list[dict]: The best ``top_k`` documents across namespaces, highest score first
+        
+    Raises:
+        TimeoutError: If no namespace returned results and some missed the deadline
+        Exception: The last namespace's error, if every namespace failed before the deadline
+    """
+    futures = {
+        namespace_executor.submit(query_namespace, index, query_embedding, top_k, namespace, metadata_filter, timeout_seconds): namespace
+        for namespace in namespaces
+    }
+    done, not_done = wait(futures, timeout=timeout_seconds)
+    for future in not_done:
+        future.cancel()
+        logger.warning(f"Namespace {futures[future]} did not respond within {timeout_seconds}s, skipping")
+    
+    results = []
+    error = None
+    for future in done:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            error = e
+            logger.error(f"Query failed for namespace {futures[future]}: {e}", exc_info=True)
+    if not results:
+        if not_done:
+            raise TimeoutError(f"No namespace returned results within {timeout_seconds}s")
+        if error is not None:
+            raise error
+    
+    return heapq.nlargest(top_k, chain.from_iterable(results), key=lambda doc: doc["score"])
+
+
+def select_adaptive_k(
+    documents: list[dict],
+    min_score: float = RETRIEVAL_MIN_SCORE,
+    min_k: int = RETRIEVAL_MIN_K,
+    max_k: int = 5,
+    min_gap: float = RETRIEVAL_MIN_SCORE_GAP,
+) -> list[dict]:
+    """
+    Choose how many scored documents to keep.
+    
+    Documents scoring below ``min_score`` are dropped, at most ``max_k`` are
+    kept, and the list is cut at the largest drop between consecutive scores
+    if that drop is at least ``min_gap`` (never leaving fewer than ``min_k``).
+    
+    Args:
+        documents: Scored documents as returned by Pinecone
+        min_score: Minimum similarity score to keep a document
+        min_k: Minimum number of documents to keep when cutting at a score gap
+        max_k: Maximum number of documents to keep
+        min_gap: Minimum score drop that counts as a cut point
+        
+    Returns:
+        list[dict]: The selected documents, highest score first (may be empty)
+    """
+    ranked = sorted(documents, key=lambda doc: doc.get("score", 0.0), reverse=True)
+    kept = [doc for doc in ranked if doc.get("score", 0.0) >= min_score][:max_k]
+    
+    start = max(min_k, 1)
+    if len(kept) > start:
+        gap, cut = max(
+            (kept[i - 1]["score"] - kept[i]["score"], i)
+            for i in range(start, len(kept))
+        )
+        if gap >= min_gap:
+            logger.info(f"Cutting results at score gap {gap:.4f} after {cut} documents")
+            kept = kept[:cut]
+    
+    logger.info(f"Adaptive selection kept {len(kept)} of {len(documents)} documents")
+    return kept
+
 
-def get_relevant_docs(query: str, k: int = 5) -> list[dict]:
+def collapse_to_parents(documents: list[dict], parent_store: Optional[dict[str, dict]] = None) -> list[dict]:
+    """
+    Replace child chunk matches with their unique parent spans.
+    
+    Each parent appears once, in the position of its best-scoring child, with
+    that child's score and the parent text as its content (and the parent's
+    compact form, if stored, as 'compact_text'). Parent texts come from
+    ``parent_store`` (see :func:`get_parent_store`), or from the child's
+    metadata for vectors ingested when parents were copied into every child.
+    Matches without a parent (ingested before small-to-big chunking), or
+    whose parent is not found, are kept as they are.
+    
+    Args:
+        documents: Matches sorted by descending score
+        parent_store: Parent spans by parent_id (default: none)
+        
+    Returns:
+        list[dict]: Deduplicated parent documents sorted by descending score
+    """
+    parent_store = parent_store or {}
+    parents = {}
+    collapsed = []
+    missing = 0
+    for doc in documents:
+        metadata = doc.get("metadata") or {}
+        parent_id = metadata.get("parent_id")
+        stored = parent_store.get(parent_id) or {}
+        parent_text = metadata.get("parent_text") or stored.get("text")
+        if not parent_id or not parent_text:
+            missing += bool(parent_id)
+            collapsed.append(doc)
+            continue
+        key = (doc.get("namespace"), parent_id)
+        if key in parents:
+            parents[key]["metadata"]["matched_chunks"] += 1
+            continue
+        parent_metadata = {
+            name: value for name, value in metadata.items()
+            if name not in ("parent_text", "parent_compact_text", "compact_text", "start_index", "token_count")
+        }
+        parent_metadata["page_content"] = parent_text
+        compact_text = metadata.get("parent_compact_text") or stored.get("compact_text")
+        if compact_text:
+            parent_metadata["compact_text"] = compact_text
+        parent_metadata["matched_chunks"] = 1
+        parents[key] = {**doc, "id": parent_id, "metadata": parent_metadata}
+        collapsed.append(parents[key])
+    
+    if missing:
+        logger.warning(f"{missing} matches link to parents missing from the artifacts; returning the child chunks")
+    if parents:
+        logger.info(f"Collapsed {len(documents)} matches into {len(collapsed)} documents ({len(parents)} parents)")
+    return collapsed
+
+
+def fit_token_budget(documents: list[dict], max_tokens: int) -> list[dict]:
+    """
+    Keep the best documents whose combined text fits a token budget.
+    
+    A document whose full text does not fit is swapped for its stored compact
+    form ('compact_text', built at ingestion) when that fits; such documents
+    are marked 'compacted'. The top document is always kept, in compact form
+    if it has one, even if it alone exceeds the budget.
+    
+    Args:
+        documents: Documents sorted by descending score
+        max_tokens: Token budget for the documents' text
+        
+    Returns:
+        list[dict]: The leading documents that fit the budget
+    """
+    kept = []
+    used = 0
+    compacted = 0
+    for doc in documents:
+        metadata = doc.get("metadata") or {}
+        tokens = estimate_tokens(metadata.get("page_content", ""))
+        if used + tokens > max_tokens and metadata.get("compact_text"):
+            compact_tokens = estimate_tokens(metadata["compact_text"])
+            if not kept or used + compact_tokens <= max_tokens:
+                compact_metadata = {name: value for name, value in metadata.items() if name != "compact_text"}
+                compact_metadata["page_content"] = metadata["compact_text"]
+                compact_metadata["compacted"] = True
+                doc = {**doc, "metadata": compact_metadata}
+                tokens = compact_tokens
+                compacted += 1
+        if kept and used + tokens > max_tokens:
+            break
+        kept.append(doc)
+        used += tokens
+    if compacted:
+        metrics.inc("retrieval.compacted_documents", compacted)
+    if len(kept) < len(documents) or compacted:
+        logger.info(
+            f"Token budget of {max_tokens} kept {len(kept)} of {len(documents)} documents "
+            f"({compacted} compacted, {used} tokens)"
+        )
+    return kept
+
+
+def get_relevant_docs(
+    query: str,
+    k: int = 5,
+    min_score: Optional[float] = None,
+    min_k: Optional[int] = None,
+    max_k: Optional[int] = None,
+    adaptive: bool = RETRIEVAL_ADAPTIVE,
+    namespaces: Optional[list[str]] = None,
+    timeout_seconds: Optional[float] = None,
+    metadata_filter: Optional[dict] = None,
+    max_context_tokens: Optional[int] = None,
+) -> list[dict]:
     """
     Get relevant documents from Pinecone using semantic search.
     
+    Matches on small child chunks are collapsed to their unique parent spans
+    before selection, so each page or section is returned once, and the
+    result is trimmed to a token budget.
+    
+    A metadata filter (e.g. ``{"file_name": "report.pdf", "page": {"$lte": 10}}``)
+    is pushed down into the index query, so only matching vectors are searched.
+    
+    Several namespaces can be searched at once; they are queried concurrently
+    and merged into a single top-k by score.
+    
+    With adaptive retrieval, more candidates than needed are fetched and the
+    result is cut by score (see ``select_adaptive_k``), so fewer than ``k``
+    documents, or none at all, may be returned.
+    
     Args:
         query: The search query
-        k: Number of results to return (default: 5)
+        k: Number of results to return (default: 5). Upper bound when adaptive.
+        min_score: Minimum similarity score (default: RETRIEVAL_MIN_SCORE)
+        min_k: Minimum results to keep when cutting at a score gap (default: RETRIEVAL_MIN_K)
+        max_k: Maximum results to return (default: k)
+        adaptive: Whether to cut results by score (default: RETRIEVAL_ADAPTIVE)
+        namespaces: Namespaces to search (default: PINECONE_NAMESPACE)
+        timeout_seconds: Deadline for the vector store queries, shared when
+            searching several namespaces (default: RETRIEVAL_TIMEOUT_SECONDS)
+        metadata_filter: Pinecone-style metadata filter on e.g. file_name,
+            source, page or doc_type (default: no filter)
+        max_context_tokens: Token budget for the returned documents' text
+            (default: RETRIEVAL_CONTEXT_MAX_TOKENS)
         
     Returns:
         list[dict]: List of relevant documents with metadata
     """
-    logger.info(f"Getting relevant docs for query: '{query}', k={k}")
+    max_k = k if max_k is None else max_k
+    # Several child chunks of one parent collapse into a single match, so always overfetch
+    top_k = (max_k if adaptive else k) * RETRIEVAL_OVERFETCH_FACTOR
+    logger.info(f"Getting relevant docs for query: '{query}', k={k}, adaptive={adaptive}")
+    
+    if not namespaces:
+        namespaces = [PINECONE_NAMESPACE]
+    if timeout_seconds is None:
+        timeout_seconds = RETRIEVAL_TIMEOUT_SECONDS
     
     try:
         # Get index
-        logger.info(f"Connecting to Pinecone index: {PINECONE_INDEX_NAME}")
-        index = pc.Index(PINECONE_INDEX_NAME)
+        index = get_index()
         logger.info("Index connection established")
         
         # Encode query to embedding
         logger.info("Encoding query to embedding...")
-        query_embedding = embedding_model.encode(query, normalize_embeddings=True).tolist()
+        query_embedding = embed_query(query)
         logger.info(f"Query encoded. Embedding dimension: {len(query_embedding)}")
         
-        # Query Pinecone using the correct API
-        logger.info(f"Querying Pinecone with top_k={k}, namespace={PINECONE_NAMESPACE}...")
-        results = index.query(
-            vector=query_embedding,
-            top_k=k,
-            namespace=PINECONE_NAMESPACE,
-            include_metadata=True
-        )
-        logger.info(f"Pinecone query completed. Results type: {type(results)}")
+        # Query Pinecone, fanning out when several namespaces are requested
+        if len(namespaces) == 1:
+            documents = query_namespace(index, query_embedding, top_k, namespaces[0], metadata_filter, timeout_seconds)
+        else:
+            documents = query_namespaces(
+                index,
+                query_embedding,
+                top_k,
+                namespaces,
+                timeout_seconds=timeout_seconds,
+                metadata_filter=metadata_filter,
+            )
         
-        # Extract documents from results (Pinecone returns a QueryResponse dataclass)
-        documents = []
-        # Access matches as attribute (dataclass), not dictionary key
-        if results and hasattr(results, 'matches') and results.matches:
-            logger.info(f"Processing {len(results.matches)} matches")
-            for match in results.matches:
-                # Match is also a dataclass, access attributes directly
-                doc = {
-                    "id": match.id if hasattr(match, 'id') else None,
-                    "score": match.score if hasattr(match, 'score') else 0.0,
-                    "metadata": match.metadata if hasattr(match, 'metadata') else {}
-                }
-                documents.append(doc)
-                logger.debug(f"Added document: id={doc['id']}, score={doc.get('score', 0):.4f}")
+        documents = collapse_to_parents(documents, get_parent_store())
+        if adaptive:
+            documents = select_adaptive_k(
+                documents,
+                min_score=RETRIEVAL_MIN_SCORE if min_score is None else min_score,
+                min_k=RETRIEVAL_MIN_K if min_k is None else min_k,
+                max_k=max_k,
+            )
         else:
-            logger.warning("No matches found in Pinecone results")
+            documents = documents[:k]
+        documents = fit_token_budget(
+            documents,
+            RETRIEVAL_CONTEXT_MAX_TOKENS if max_context_tokens is None else max_context_tokens,
+        )
         
         logger.info(f"Returning {len(documents)} documents")
         return documents
@@ -82,5 +534,3 @@ def get_relevant_docs(query: str, k: int = 5) -> list[dict]:
     except Exception as e:
         logger.error(f"Error retrieving documents from Pinecone: {e}", exc_info=True)
         raise
-
-    
\ No newline at end of file
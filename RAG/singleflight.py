@@ -0,0 +1,105 @@
+"""
+Single-flight coalescing of identical in-flight calls.
+The first caller for a key does the work; concurrent callers with the same key wait for its result.
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Hashable
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Deduplicate concurrent calls that share a key.
+    
+    ``do`` coalesces calls across threads and ``ado`` across coroutines on
+    the same event loop. Results are not cached: once the leading call
+    finishes, the next call for the key runs again. Counts of leading and
+    coalesced calls are reported to the metrics registry under
+    ``singleflight.<name>.*``.
+    """
+    
+    def __init__(self, name: str):
+        """
+        Args:
+            name: Name used in metric names
+        """
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, Future] = {}
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+    
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run ``fn`` unless an identical call is already in flight, in which case wait for it.
+        
+        Args:
+            key: Identity of the call
+            fn: Zero-argument callable doing the work
+            
+        Returns:
+            The result of ``fn`` (the leader's result for coalesced callers)
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+        
+        if not leader:
+            metrics.inc(f"singleflight.{self.name}.coalesced")
+            logger.info(f"Coalesced with in-flight {self.name} call")
+            return future.result()
+        
+        metrics.inc(f"singleflight.{self.name}.leader")
+        metrics.add_gauge(f"singleflight.{self.name}.in_flight", 1)
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            metrics.add_gauge(f"singleflight.{self.name}.in_flight", -1)
+    
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async version of ``do``.
+        
+        The work runs in its own task, so a caller being cancelled (e.g. a
+        client disconnecting) does not cancel it for the other waiters.
+        
+        Args:
+            key: Identity of the call
+            fn: Zero-argument callable returning an awaitable doing the work
+            
+        Returns:
+            The result of the awaitable
+        """
+        task = self._tasks.get(key)
+        if task is not None:
+            metrics.inc(f"singleflight.{self.name}.coalesced")
+            logger.info(f"Coalesced with in-flight {self.name} call")
+            return await asyncio.shield(task)
+        
+        metrics.inc(f"singleflight.{self.name}.leader")
+        metrics.add_gauge(f"singleflight.{self.name}.in_flight", 1)
+        task = asyncio.ensure_future(fn())
+        self._tasks[key] = task
+        
+        def _done(_):
+            self._tasks.pop(key, None)
+            metrics.add_gauge(f"singleflight.{self.name}.in_flight", -1)
+        
+        task.add_done_callback(_done)
+        return await asyncio.shield(task)
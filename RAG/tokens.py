@@ -0,0 +1,22 @@
+"""Token counting helpers for prompt budgeting."""
+
+# Llama-family tokenizers average roughly four characters per token on English text
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of LLM tokens in a piece of text.
+    
+    The estimate avoids loading the LLM tokenizer and is accurate enough
+    for budgeting prompt sections.
+    
+    Args:
+        text: The text to measure
+        
+    Returns:
+        int: Estimated token count
+    """
+    if not text:
+        return 0
+    return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
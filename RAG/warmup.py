@@ -0,0 +1,229 @@
+"""
+Startup warmup from recorded query history.
+
+A QueryLog keeps a compact, file-backed count of the normalized queries a
+service answers. At startup ``warm_up`` replays the most popular ones through
+query embedding and retrieval, so the embedding cache, the vector store
+connection and the hedging latency statistics are warm before traffic
+arrives, and optionally loads a shared snapshot of the answer cache.
+"""
+
+import os
+import json
+import time
+import fcntl
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from RAG.resilience import CircuitOpenError, Deadline
+from tools.search_cache import normalize_query
+from metrics import metrics
+from config.settings import (
+    WARMUP_TOP_N,
+    WARMUP_TIME_BUDGET_SECONDS,
+    ANSWER_SNAPSHOT_PATH,
+    RETRIEVAL_TIMEOUT_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Replayed when there is no history yet, so the embedding model and index connection are still warmed
+PROBE_QUERY = "warmup"
+
+
+@contextmanager
+def locked_file(path: Path):
+    """
+    Hold an exclusive lock on ``path`` across processes for a read-merge-write.
+
+    The lock is taken on a ``<path>.lock`` sidecar, since the file itself is
+    replaced atomically while the lock is held. ``flock`` serializes
+    processes on one host and on filesystems that support it.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(f"{path.name}.lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class QueryLog:
+    """Thread-safe popularity log of normalized queries, persisted as JSON.
+
+    Counts are kept in memory and merged into the file by :meth:`flush`,
+    which callers run when :meth:`record` reports ``flush_every`` unsaved
+    queries (and at shutdown). Merging adds only the counts recorded since
+    the last flush, and the read-merge-write holds a file lock (see
+    :func:`locked_file`), so several worker processes can share one file.
+    Only the ``max_entries`` most popular queries are kept.
+    """
+
+    def __init__(self, path: str, max_entries: int = 2000, flush_every: int = 100):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.flush_every = flush_every
+        self._counts: Counter = Counter()
+        self._last_seen: dict[str, float] = {}
+        self._pending: Counter = Counter()
+        self._lock = threading.Lock()
+        # Serializes read-merge-write cycles within the process; locked_file serializes processes
+        self._flush_lock = threading.Lock()
+        self._merge(self._read())
+
+    def record(self, query: str) -> bool:
+        """Count one occurrence of ``query``.
+
+        Returns:
+            bool: True if enough queries are unsaved that :meth:`flush` should run
+        """
+        key = normalize_query(query)
+        if not key:
+            return False
+        with self._lock:
+            self._counts[key] += 1
+            self._pending[key] += 1
+            self._last_seen[key] = time.time()
+            return sum(self._pending.values()) >= self.flush_every
+
+    def top(self, n: int) -> list[str]:
+        """Return the ``n`` most popular queries, most popular first."""
+        with self._lock:
+            ranked = sorted(self._counts, key=lambda key: (self._counts[key], self._last_seen.get(key, 0)), reverse=True)
+        return ranked[:n]
+
+    def flush(self) -> None:
+        """Merge the counts recorded since the last flush into the file (written atomically)."""
+        with self._flush_lock:
+            try:
+                with locked_file(self.path):
+                    self._flush()
+            except OSError as e:
+                logger.warning(f"Could not lock query log {self.path}: {e}")
+
+    def _flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            last_seen = {key: self._last_seen[key] for key in pending}
+        if not pending:
+            return
+        # Pick up counts other processes flushed since we last read the file
+        on_disk = self._read()
+        for key, count in pending.items():
+            entry = on_disk.setdefault(key, [0, 0.0])
+            entry[0] += count
+            entry[1] = max(entry[1], last_seen[key])
+        on_disk = dict(sorted(on_disk.items(), key=lambda item: (item[1][0], item[1][1]), reverse=True)[:self.max_entries])
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(f"{self.path.suffix}.{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(on_disk, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save query log to {self.path}: {e}")
+            with self._lock:
+                self._pending.update(pending)
+            return
+        with self._lock:
+            self._counts = Counter({key: entry[0] for key, entry in on_disk.items()}) + self._pending
+            self._last_seen = {key: entry[1] for key, entry in on_disk.items()} | {
+                key: self._last_seen[key] for key in self._pending
+            }
+
+    def _read(self) -> dict[str, list]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load query log from {self.path}: {e}")
+            return {}
+
+    def _merge(self, entries: dict[str, list]) -> None:
+        with self._lock:
+            for key, (count, last_seen) in entries.items():
+                self._counts[key] = count
+                self._last_seen[key] = last_seen
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+
+def warm_up(
+    rag,
+    top_n: int = WARMUP_TOP_N,
+    time_budget_seconds: float = WARMUP_TIME_BUDGET_SECONDS,
+    answer_snapshot_path: Optional[str] = ANSWER_SNAPSHOT_PATH,
+) -> dict:
+    """
+    Warm a RAG instance's caches before it serves traffic.
+
+    Loads the shared answer snapshot into the answer cache, then replays the
+    most popular logged queries through query embedding and retrieval until
+    they run out or the time budget is spent. No LLM calls are made.
+
+    Args:
+        rag: The RAG instance to warm (its query log and answer cache are used)
+        top_n: Popular queries to replay (default: WARMUP_TOP_N)
+        time_budget_seconds: Total time warmup may take (default: WARMUP_TIME_BUDGET_SECONDS)
+        answer_snapshot_path: Answer cache snapshot to load, or None (default: ANSWER_SNAPSHOT_PATH)
+
+    Returns:
+        dict: 'answers_loaded', 'queries_warmed', 'queries_failed', 'complete'
+            (False if the budget ran out or the vector store circuit opened) and 'seconds'
+    """
+    from RAG.retrieval.retrieve_from_pinecone import get_relevant_docs
+
+    start = time.monotonic()
+    deadline = Deadline(time_budget_seconds)
+    stats = {"answers_loaded": 0, "queries_warmed": 0, "queries_failed": 0, "complete": True}
+    if answer_snapshot_path:
+        stats["answers_loaded"] = rag.answer_cache.load(answer_snapshot_path)
+
+    queries = rag.query_log.top(top_n) if rag.query_log is not None else []
+    for query in queries or [PROBE_QUERY]:
+        remaining = deadline.remaining()
+        if remaining <= 0:
+            stats["complete"] = False
+            break
+        try:
+            get_relevant_docs(query, k=rag.k, timeout_seconds=min(RETRIEVAL_TIMEOUT_SECONDS, remaining))
+            stats["queries_warmed"] += 1
+        except CircuitOpenError:
+            stats["complete"] = False
+            break
+        except Exception as e:
+            logger.warning(f"Warmup query failed: {e}")
+            stats["queries_failed"] += 1
+
+    stats["seconds"] = round(time.monotonic() - start, 3)
+    metrics.inc("warmup.answers_loaded", stats["answers_loaded"])
+    metrics.inc("warmup.queries", stats["queries_warmed"])
+    metrics.inc("warmup.failed", stats["queries_failed"])
+    logger.info(
+        f"Warmup: {stats['queries_warmed']} of {len(queries)} popular queries replayed, "
+        f"{stats['answers_loaded']} answers loaded in {stats['seconds']}s"
+    )
+    return stats
+
+
+def save_warm_state(rag, answer_snapshot_path: Optional[str] = ANSWER_SNAPSHOT_PATH) -> None:
+    """Flush the query log and merge the answer cache into the shared snapshot (call at shutdown)."""
+    if rag.query_log is not None:
+        rag.query_log.flush()
+    if answer_snapshot_path:
+        # Keep answers other replicas saved; the newest copy of each wins
+        try:
+            with locked_file(answer_snapshot_path):
+                rag.answer_cache.load(answer_snapshot_path)
+                rag.answer_cache.save(answer_snapshot_path)
+        except OSError as e:
+            logger.warning(f"Could not lock answer snapshot {answer_snapshot_path}: {e}")
@@ -1,9 +1,15 @@
 """Agent module."""
 
-from agent.agent_factory import create_agent_instance, get_agent_response
+from agent.agent_factory import create_agent_instance, get_agent_response, aget_agent_response
+from agent.pool import AgentPool, AgentPoolTimeoutError
+from agent.middleware import ToolExecutionMiddleware
 
 __all__ = [
     "create_agent_instance",
     "get_agent_response",
+    "aget_agent_response",
+    "AgentPool",
+    "AgentPoolTimeoutError",
+    "ToolExecutionMiddleware",
 ]
 
@@ -1,35 +1,59 @@
 """Agent factory for creating and using agents with Pydantic structured output."""
 
+import logging
 from langchain.agents import create_agent
-from langchain.agents.structured_output import ToolStrategy
-from models.ollama_model import create_ollama_model
-from config.settings import DEBUG_MODE
+from langchain.agents.structured_output import ToolStrategy, StructuredOutputError
+from pydantic import ValidationError
+from models.ollama_model import get_ollama_model, get_structured_ollama_model
+from models.usage import messages_usage, ollama_usage, record_usage
+from config.settings import DEBUG_MODE, AGENT_TOOL_MAX_CONCURRENCY, AGENT_TOOL_TIMEOUT_SECONDS
+from agent.middleware import ToolExecutionMiddleware
 from tools import get_tavily_search_tool
 from schemas.response import AgentResponse
 from prompts.templates import get_system_prompt
 
+logger = logging.getLogger(__name__)
 
-def create_agent_instance():
+
+def create_agent_instance(
+    llm=None,
+    tools=None,
+    tool_max_concurrency: int = AGENT_TOOL_MAX_CONCURRENCY,
+    tool_timeout_seconds: float = AGENT_TOOL_TIMEOUT_SECONDS,
+):
     """Create and return an agent instance with structured output formatting.
     
     Uses LangChain's native structured output feature. For Ollama models,
     LangChain uses ToolStrategy to achieve structured output.
     
+    When the model emits several tool calls in one turn they run
+    concurrently, at most ``tool_max_concurrency`` at a time, and a call
+    exceeding ``tool_timeout_seconds`` is reported back to the model as an
+    error instead of stalling the turn.
+    
+    Args:
+        llm: Chat model to use (default: the shared Ollama model)
+        tools: Tools to give the agent (default: Tavily search, if configured)
+        tool_max_concurrency: Tool calls run at once (default: AGENT_TOOL_MAX_CONCURRENCY)
+        tool_timeout_seconds: Timeout per tool call (default: AGENT_TOOL_TIMEOUT_SECONDS)
+    
     Returns:
         CompiledStateGraph: Configured agent instance with structured output
     """
-    llm = create_ollama_model()
-    
-    # Get all available tools
-    tools = []
+    if llm is None:
+        llm = get_ollama_model()
     
-    # Add Tavily search tool if API key is available
-    try:
-        tavily_tool = get_tavily_search_tool()
-        tools.append(tavily_tool)
-    except ValueError:
-        # Tavily API key not set, skip adding the tool
-        pass
+    if tools is None:
+        # Get all available tools
+        tools = []
+        
+        # Add Tavily search tool if API key is available
+        try:
+            tavily_tool = get_tavily_search_tool()
+            tools.append(tavily_tool)
+        except ValueError:
+            # Tavily API key not set, skip adding the tool
+            pass
     
     # Get formatted system prompt with format instructions
     system_prompt = get_system_prompt()
@@ -42,16 +66,71 @@ def create_agent_instance():
         debug=DEBUG_MODE,
         system_prompt=system_prompt,
         response_format=ToolStrategy(AgentResponse),  # LangChain handles structured output
+        middleware=[ToolExecutionMiddleware(max_concurrency=tool_max_concurrency, timeout_seconds=tool_timeout_seconds)],
     )
     
     return agent
 
 
+def _extract_structured_response(result) -> AgentResponse | None:
+    """Return the agent's own validated structured response, if it produced one."""
+    if not isinstance(result, dict):
+        return None
+    structured = result.get("structured_response")
+    if structured is None:
+        return None
+    if isinstance(structured, AgentResponse):
+        return structured
+    try:
+        return AgentResponse.model_validate(structured)
+    except ValidationError as e:
+        logger.warning(f"Agent structured response failed validation: {e}")
+        return None
+
+
+def _extract_last_content(result) -> str:
+    """Return the text content of the last message in an agent result."""
+    if isinstance(result, dict) and result.get("messages"):
+        last_message = result["messages"][-1]
+        content = getattr(last_message, "content", "")
+        return content if isinstance(content, str) else str(content)
+    return ""
+
+
+def _parse_repair_result(result: dict) -> AgentResponse:
+    """Record the repair call's token usage and return its parsed response."""
+    record_usage("agent_repair", ollama_usage(result["raw"]))
+    if result.get("parsing_error") is not None:
+        raise result["parsing_error"]
+    return result["parsed"]
+
+
+def repair_agent_response(content: str) -> AgentResponse:
+    """Coerce free-form agent output into an AgentResponse with one extra LLM call.
+    
+    Only used as a fallback when the agent did not return a valid structured
+    response on its own.
+    
+    Args:
+        content: The raw text produced by the agent
+        
+    Returns:
+        AgentResponse: Validated Pydantic response with answer and sources
+    """
+    logger.info("Repairing agent output with a structured output call")
+    structured_llm = get_structured_ollama_model(AgentResponse, include_raw=True)
+    return _parse_repair_result(structured_llm.invoke(f"Answer the user's question: {content}"))
+
+
 def get_agent_response(agent, user_query: str) -> AgentResponse:
     """Get structured Pydantic response from agent for a user query.
     
     Uses LangChain's native structured output feature. The structured response
-    is automatically validated and returned in the 'structured_response' key.
+    is automatically validated and returned in the 'structured_response' key,
+    so in the common case the agent run is the only LLM work performed. A
+    repair call is made only when the agent's structured output is missing or
+    fails validation. Token usage of the agent run and of any repair call is
+    recorded in the metrics registry (``llm.agent.*``, ``llm.agent_repair.*``).
     
     Args:
         agent: The agent instance
@@ -60,17 +139,50 @@ def get_agent_response(agent, user_query: str) -> AgentResponse:
     Returns:
         AgentResponse: Validated Pydantic response with answer and sources
     """
-    content = ""
-    result = agent.invoke({"messages": [{"role": "user", "content": user_query}]})
-    if isinstance(result, dict) and "messages" in result:
-        last_message = result["messages"][-1]
-        if hasattr(last_message, "content"):
-            content = last_message.content
+    try:
+        result = agent.invoke({"messages": [{"role": "user", "content": user_query}]})
+    except StructuredOutputError as e:
+        logger.warning(f"Agent structured output failed: {e}")
+        record_usage("agent", ollama_usage(e.ai_message))
+        return repair_agent_response(str(e.ai_message.content or e.ai_message.tool_calls))
+
+    record_usage("agent", messages_usage(result.get("messages") if isinstance(result, dict) else None))
+    structured = _extract_structured_response(result)
+    if structured is not None:
+        return structured
+
+    logger.info("Agent returned no structured response, falling back to repair call")
+    return repair_agent_response(_extract_last_content(result))
+
+
+async def arepair_agent_response(content: str) -> AgentResponse:
+    """Async version of :func:`repair_agent_response`."""
+    logger.info("Repairing agent output with a structured output call")
+    structured_llm = get_structured_ollama_model(AgentResponse, include_raw=True)
+    return _parse_repair_result(await structured_llm.ainvoke(f"Answer the user's question: {content}"))
 
-    structed_llm = create_ollama_model().with_structured_output(AgentResponse)
 
-    result = structed_llm.invoke(f"Answer the user's question: {content}")
+async def aget_agent_response(agent, user_query: str) -> AgentResponse:
+    """Async version of :func:`get_agent_response`.
+    
+    Args:
+        agent: The agent instance
+        user_query: The user's question/query
+        
+    Returns:
+        AgentResponse: Validated Pydantic response with answer and sources
+    """
+    try:
+        result = await agent.ainvoke({"messages": [{"role": "user", "content": user_query}]})
+    except StructuredOutputError as e:
+        logger.warning(f"Agent structured output failed: {e}")
+        record_usage("agent", ollama_usage(e.ai_message))
+        return await arepair_agent_response(str(e.ai_message.content or e.ai_message.tool_calls))
 
-    print(result)
+    record_usage("agent", messages_usage(result.get("messages") if isinstance(result, dict) else None))
+    structured = _extract_structured_response(result)
+    if structured is not None:
+        return structured
 
-    return result
\ No newline at end of file
+    logger.info("Agent returned no structured response, falling back to repair call")
+    return await arepair_agent_response(_extract_last_content(result))
@@ -0,0 +1,85 @@
+"""Agent middleware bounding how tool calls execute."""
+
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import ToolMessage
+from metrics import metrics
+from RAG.resilience import DeadlineExceededError, call_with_timeout
+
+logger = logging.getLogger(__name__)
+
+
+class ToolExecutionMiddleware(AgentMiddleware):
+    """Limit concurrent tool calls and give each one a timeout.
+
+    The agent runtime already dispatches every tool call of a turn as its own
+    task, so independent calls run concurrently and their results are added
+    to the conversation in the order the model emitted them. This middleware
+    caps how many of them run at once and turns a tool that exceeds its
+    timeout into an error ToolMessage, so one slow call cannot stall the turn.
+
+    A timed-out tool is abandoned rather than killed; it frees its slot
+    immediately and finishes in the background.
+    """
+
+    def __init__(self, max_concurrency: int = 4, timeout_seconds: float = 20.0):
+        """
+        Args:
+            max_concurrency: Tool calls allowed to run at once (default: 4)
+            timeout_seconds: Time a single tool call may take (default: 20)
+        """
+        super().__init__()
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        # Headroom for calls that timed out but are still running
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency * 2, thread_name_prefix="agent-tool")
+        # asyncio semaphores are bound to one event loop
+        self._async_semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def _timeout_message(self, request) -> ToolMessage:
+        name = request.tool_call["name"]
+        logger.warning(f"Tool {name} timed out after {self.timeout_seconds}s")
+        return ToolMessage(
+            content=f"Error: {name} did not respond within {self.timeout_seconds:g}s. Answer without this result.",
+            tool_call_id=request.tool_call["id"],
+            name=name,
+            status="error",
+        )
+
+    def wrap_tool_call(self, request, handler):
+        name = request.tool_call["name"]
+        with self._semaphore:
+            # Run in the caller's context so callbacks and config still apply
+            context = contextvars.copy_context()
+            try:
+                return call_with_timeout(
+                    f"tool.{name}",
+                    lambda: context.run(handler, request),
+                    timeout_seconds=self.timeout_seconds,
+                    executor=self._executor,
+                )
+            except DeadlineExceededError:
+                return self._timeout_message(request)
+
+    async def awrap_tool_call(self, request, handler):
+        name = request.tool_call["name"]
+        loop = asyncio.get_running_loop()
+        semaphore = self._async_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._async_semaphores.setdefault(loop, asyncio.Semaphore(self.max_concurrency))
+        async with semaphore:
+            start = time.monotonic()
+            try:
+                result = await asyncio.wait_for(handler(request), timeout=self.timeout_seconds)
+            except asyncio.TimeoutError:
+                metrics.inc(f"deadline.tool.{name}.exceeded")
+                return self._timeout_message(request)
+            metrics.observe(f"tool.{name}.seconds", time.monotonic() - start)
+            return result
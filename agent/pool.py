@@ -0,0 +1,75 @@
+"""Pool of pre-built agent graphs for serving agent requests."""
+
+import asyncio
+import logging
+from typing import Optional
+from agent.agent_factory import create_agent_instance, aget_agent_response
+from config.settings import AGENT_POOL_SIZE, AGENT_TIMEOUT_SECONDS
+from schemas.response import AgentResponse
+
+logger = logging.getLogger(__name__)
+
+
+class AgentPoolTimeoutError(TimeoutError):
+    """Raised when an agent request does not finish within its time budget."""
+
+
+class AgentPool:
+    """A fixed-size pool of agent graphs built once and reused across requests.
+    
+    The pool size is also the concurrency cap: a request waits for a free
+    agent, and the wait counts against the request's timeout.
+    """
+
+    def __init__(self, size: int = AGENT_POOL_SIZE, timeout_seconds: float = AGENT_TIMEOUT_SECONDS):
+        """
+        Build the agent graphs.
+        
+        Args:
+            size: Number of agent graphs, i.e. maximum concurrent agent runs
+            timeout_seconds: Default per-request timeout
+        """
+        logger.info(f"Building agent pool with {size} agents")
+        self.size = size
+        self.timeout_seconds = timeout_seconds
+        self._agents = [create_agent_instance() for _ in range(size)]
+        self._available: Optional[asyncio.Queue] = None
+        logger.info("Agent pool ready")
+
+    def _queue(self) -> asyncio.Queue:
+        # Created lazily so it binds to the running event loop
+        if self._available is None:
+            self._available = asyncio.Queue()
+            for agent in self._agents:
+                self._available.put_nowait(agent)
+        return self._available
+
+    @property
+    def available(self) -> int:
+        """Number of agents not currently serving a request."""
+        return self._queue().qsize()
+
+    async def ainvoke(self, user_query: str, timeout_seconds: Optional[float] = None) -> AgentResponse:
+        """Run a query on a pooled agent.
+        
+        Args:
+            user_query: The user's question/query
+            timeout_seconds: Time budget for waiting and running (default: pool timeout)
+            
+        Returns:
+            AgentResponse: Validated Pydantic response with answer and sources
+            
+        Raises:
+            AgentPoolTimeoutError: If no agent frees up or the run does not finish in time
+        """
+        timeout = self.timeout_seconds if timeout_seconds is None else timeout_seconds
+        queue = self._queue()
+        try:
+            async with asyncio.timeout(timeout):
+                agent = await queue.get()
+                try:
+                    return await aget_agent_response(agent, user_query)
+                finally:
+                    queue.put_nowait(agent)
+        except TimeoutError as e:
+            raise AgentPoolTimeoutError(f"Agent request timed out after {timeout}s") from e
@@ -3,6 +3,7 @@ FastAPI application for RAG (Retrieval Augmented Generation) service.
 """
 
 import sys
+import asyncio
 import logging
 from pathlib import Path
 from typing import Optional
@@ -30,11 +31,28 @@ logger.info("Importing RAG class...")
 
 try:
     from RAG.main import RAG
+    from RAG.resilience import CircuitOpenError, DeadlineExceededError
+    from RAG.warmup import warm_up, save_warm_state
     logger.info("RAG class imported successfully")
 except Exception as e:
     logger.error(f"Failed to import RAG class: {e}", exc_info=True)
     raise
 
+try:
+    from metrics import metrics
+    logger.info("Metrics registry imported successfully")
+except Exception as e:
+    logger.error(f"Failed to import metrics registry: {e}", exc_info=True)
+    raise
+
+try:
+    from agent.pool import AgentPool, AgentPoolTimeoutError
+    from schemas.response import AgentResponse
+    logger.info("Agent pool imported successfully")
+except Exception as e:
+    logger.error(f"Failed to import agent pool: {e}", exc_info=True)
+    raise
+
 # Initialize FastAPI app
 app = FastAPI(
     title="RAG API",
@@ -71,19 +89,70 @@ def get_rag_instance() -> RAG:
     return rag_instance
 
 
+# Pool of pre-built agents, created once at startup
+agent_pool: Optional[AgentPool] = None
+
+
+def get_agent_pool() -> AgentPool:
+    """Get or create the agent pool (singleton pattern)."""
+    global agent_pool
+    if agent_pool is None:
+        logger.info("Creating agent pool...")
+        agent_pool = AgentPool()
+    return agent_pool
+
+
+@app.on_event("startup")
+async def build_agent_pool():
+    """Build the agent graphs before serving so requests don't pay for it."""
+    try:
+        get_agent_pool()
+    except Exception as e:
+        logger.error(f"Failed to create agent pool at startup: {e}", exc_info=True)
+
+
+@app.on_event("startup")
+async def warm_rag_caches():
+    """Replay popular queries and load the answer snapshot before serving (bounded by WARMUP_TIME_BUDGET_SECONDS)."""
+    try:
+        await asyncio.to_thread(warm_up, get_rag_instance())
+    except Exception as e:
+        logger.error(f"Warmup failed: {e}", exc_info=True)
+
+
+@app.on_event("shutdown")
+async def save_rag_caches():
+    """Persist the query log and answer snapshot for the next replica's warmup."""
+    if rag_instance is None:
+        return
+    try:
+        await asyncio.to_thread(save_warm_state, rag_instance)
+    except Exception as e:
+        logger.error(f"Failed to save warm state: {e}", exc_info=True)
+
+
 # Request/Response models
 class QueryRequest(BaseModel):
     """Request model for RAG query."""
     query: str = Field(..., description="The user's question/query", min_length=1)
     use_rag: bool = Field(True, description="Whether to use RAG (retrieve from Pinecone) or just LLM")
     k: Optional[int] = Field(None, description="Number of documents to retrieve (overrides default if provided)")
+    session_id: Optional[str] = Field(None, description="Conversation session ID for follow-up questions (stateless if omitted)")
+    min_score: Optional[float] = Field(None, description="Minimum similarity score for retrieved documents (overrides default if provided)")
+    min_k: Optional[int] = Field(None, description="Minimum documents to keep when cutting at a score gap (overrides default if provided)", ge=0)
+    max_k: Optional[int] = Field(None, description="Maximum documents to use as context (defaults to k)", ge=1)
+    namespaces: Optional[list[str]] = Field(None, description="Pinecone namespaces to search concurrently (defaults to PINECONE_NAMESPACE)")
+    filter: Optional[dict] = Field(None, description="Pinecone-style metadata filter on file_name, source, page or doc_type, e.g. {\"file_name\": \"report.pdf\", \"page\": {\"$lte\": 10}}")
+    timeout_seconds: Optional[float] = Field(None, description="Total time budget for the request (defaults to REQUEST_TIMEOUT_SECONDS)", gt=0)
+    debug: bool = Field(False, description="Include LLM token usage and retrieval context size in the response")
 
     class Config:
         json_schema_extra = {
             "example": {
                 "query": "What are the key security considerations mentioned in the document?",
                 "use_rag": True,
-                "k": 5
+                "k": 5,
+                "session_id": "user-123"
             }
         }
 
@@ -93,13 +162,30 @@ class QueryResponse(BaseModel):
     answer: str = Field(..., description="The answer to the user's question")
     query: str = Field(..., description="The original query")
     use_rag: bool = Field(..., description="Whether RAG was used")
+    session_id: Optional[str] = Field(None, description="Conversation session ID, if one was provided")
+    debug: Optional[dict] = Field(None, description="LLM token usage and throughput, and context tokens from retrieval (only when requested)")
 
     class Config:
         json_schema_extra = {
             "example": {
                 "answer": "Based on the document, the key security considerations include...",
                 "query": "What are the key security considerations mentioned in the document?",
-                "use_rag": True
+                "use_rag": True,
+                "session_id": "user-123"
+            }
+        }
+
+
+class AgentRequest(BaseModel):
+    """Request model for web search agent query."""
+    query: str = Field(..., description="The user's question/query", min_length=1)
+    timeout_seconds: Optional[float] = Field(None, description="Per-request timeout in seconds (overrides default if provided)", gt=0)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "query": "Is Hyderabad the new IT hub in India?",
+                "timeout_seconds": 60
             }
         }
 
@@ -113,7 +199,9 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "/query": "POST - Query the RAG system",
-            "/health": "GET - Health check"
+            "/agent": "POST - Query the web search agent",
+            "/health": "GET - Health check",
+            "/metrics": "GET - Service metrics"
         }
     }
 
@@ -135,6 +223,12 @@ async def health_check():
         raise HTTPException(status_code=500, detail=f"Health check failed: {str(e)}")
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """Metrics for this worker process (counters, gauges and latency histograms)."""
+    return metrics.snapshot()
+
+
 @app.post("/query", response_model=QueryResponse)
 async def query_rag(request: QueryRequest):
     """
@@ -143,30 +237,51 @@ async def query_rag(request: QueryRequest):
     - **query**: The user's question
     - **use_rag**: Whether to use RAG (retrieve from Pinecone) or just LLM
     - **k**: Number of documents to retrieve (optional, overrides default)
+    - **session_id**: Conversation session ID for follow-up questions (optional)
+    - **min_score**, **min_k**, **max_k**: Adaptive retrieval bounds (optional, override defaults)
+    - **namespaces**: Pinecone namespaces to search (optional, defaults to PINECONE_NAMESPACE)
+    - **filter**: Metadata filter pushed down into the vector search (optional)
+    - **timeout_seconds**: Total time budget; retrieval and generation get their deadlines from it (optional)
+    - **debug**: Include token usage and context size in the response (optional)
     """
-    logger.info(f"Query endpoint called with query: '{request.query}', use_rag: {request.use_rag}, k: {request.k}")
+    logger.info(f"Query endpoint called with query: '{request.query}', use_rag: {request.use_rag}, k: {request.k}, session_id: {request.session_id}")
     try:
         logger.info("Getting RAG instance...")
         rag = get_rag_instance()
         logger.info("RAG instance obtained")
         
-        # Override k if provided
-        if request.k is not None:
-            logger.info(f"Overriding k from {rag.k} to {request.k}")
-            rag.k = request.k
-        
-        # Query the RAG system
+        # Query the RAG system (k overrides the default per request if provided)
         logger.info(f"Calling rag.query() with use_rag={request.use_rag}...")
-        answer = rag.query(request.query, use_rag=request.use_rag)
+        result = await rag.aquery_detailed(
+            request.query,
+            use_rag=request.use_rag,
+            session_id=request.session_id,
+            k=request.k,
+            min_score=request.min_score,
+            min_k=request.min_k,
+            max_k=request.max_k,
+            namespaces=request.namespaces,
+            metadata_filter=request.filter,
+            timeout_seconds=request.timeout_seconds,
+        )
+        answer = result["answer"]
         logger.info(f"Query completed. Answer length: {len(answer) if answer else 0} characters")
         
         response = QueryResponse(
             answer=answer,
             query=request.query,
-            use_rag=request.use_rag
+            use_rag=request.use_rag,
+            session_id=request.session_id,
+            debug=result["debug"] if request.debug else None,
         )
         logger.info("Response created successfully")
         return response
+    except DeadlineExceededError as e:
+        logger.error(f"Query timed out: {e}")
+        raise HTTPException(status_code=504, detail=str(e))
+    except CircuitOpenError as e:
+        logger.error(f"Query rejected: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error processing query: {e}", exc_info=True)
         raise HTTPException(
@@ -175,6 +290,31 @@ async def query_rag(request: QueryRequest):
         )
 
 
+@app.post("/agent", response_model=AgentResponse)
+async def query_agent(request: AgentRequest):
+    """
+    Query the web search agent with a user question.
+    
+    - **query**: The user's question
+    - **timeout_seconds**: Per-request timeout (optional, overrides default)
+    """
+    logger.info(f"Agent endpoint called with query: '{request.query}', timeout: {request.timeout_seconds}")
+    try:
+        pool = get_agent_pool()
+        response = await pool.ainvoke(request.query, timeout_seconds=request.timeout_seconds)
+        logger.info(f"Agent query completed. Answer length: {len(response.answer)} characters")
+        return response
+    except AgentPoolTimeoutError as e:
+        logger.warning(f"Agent query timed out: {e}")
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error processing agent query: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing agent query: {str(e)}"
+        )
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,124 @@
+"""
+Recall@k versus embedding dimension.
+
+Fits PCA and truncation projections over the current embedding artifacts and
+reports, for each target dimension, how many of the exact full-dimension top-k
+chunks the reduced search still returns, together with the index size and the
+brute-force search time per query.
+
+Queries come from a JSON Lines file of {"query": ...} objects (the
+RAG/batch.py input format) or a query log written by RAG/warmup.py. Without
+one, the first sentence of a sample of chunks is used; such queries are drawn
+from the corpus itself, so treat the numbers as a relative comparison.
+
+Usage:
+    uv run python benchmarks/bench_reduction.py [--queries FILE] [--dims 64 96 128 192 256] [--k 5 10]
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+from RAG.ingestion.artifacts import iter_artifacts
+from RAG.ingestion.chunking import SENTENCE_BOUNDARY
+from RAG.ingestion.reduction import METHODS, fit_projection
+from config.settings import EMBEDDING_ARTIFACTS_DIR, EMBEDDING_MODEL_NAME
+
+
+def load_queries(path: Path | None, texts: list[str], sample: int, seed: int) -> list[str]:
+    """Read queries from a batch input or query log file, or sample first sentences of chunks."""
+    if path is not None:
+        content = path.read_text(encoding="utf-8")
+        if path.suffix == ".json":
+            # Query log: {query: [count, last_seen]}
+            return list(json.loads(content))[:sample]
+        return [json.loads(line)["query"] for line in content.splitlines() if line.strip()][:sample]
+    rng = random.Random(seed)
+    queries = []
+    for text in rng.sample(texts, min(sample, len(texts))):
+        sentence = next((s.strip() for s in SENTENCE_BOUNDARY.split(text) if len(s.split()) >= 5), None)
+        if sentence:
+            queries.append(sentence)
+    return queries
+
+
+def top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k best matches per query, best first."""
+    scores = queries @ corpus.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1)
+
+
+def search_seconds(corpus: np.ndarray, queries: np.ndarray, k: int, repeat: int) -> float:
+    """Best-of-``repeat`` time per query of a one-query-at-a-time brute-force search."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for query in queries:
+            scores = corpus @ query
+            np.argpartition(-scores, k - 1)[:k]
+        best = min(best, time.perf_counter() - start)
+    return best / len(queries)
+
+
+def recall(reduced: np.ndarray, exact: np.ndarray, k: int) -> float:
+    """Mean fraction of the exact top-k found in the reduced top-k."""
+    return float(np.mean([len(set(r[:k]) & set(e[:k])) / k for r, e in zip(reduced, exact)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--artifacts-dir", type=Path, default=Path(EMBEDDING_ARTIFACTS_DIR))
+    parser.add_argument("--queries", type=Path, help="JSON Lines file of {\"query\": ...} or a query log (.json)")
+    parser.add_argument("--sample", type=int, default=200, help="Queries to use")
+    parser.add_argument("--dims", type=int, nargs="+", default=[32, 64, 96, 128, 192, 256])
+    parser.add_argument("--methods", nargs="+", choices=METHODS, default=list(METHODS))
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 10])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    artifacts = list(iter_artifacts(args.artifacts_dir))
+    if not artifacts:
+        sys.exit(f"No embedding artifacts in {args.artifacts_dir}; run ingestion first")
+    corpus = np.vstack([np.asarray(a.vectors, dtype=np.float32) for a in artifacts])
+    texts = [text for a in artifacts for text in a.texts]
+    queries = load_queries(args.queries, texts, args.sample, args.seed)
+    query_vectors = SentenceTransformer(EMBEDDING_MODEL_NAME).encode(queries, normalize_embeddings=True)
+    full_dim = corpus.shape[1]
+    max_k = min(max(args.k), len(corpus))
+    exact = top_k(corpus, query_vectors, max_k)
+    print(f"{len(corpus)} vectors x {full_dim} dims from {len(artifacts)} artifacts, {len(queries)} queries\n")
+
+    recall_columns = "".join(f"{f'recall@{k}':>11}" for k in args.k)
+    print(f"{'method':<9}{'dims':>5}{'index MiB':>11}{'size':>7}{recall_columns}{'search µs':>11}")
+    full_seconds = search_seconds(corpus, query_vectors, max_k, args.repeat)
+    print(f"{'full':<9}{full_dim:>5}{corpus.nbytes / 2**20:>11.2f}{'1.0x':>7}"
+          f"{''.join(f'{1.0:>11.3f}' for _ in args.k)}{full_seconds * 1e6:>11.1f}")
+
+    for method in args.methods:
+        for dim in sorted(args.dims):
+            try:
+                projection = fit_projection(corpus, dim, method=method, model_name=EMBEDDING_MODEL_NAME)
+            except ValueError as e:
+                print(f"{method:<9}{dim:>5}  skipped: {e}")
+                continue
+            reduced_corpus = projection.apply(corpus)
+            reduced_queries = projection.apply(query_vectors)
+            found = top_k(reduced_corpus, reduced_queries, max_k)
+            seconds = search_seconds(reduced_corpus, reduced_queries, max_k, args.repeat)
+            recalls = "".join(f"{recall(found, exact, k):>11.3f}" for k in args.k)
+            print(f"{method:<9}{dim:>5}{reduced_corpus.nbytes / 2**20:>11.2f}{f'{full_dim / dim:.1f}x':>7}"
+                  f"{recalls}{seconds * 1e6:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
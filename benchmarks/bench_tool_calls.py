@@ -0,0 +1,108 @@
+"""
+Parallel tool call benchmark.
+
+Runs the agent from create_agent_instance with a fake model that emits
+several search calls in one turn and a fake search tool with configurable
+latency, and reports the wall time of the turn for different concurrency
+limits. One extra run makes a call slower than the tool timeout to show it
+being cut off. Results must come back in the order the calls were made.
+
+Usage:
+    uv run python benchmarks/bench_tool_calls.py [--calls N] [--latency SECONDS] [--repeat N]
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.tools import StructuredTool
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+from agent.agent_factory import create_agent_instance
+from tools.search import FixtureSearchBackend
+
+# A "slow" query takes this many times the normal latency
+SLOW_FACTOR = 10
+
+
+class FakeToolCallingModel(GenericFakeChatModel):
+    """Fake chat model that replays canned messages, including tool calls."""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+def make_search_tool(latency_seconds: float) -> StructuredTool:
+    """Fake tavily_search that sleeps ``latency_seconds`` (SLOW_FACTOR times that for queries starting with 'slow')."""
+    backend = FixtureSearchBackend()
+
+    def tavily_search(query: str) -> dict:
+        time.sleep(latency_seconds * (SLOW_FACTOR if query.startswith("slow") else 1))
+        return backend.search(query)
+
+    return StructuredTool.from_function(func=tavily_search, name="tavily_search", description="Search the web.")
+
+
+def make_model(queries: list[str]) -> FakeToolCallingModel:
+    """Model that searches for all ``queries`` in one turn and then answers."""
+    return FakeToolCallingModel(messages=iter([
+        AIMessage(content="", tool_calls=[
+            {"name": "tavily_search", "args": {"query": query}, "id": f"call_{i}"}
+            for i, query in enumerate(queries)
+        ]),
+        AIMessage(content="", tool_calls=[
+            {"name": "AgentResponse", "args": {"answer": "done", "sources": []}, "id": "final"},
+        ]),
+    ]))
+
+
+def run_once(queries: list[str], latency: float, concurrency: int, timeout: float, use_async: bool) -> tuple[float, list]:
+    agent = create_agent_instance(
+        llm=make_model(queries),
+        tools=[make_search_tool(latency)],
+        tool_max_concurrency=concurrency,
+        tool_timeout_seconds=timeout,
+    )
+    inputs = {"messages": [{"role": "user", "content": "benchmark"}]}
+    start = time.perf_counter()
+    result = asyncio.run(agent.ainvoke(inputs)) if use_async else agent.invoke(inputs)
+    elapsed = time.perf_counter() - start
+    tool_messages = [m for m in result["messages"] if m.type == "tool" and m.name == "tavily_search"]
+    return elapsed, tool_messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent agent tool calls")
+    parser.add_argument("--calls", type=int, default=4, help="Tool calls emitted in one turn")
+    parser.add_argument("--latency", type=float, default=0.5, help="Latency of the fake search tool in seconds")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per configuration (best is reported)")
+    args = parser.parse_args()
+
+    queries = [f"query {i}" for i in range(args.calls)]
+    timeout = args.latency * 3
+    print(f"{args.calls} tool calls per turn, {args.latency}s each, tool timeout {timeout:g}s\n")
+    print(f"{'mode':<6} {'concurrency':>11} {'best (s)':>9} {'ideal (s)':>9}  order")
+
+    for use_async in (False, True):
+        for concurrency in sorted({1, 2, args.calls}):
+            timings = []
+            for _ in range(args.repeat):
+                elapsed, tool_messages = run_once(queries, args.latency, concurrency, timeout, use_async)
+                timings.append(elapsed)
+            in_order = [m.tool_call_id for m in tool_messages] == [f"call_{i}" for i in range(args.calls)]
+            ideal = args.latency * -(-args.calls // concurrency)
+            mode = "async" if use_async else "sync"
+            print(f"{mode:<6} {concurrency:>11} {min(timings):>9.3f} {ideal:>9.3f}  {'ok' if in_order else 'WRONG'}")
+
+    # One call is much slower than the tool timeout: the turn ends at the timeout
+    elapsed, tool_messages = run_once(["slow query", *queries[1:]], args.latency, args.calls, timeout, use_async=False)
+    timed_out = [m.tool_call_id for m in tool_messages if m.status == "error"]
+    print(f"\nWith one call {SLOW_FACTOR}x slower: {elapsed:.3f}s (timeout {timeout:g}s), timed out: {timed_out}")
+
+
+if __name__ == "__main__":
+    main()
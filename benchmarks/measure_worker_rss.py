@@ -0,0 +1,102 @@
+"""
+Per-worker memory measurement for multi-process serving.
+
+Starts the API with N workers using the pre-fork server (serve.py) and with
+plain ``uvicorn --workers``, waits until it is healthy, and reports RSS, PSS
+and shared memory for every worker. PSS divides shared pages among the
+processes sharing them, so it shows what each worker really costs.
+
+Usage:
+    uv run python benchmarks/measure_worker_rss.py --workers 4
+"""
+
+import os
+import sys
+import time
+import signal
+import argparse
+import subprocess
+import urllib.request
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+from serve import read_memory_usage
+
+
+def child_pids(parent: int) -> list[int]:
+    """Find the direct children of a process by scanning /proc."""
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces, so split after its closing parenthesis
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == parent:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def wait_healthy(port: int, timeout: float) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=5) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(1)
+    raise TimeoutError(f"Server on port {port} did not become healthy within {timeout}s")
+
+
+def measure(name: str, command: list[str], port: int, workers: int, timeout: float) -> None:
+    process = subprocess.Popen(command, cwd=project_root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_healthy(port, timeout)
+        # Hit every worker at least once so lazily created state is included
+        for _ in range(workers * 4):
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=30).read()
+        pids = [pid for pid in child_pids(process.pid) if pid != process.pid]
+        # uvicorn --workers forks a resource tracker too; keep the server processes
+        usages = {pid: read_memory_usage(pid) for pid in pids}
+        usages = {pid: u for pid, u in usages.items() if u["rss"] > 50}
+        parent = read_memory_usage(process.pid)
+
+        print(f"\n{name}")
+        print(f"  {'process':>10} {'RSS':>9} {'PSS':>9} {'shared':>9} {'private':>9}   (MiB)")
+        print(f"  {'parent':>10} {parent['rss']:>9} {parent['pss']:>9} {parent['shared']:>9} {parent['private']:>9}")
+        for pid, u in usages.items():
+            print(f"  {pid:>10} {u['rss']:>9} {u['pss']:>9} {u['shared']:>9} {u['private']:>9}")
+        total_pss = parent["pss"] + sum(u["pss"] for u in usages.values())
+        print(f"  total PSS: {total_pss:.1f} MiB, per worker: {total_pss / max(1, len(usages)):.1f} MiB")
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    measure(
+        f"serve.py (pre-fork, shared models), {args.workers} workers",
+        [sys.executable, "serve.py", "--workers", str(args.workers), "--port", str(args.port)],
+        args.port, args.workers, args.timeout,
+    )
+    measure(
+        f"uvicorn --workers {args.workers} (each worker loads its own models)",
+        [sys.executable, "-m", "uvicorn", "app:app", "--workers", str(args.workers), "--port", str(args.port + 1)],
+        args.port + 1, args.workers, args.timeout,
+    )
+
+
+if __name__ == "__main__":
+    main()
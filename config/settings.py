@@ -1,5 +1,11 @@
 """Application settings and configuration."""
 
+import os
+from dotenv import load_dotenv
+
+# Settings below read the environment, so load .env first
+load_dotenv()
+
 # Ollama model configuration
 # IMPORTANT: Use full 8b model for proper tool calling!
 # 1b models cannot properly format tool calls (see TAVILY_TOOL_ISSUE.md)
@@ -9,3 +15,90 @@ OLLAMA_BASE_URL = "http://localhost:11434"  # Default Ollama URL
 # Debug mode
 DEBUG_MODE = False
 
+# Web search configuration
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "tavily")  # "tavily" or "fixture" (offline)
+SEARCH_FIXTURE_PATH = os.getenv("SEARCH_FIXTURE_PATH")  # JSON file mapping queries to results
+SEARCH_FIXTURE_LATENCY_SECONDS = float(os.getenv("SEARCH_FIXTURE_LATENCY_SECONDS", "0"))
+SEARCH_MAX_RESULTS = 3  # Number of search results to return
+SEARCH_CACHE_TTL_SECONDS = 3600
+SEARCH_CACHE_MAX_ENTRIES = 512
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH")  # Persist the search cache if set
+SEARCH_CACHE_SAVE_EVERY = 20  # New entries between saves of a persisted search cache (also saved at exit)
+SEARCH_TIMEOUT_SECONDS = 10.0  # Total budget for a multi-query fan-out
+SEARCH_MAX_WORKERS = 4
+
+# Agent serving configuration
+AGENT_POOL_SIZE = int(os.getenv("AGENT_POOL_SIZE", "4"))  # Pre-built agents, also the concurrency cap
+AGENT_TIMEOUT_SECONDS = 120.0  # Default per-request timeout for /agent
+AGENT_TOOL_MAX_CONCURRENCY = 4  # Tool calls from one model turn that run at once
+AGENT_TOOL_TIMEOUT_SECONDS = 20.0  # A slower tool call is reported to the model as an error
+
+# Conversation memory configuration
+MEMORY_MAX_HISTORY_TOKENS = 1024  # Verbatim history budget; older turns are summarized
+MEMORY_MAX_SESSIONS = 1000
+MEMORY_SESSION_TTL_SECONDS = 3600
+MEMORY_CONDENSE_BUDGET_SHARE = 0.25  # Share of the remaining request budget the follow-up condensing call may use
+
+# Retrieval configuration
+RETRIEVAL_ADAPTIVE = True  # Cut results by score instead of always returning k
+RETRIEVAL_MIN_SCORE = 0.3  # Matches scoring below this are never used as context
+RETRIEVAL_MIN_SCORE_GAP = 0.1  # Cut at the largest score drop if it is at least this big
+RETRIEVAL_MIN_K = 1  # Never cut below this many matches at a score gap
+RETRIEVAL_OVERFETCH_FACTOR = 4  # Candidates fetched per returned match (child chunks collapse into parents)
+RETRIEVAL_TIMEOUT_SECONDS = 5.0  # Deadline for vector store queries (shared when querying several namespaces)
+RETRIEVAL_MAX_WORKERS = 8  # Concurrent namespace queries
+RETRIEVAL_HEDGE_PERCENTILE = 95  # Fire a duplicate vector store query once this latency percentile has passed
+RETRIEVAL_HEDGE_DEFAULT_DELAY_SECONDS = 0.25  # Hedge delay until enough latencies are recorded
+RETRIEVAL_HEDGE_MIN_DELAY_SECONDS = 0.02
+RETRIEVAL_HEDGE_MIN_SAMPLES = 20
+RETRIEVAL_CONTEXT_MAX_TOKENS = 2048  # Token budget for retrieved context (at least one document is always kept)
+EMBEDDING_CACHE_MAX_ENTRIES = 2048  # Query embeddings kept in memory (LRU)
+
+# Request deadlines and circuit breakers
+REQUEST_TIMEOUT_SECONDS = 60.0  # Default total budget for a /query request
+RETRIEVAL_BUDGET_SHARE = 0.25  # Share of the remaining budget retrieval may use (capped at RETRIEVAL_TIMEOUT_SECONDS)
+LLM_TIMEOUT_SECONDS = 45.0  # Longest an LLM call may take, and the hard HTTP timeout for Ollama calls; keep below REQUEST_TIMEOUT_SECONDS
+LLM_MAX_CONCURRENCY = 16  # Threads available for concurrent LLM calls
+BREAKER_FAILURE_THRESHOLD = 5  # Consecutive failures that open a dependency's circuit
+BREAKER_RESET_SECONDS = 30.0  # Time an open circuit waits before a trial call
+ANSWER_CACHE_TTL_SECONDS = 86400  # Last good answers, served when the LLM is unavailable
+ANSWER_CACHE_MAX_ENTRIES = 1024
+
+# Startup warmup (RAG/warmup.py)
+QUERY_LOG_PATH = os.getenv("QUERY_LOG_PATH")  # Record popular queries to this JSON file if set
+QUERY_LOG_MAX_ENTRIES = 2000  # Distinct queries kept in the log (least popular are dropped)
+QUERY_LOG_FLUSH_EVERY = 100  # Merge recorded queries into the file every N queries
+WARMUP_TOP_N = 100  # Popular queries replayed through embedding and retrieval at startup
+WARMUP_TIME_BUDGET_SECONDS = 20.0  # Startup warmup stops when this is spent
+ANSWER_SNAPSHOT_PATH = os.getenv("ANSWER_SNAPSHOT_PATH")  # Shared answer cache snapshot, loaded at startup and saved at shutdown
+
+# Batch question runner (RAG/batch.py)
+BATCH_CONCURRENCY = 8  # Questions in flight at a time
+
+# Embedding and chunking configuration
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_REDUCTION = os.getenv("EMBEDDING_REDUCTION") or None  # "pca" or "truncate" to index reduced vectors
+EMBEDDING_REDUCED_DIM = int(os.getenv("EMBEDDING_REDUCED_DIM", "128"))  # Pinecone index dimension must match
+CHUNK_MAX_TOKENS = None  # Defaults to the embedding model's window (256) minus special tokens
+CHUNK_OVERLAP_TOKENS = 32
+CHUNK_WORKERS = 4  # Threads used to split pages in parallel
+CHUNK_SMALL_TO_BIG = True  # Embed small child chunks and retrieve their parent spans
+CHUNK_CHILD_MAX_TOKENS = 128  # Embedded child chunk size
+CHUNK_PARENT_MAX_TOKENS = 1024  # Parent span size (about a page); parents split at sections
+CHUNK_CLEAN_TEXT = False  # Strip repeated page headers/footers and page numbers, collapse whitespace
+CHUNK_COMPACT_RATIO = None  # Length of the stored extractive compact form, e.g. 0.5 (None to disable)
+
+# Ingestion configuration
+INGEST_BATCH_SIZE = 10  # Vectors per upsert request
+INGEST_UPSERTS_PER_SECOND = 5.0  # Sustained upsert request rate
+INGEST_UPSERT_BURST = 10  # Upsert requests allowed in a burst
+INGEST_MAX_RETRIES = 5
+INGEST_BACKOFF_BASE_SECONDS = 0.5
+INGEST_BACKOFF_MAX_SECONDS = 30.0
+
+# Vector store configuration
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone")  # "pinecone" or "local" (in-process index built from artifacts)
+EMBEDDING_ARTIFACTS_DIR = os.getenv(
+    "EMBEDDING_ARTIFACTS_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "RAG", "artifacts"),
+)
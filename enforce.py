@@ -1,7 +1,12 @@
 import re
+import json
+import time
 import logging
-from pydantic import ValidationError
+from typing import Any
+from pydantic import TypeAdapter, ValidationError
 from schemas.response import AgentResponse
+from models.usage import ollama_usage, record_usage, stream_usage
+from RAG.tokens import estimate_tokens
 
 # Set up logging
 logging.basicConfig(
@@ -10,6 +15,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Non-whitespace characters tolerated before the JSON object starts (e.g. a ```json fence)
+MAX_PREAMBLE_CHARS = 40
+# How much of an invalid output is echoed back in the repair prompt
+REPAIR_EXCERPT_CHARS = 300
+
+_FIELD_ADAPTERS = {
+    name: TypeAdapter(field.annotation)
+    for name, field in AgentResponse.model_fields.items()
+}
+
+
+class OffFormatError(ValueError):
+    """Raised when streamed output has clearly stopped looking like the expected JSON."""
+
+
 def extract_json(text: str) -> str:
     # Grab first {...} block
     m = re.search(r"\{.*\}", text, flags=re.DOTALL)
@@ -21,7 +41,166 @@ def enforce_agent_response(raw_text: str) -> AgentResponse:
     json_text = extract_json(raw_text)
     return AgentResponse.model_validate_json(json_text)
 
+
+def validate_field(name: str, value: Any) -> None:
+    """Validate a single completed top-level AgentResponse field."""
+    adapter = _FIELD_ADAPTERS.get(name)
+    if adapter is None:
+        raise OffFormatError(f"Unexpected key in model output: {name!r}")
+    adapter.validate_python(value)
+
+
+class IncrementalJSONParser:
+    """Scan streamed text for the first top-level JSON object.
+
+    Tracks string/escape state and nesting depth as characters arrive, so the
+    end of the object is known the moment it is generated. Every time a
+    top-level field is finished (a comma or the closing brace at depth 1) the
+    completed fields are parsed and handed back for validation.
+    """
+
+    def __init__(self, max_preamble: int = MAX_PREAMBLE_CHARS):
+        self.max_preamble = max_preamble
+        self.preamble = 0
+        self.buffer = []
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.done = False
+        self.seen_fields = set()
+        self.result = None
+
+    def feed(self, text: str) -> list[tuple[str, Any]]:
+        """Consume a chunk of model output.
+
+        Args:
+            text: The next streamed chunk
+
+        Returns:
+            list[tuple[str, Any]]: Top-level fields completed by this chunk
+
+        Raises:
+            OffFormatError: If the output cannot be the expected JSON object
+        """
+        completed = []
+        for ch in text:
+            if self.done:
+                break
+            if self.depth == 0:
+                if ch == "{":
+                    self.depth = 1
+                    self.buffer.append(ch)
+                elif not ch.isspace():
+                    self.preamble += 1
+                    if self.preamble > self.max_preamble:
+                        raise OffFormatError("Model output does not start with a JSON object.")
+                continue
+
+            self.buffer.append(ch)
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                self.depth += 1
+            elif ch in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.done = True
+                    self.result = self._parse("".join(self.buffer))
+                    completed.extend(self._new_fields(self.result))
+            elif ch == "," and self.depth == 1:
+                partial = self._parse("".join(self.buffer[:-1]) + "}")
+                completed.extend(self._new_fields(partial))
+        return completed
+
+    def _parse(self, text: str) -> dict:
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise OffFormatError(f"Invalid JSON in model output: {e}") from e
+        if not isinstance(value, dict):
+            raise OffFormatError("Model output is not a JSON object.")
+        return value
+
+    def _new_fields(self, obj: dict) -> list[tuple[str, Any]]:
+        fields = [(k, v) for k, v in obj.items() if k not in self.seen_fields]
+        self.seen_fields.update(k for k, _ in fields)
+        return fields
+
+
+def stream_agent_response(agent, messages) -> tuple[AgentResponse, str]:
+    """Stream one completion and validate it while it is being generated.
+
+    Generation is stopped as soon as the JSON object is closed, or as soon as
+    the output goes off-format or a completed field fails validation.
+
+    Token usage is recorded under ``llm.enforce.*``. Ollama only reports its
+    counts at the end of a stream, so for a stream stopped early the usage is
+    estimated from the chunks received and their timing.
+
+    Returns:
+        tuple[AgentResponse, str]: The validated response and the raw text seen
+
+    Raises:
+        ValidationError, ValueError: If the output is invalid. The raw text seen
+            so far is attached as ``raw_text`` on the exception.
+    """
+    parser = IncrementalJSONParser()
+    raw_parts = []
+    usage = None
+    started_at = time.perf_counter()
+    first_chunk_at = last_chunk_at = None
+    stream = agent.stream(messages)
+    try:
+        for chunk in stream:
+            last_chunk_at = time.perf_counter()
+            if first_chunk_at is None:
+                first_chunk_at = last_chunk_at
+            usage = ollama_usage(chunk) or usage
+            text = chunk.content if hasattr(chunk, "content") else str(chunk)
+            if not isinstance(text, str):
+                text = str(text)
+            raw_parts.append(text)
+            for name, value in parser.feed(text):
+                validate_field(name, value)
+            if parser.done:
+                break
+    except (ValidationError, ValueError) as e:
+        e.raw_text = "".join(raw_parts)
+        raise
+    finally:
+        # Closing the generator stops generation on the Ollama side
+        if hasattr(stream, "close"):
+            stream.close()
+        if usage is None:
+            prompt_text = " ".join(
+                str(message.get("content", "") if isinstance(message, dict) else getattr(message, "content", message))
+                for message in messages
+            )
+            usage = stream_usage(len(raw_parts), started_at, first_chunk_at, last_chunk_at, estimate_tokens(prompt_text))
+        record_usage("enforce", usage)
+
+    raw_text = "".join(raw_parts)
+    if not parser.done:
+        e = OffFormatError("Model output ended before the JSON object was complete.")
+        e.raw_text = raw_text
+        raise e
+    try:
+        return AgentResponse.model_validate(parser.result), raw_text
+    except ValidationError as e:
+        e.raw_text = raw_text
+        raise
+
 def build_repair_prompt(error: Exception, raw_text: str) -> str:
+    excerpt = raw_text[:REPAIR_EXCERPT_CHARS]
+    if len(raw_text) > REPAIR_EXCERPT_CHARS:
+        excerpt += "..."
     return f"""
 Your previous response was INVALID.
 
@@ -39,33 +218,38 @@ Rules:
 - sources must be URLs from Tavily results only (do not invent links)
 - no markdown, no extra keys, no text outside JSON
 
-Here was your invalid output:
-{raw_text}
+Start of your invalid output:
+{excerpt}
 """.strip()
 
 def enforce_with_retries(agent, messages, max_retries: int = 3) -> AgentResponse:
+    """Stream completions until one validates as an AgentResponse.
+
+    Each retry sends the original messages plus a single compact repair prompt
+    rather than the accumulated history of failed attempts.
+    """
     last_err = None
     last_raw = None
+    base_messages = list(messages)
+    attempt_messages = base_messages
 
     logger.info(f"Starting structured output enforcement with max_retries={max_retries}")
 
     for attempt in range(1, max_retries + 1):
-        logger.info(f"Attempt {attempt}/{max_retries}: Invoking LLM...")
-        ai = agent.invoke(messages)
-        last_raw = ai.content
-        logger.debug(f"Raw LLM response (first 200 chars): {last_raw[:200]}...")
+        logger.info(f"Attempt {attempt}/{max_retries}: Streaming LLM response...")
 
         try:
-            logger.info(f"Attempt {attempt}: Parsing structured response...")
-            result = enforce_agent_response(last_raw)
+            result, last_raw = stream_agent_response(agent, attempt_messages)
             logger.info(f"Attempt {attempt}: Successfully parsed structured response")
             return result
         except (ValidationError, ValueError) as e:
             last_err = e
+            last_raw = getattr(e, "raw_text", "")
+            logger.debug(f"Raw LLM response (first 200 chars): {last_raw[:200]}...")
             logger.warning(f"Attempt {attempt}: Failed to parse response - {type(e).__name__}: {str(e)}")
             if attempt < max_retries:
                 logger.info(f"Attempt {attempt}: Retrying with repair prompt...")
-                messages = messages + [{"role": "user", "content": build_repair_prompt(e, last_raw)}]
+                attempt_messages = base_messages + [{"role": "user", "content": build_repair_prompt(e, last_raw)}]
             else:
                 logger.error(f"Attempt {attempt}: Max retries reached. Giving up.")
 
@@ -0,0 +1,9 @@
+"""Metrics module."""
+
+from metrics.registry import MetricsRegistry, Histogram, metrics
+
+__all__ = [
+    "MetricsRegistry",
+    "Histogram",
+    "metrics",
+]
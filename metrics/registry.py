@@ -0,0 +1,110 @@
+"""In-process metrics: counters, gauges and latency histograms."""
+
+import threading
+from collections import deque
+
+
+class Histogram:
+    """Running count/sum/min/max plus a window of recent values for percentiles (all values if window is None)."""
+
+    def __init__(self, window: int | None = 2048):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.recent.append(value)
+
+    def percentile(self, q: float) -> float | None:
+        """Return the q-th percentile (0-100) of the recent window."""
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class MetricsRegistry:
+    """
+    Thread-safe registry of named metrics.
+    
+    Metrics are per process; with several workers each worker reports its own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, float] = {}
+        self._gauges: dict[str, float] = {}
+        self._histograms: dict[str, Histogram] = {}
+
+    def inc(self, name: str, value: float = 1) -> None:
+        """Increment a counter."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set a gauge to its current value."""
+        with self._lock:
+            self._gauges[name] = value
+
+    def add_gauge(self, name: str, delta: float) -> None:
+        """Adjust a gauge up or down."""
+        with self._lock:
+            self._gauges[name] = self._gauges.get(name, 0) + delta
+
+    def observe(self, name: str, value: float) -> None:
+        """Record a value (e.g. a latency in seconds) in a histogram."""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def percentile(self, name: str, q: float, min_count: int = 1) -> float | None:
+        """Return the q-th percentile of a histogram, or None with fewer than ``min_count`` observations."""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None or histogram.count < min_count:
+                return None
+            return histogram.percentile(q)
+
+    def get_histogram(self, name: str) -> Histogram | None:
+        """Return a histogram by name, if it has any observations."""
+        return self._histograms.get(name)
+
+    def snapshot(self) -> dict:
+        """Return all metrics as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "histograms": {name: h.summary() for name, h in self._histograms.items()},
+            }
+
+    def reset(self) -> None:
+        """Clear all metrics."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+# Process-wide registry
+metrics = MetricsRegistry()
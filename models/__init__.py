@@ -1,7 +1,18 @@
 """Model initialization module."""
 
-from models.ollama_model import create_ollama_model
+from models.ollama_model import create_ollama_model, get_ollama_model, get_structured_ollama_model
+from models.usage import ollama_usage, stream_usage, combine_usage, messages_usage, with_rates, record_usage
 
-__all__ = ["create_ollama_model"]
+__all__ = [
+    "create_ollama_model",
+    "get_ollama_model",
+    "get_structured_ollama_model",
+    "ollama_usage",
+    "stream_usage",
+    "combine_usage",
+    "messages_usage",
+    "with_rates",
+    "record_usage",
+]
 
 
@@ -1,7 +1,8 @@
 """Ollama model creation and configuration."""
 
+from functools import lru_cache
 from langchain_ollama import ChatOllama
-from config.settings import OLLAMA_MODEL, OLLAMA_BASE_URL
+from config.settings import OLLAMA_MODEL, OLLAMA_BASE_URL, LLM_TIMEOUT_SECONDS
 
 
 def create_ollama_model():
@@ -19,6 +20,7 @@ def create_ollama_model():
             base_url=OLLAMA_BASE_URL,
             temperature=0.7,  # Controls randomness (0.0 to 1.0)
             num_ctx=4096,  # Context window size
+            client_kwargs={"timeout": LLM_TIMEOUT_SECONDS},  # Never wait on a wedged server forever
         )
         return ollama_model
     except Exception as e:
@@ -27,3 +29,31 @@ def create_ollama_model():
             f"Make sure Ollama is running (ollama serve) and model is installed (ollama pull {OLLAMA_MODEL})"
         )
 
+
+@lru_cache(maxsize=None)
+def get_ollama_model():
+    """Get the shared Ollama chat model, creating it on first use.
+    
+    ChatOllama is a thin client around the Ollama HTTP API, so a single
+    instance can be reused across requests instead of being rebuilt per call.
+    
+    Returns:
+        ChatOllama: Cached Ollama chat model
+    """
+    return create_ollama_model()
+
+
+@lru_cache(maxsize=None)
+def get_structured_ollama_model(schema, include_raw: bool = False):
+    """Get a cached Ollama model bound to a structured output schema.
+    
+    Args:
+        schema: Pydantic model class the output should be parsed into
+        include_raw: Return a dict with the raw AIMessage ('raw'), the parsed
+            output ('parsed') and any 'parsing_error' instead of raising, so
+            the response metadata (token counts) is kept (default: False)
+        
+    Returns:
+        Runnable: Cached runnable returning instances of ``schema``
+    """
+    return get_ollama_model().with_structured_output(schema, include_raw=include_raw)
@@ -0,0 +1,130 @@
+"""Token and timing accounting from Ollama response metadata."""
+
+from typing import Iterable, Optional
+from metrics import metrics
+
+# Ollama reports durations in nanoseconds
+NANOSECONDS_PER_SECOND = 1e9
+
+_SUMMED_FIELDS = ("calls", "prompt_tokens", "completion_tokens", "prefill_seconds", "decode_seconds", "total_seconds")
+
+
+def ollama_usage(message) -> Optional[dict]:
+    """Extract token counts and timings from an Ollama chat response.
+
+    Args:
+        message: AIMessage (or final stream chunk) returned by ChatOllama
+
+    Returns:
+        dict | None: calls, prompt_tokens, completion_tokens, prefill_seconds,
+            decode_seconds and total_seconds, or None if the message carries
+            no Ollama metadata (e.g. a stream that was stopped early)
+    """
+    metadata = getattr(message, "response_metadata", None) or {}
+    if "prompt_eval_count" not in metadata and "eval_count" not in metadata:
+        return None
+    return {
+        "calls": 1,
+        "prompt_tokens": metadata.get("prompt_eval_count") or 0,
+        "completion_tokens": metadata.get("eval_count") or 0,
+        "prefill_seconds": (metadata.get("prompt_eval_duration") or 0) / NANOSECONDS_PER_SECOND,
+        "decode_seconds": (metadata.get("eval_duration") or 0) / NANOSECONDS_PER_SECOND,
+        "total_seconds": (metadata.get("total_duration") or 0) / NANOSECONDS_PER_SECOND,
+    }
+
+
+def stream_usage(completion_chunks: int, started_at: float, first_chunk_at: Optional[float], last_chunk_at: Optional[float], prompt_tokens: int) -> dict:
+    """Estimate usage of a stream that was stopped before Ollama sent its final counts.
+
+    Each streamed chunk carries one token, prefill time is the time to the
+    first chunk and decode time runs from the first chunk to the last.
+
+    Args:
+        completion_chunks: Content chunks received
+        started_at: ``time.perf_counter()`` when the request was sent
+        first_chunk_at: ``time.perf_counter()`` at the first chunk (None if none arrived)
+        last_chunk_at: ``time.perf_counter()`` at the last chunk
+        prompt_tokens: Estimated prompt tokens
+
+    Returns:
+        dict: Usage in the same shape as :func:`ollama_usage`, marked 'estimated'
+    """
+    first_chunk_at = first_chunk_at or started_at
+    last_chunk_at = last_chunk_at or first_chunk_at
+    return {
+        "calls": 1,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_chunks,
+        "prefill_seconds": first_chunk_at - started_at,
+        "decode_seconds": last_chunk_at - first_chunk_at,
+        "total_seconds": last_chunk_at - started_at,
+        "estimated": True,
+    }
+
+
+def combine_usage(usages: Iterable[Optional[dict]]) -> Optional[dict]:
+    """Sum the usage of several LLM calls (None entries are skipped).
+
+    Returns:
+        dict | None: Combined usage, or None if no call reported any
+    """
+    combined = None
+    for usage in usages:
+        if usage is None:
+            continue
+        if combined is None:
+            combined = {field: 0 for field in _SUMMED_FIELDS}
+        for field in _SUMMED_FIELDS:
+            combined[field] += usage.get(field) or 0
+    return combined
+
+
+def messages_usage(messages) -> Optional[dict]:
+    """Combined usage of every Ollama response in a list of messages (e.g. an agent run)."""
+    return combine_usage(ollama_usage(message) for message in messages or [])
+
+
+def with_rates(usage: Optional[dict]) -> Optional[dict]:
+    """Return a copy of ``usage`` with prefill and decode tokens/sec added.
+
+    A rate is None when its duration is zero, e.g. when Ollama reused a
+    cached prompt and did no prefill work.
+    """
+    if usage is None:
+        return None
+    rated = dict(usage)
+    rated["prefill_tokens_per_second"] = (
+        usage["prompt_tokens"] / usage["prefill_seconds"] if usage.get("prefill_seconds") else None
+    )
+    rated["decode_tokens_per_second"] = (
+        usage["completion_tokens"] / usage["decode_seconds"] if usage.get("decode_seconds") else None
+    )
+    return rated
+
+
+def record_usage(source: str, usage: Optional[dict]) -> Optional[dict]:
+    """Add one request's LLM usage to the metrics registry.
+
+    Totals are counted under ``llm.<source>.*``; prompt tokens per request
+    and prefill/decode tokens/sec are recorded as histograms.
+
+    Args:
+        source: Caller name, e.g. "rag" or "agent"
+        usage: Usage from :func:`ollama_usage` or :func:`combine_usage`
+
+    Returns:
+        dict | None: The usage with rates added (see :func:`with_rates`)
+    """
+    rated = with_rates(usage)
+    if rated is None:
+        metrics.inc(f"llm.{source}.unreported")
+        return None
+    metrics.inc(f"llm.{source}.calls", rated["calls"])
+    metrics.inc(f"llm.{source}.prompt_tokens", rated["prompt_tokens"])
+    metrics.inc(f"llm.{source}.completion_tokens", rated["completion_tokens"])
+    metrics.observe(f"llm.{source}.prompt_tokens_per_request", rated["prompt_tokens"])
+    if rated["prefill_tokens_per_second"] is not None:
+        metrics.observe(f"llm.{source}.prefill_tokens_per_second", rated["prefill_tokens_per_second"])
+    if rated["decode_tokens_per_second"] is not None:
+        metrics.observe(f"llm.{source}.decode_tokens_per_second", rated["decode_tokens_per_second"])
+    return rated
@@ -1,5 +1,6 @@
 """Prompt template utilities."""
 
+from functools import lru_cache
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
 from schemas.response import AgentResponse
@@ -56,9 +57,12 @@ def get_full_prompt_template() -> str:
     ).partial(format_instructions=format_instructions)
 
 
+@lru_cache(maxsize=None)
 def get_system_prompt() -> str:
     """Get formatted system prompt with format instructions.
     
+    The prompt is static, so it is formatted once and cached.
+    
     Returns:
         str: Formatted system prompt string with Pydantic format instructions
     """
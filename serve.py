@@ -0,0 +1,160 @@
+"""
+Pre-fork multi-worker server for the RAG API.
+
+The parent process imports the application once, which loads the embedding
+model, the vector index (for VECTOR_STORE=local) and the RAG instance. It then
+binds the listening socket and forks the workers, so every worker shares the
+parent's model memory copy-on-write instead of loading its own copy, as it
+would with ``uvicorn --workers``.
+
+Usage:
+    uv run python serve.py --workers 4 --port 8000
+"""
+
+import os
+import gc
+import sys
+import time
+import signal
+import socket
+import logging
+import argparse
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+logger = logging.getLogger("serve")
+
+
+def read_memory_usage(pid: int) -> dict:
+    """
+    Read a process's memory usage from /proc (Linux only).
+    
+    Args:
+        pid: Process ID
+        
+    Returns:
+        dict: Sizes in MiB: 'rss', 'pss' (RSS with shared pages divided among
+            sharers), 'shared' and 'private'
+    """
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1])
+    mib = lambda kb: round(kb / 1024, 1)
+    return {
+        "rss": mib(fields.get("Rss", 0)),
+        "pss": mib(fields.get("Pss", 0)),
+        "shared": mib(fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)),
+        "private": mib(fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)),
+    }
+
+
+def preload():
+    """Import the app and load everything workers should share."""
+    logger.info("Preloading application in parent process...")
+    import app as app_module
+    from RAG.retrieval import retrieve_from_pinecone
+
+    app_module.get_rag_instance()
+    # Builds the local index from artifacts (VECTOR_STORE=local) or the Pinecone handle
+    retrieve_from_pinecone.get_index()
+    # Cache warmup (RAG/warmup.py) runs in each worker's startup instead: thread
+    # pools and the model's compute threads do not survive the fork
+
+    # Move everything allocated so far out of the collector's reach, so
+    # garbage collection in the workers doesn't write to (and un-share) these pages
+    gc.collect()
+    gc.freeze()
+    logger.info("Preload complete")
+    return app_module.app
+
+
+def run_worker(app, sock: socket.socket, threads_per_worker: int) -> None:
+    """Serve requests on the inherited socket (runs in the forked child)."""
+    import uvicorn
+    try:
+        import torch
+        # Without this every worker starts one thread per core and they oversubscribe the CPU
+        torch.set_num_threads(threads_per_worker)
+    except ImportError:
+        pass
+    config = uvicorn.Config(app, log_config=None, timeout_keep_alive=5)
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork multi-worker server with shared preloaded models.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--report-memory", action="store_true", help="Log per-worker memory usage once workers are up")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    app = preload()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    threads_per_worker = max(1, (os.cpu_count() or 1) // args.workers)
+
+    def spawn() -> int:
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            try:
+                run_worker(app, sock, threads_per_worker)
+            finally:
+                os._exit(0)
+        logger.info(f"Started worker {pid}")
+        return pid
+
+    workers = {spawn() for _ in range(args.workers)}
+    logger.info(f"Serving on http://{args.host}:{args.port} with {args.workers} workers")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    if args.report_memory:
+        time.sleep(5)
+        logger.info(f"Parent {os.getpid()} memory (MiB): {read_memory_usage(os.getpid())}")
+        for pid in sorted(workers):
+            logger.info(f"Worker {pid} memory (MiB): {read_memory_usage(pid)}")
+
+    # Replace workers that die until asked to stop
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if not stopping:
+            logger.warning(f"Worker {pid} exited with status {status}, restarting")
+            workers.add(spawn())
+    logger.info("All workers stopped")
+
+
+if __name__ == "__main__":
+    main()
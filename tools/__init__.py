@@ -1,6 +1,12 @@
 """Tools module for the agent."""
 
-from tools.search import get_tavily_search_tool
-
-__all__ = [ "get_tavily_search_tool"]
+from tools.search import get_tavily_search_tool, get_search_client, CachedSearch, FixtureSearchBackend
+from tools.search_cache import SearchCache
 
+__all__ = [
+    "get_tavily_search_tool",
+    "get_search_client",
+    "CachedSearch",
+    "FixtureSearchBackend",
+    "SearchCache",
+]
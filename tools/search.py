@@ -1,19 +1,190 @@
 """Search-related tools using Tavily."""
 
 import os
-from langchain_tavily import TavilySearch
+import json
+import atexit
+import time
+import logging
+import hashlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import Optional
+from langchain_core.tools import StructuredTool
+from config.settings import (
+    SEARCH_BACKEND,
+    SEARCH_FIXTURE_PATH,
+    SEARCH_FIXTURE_LATENCY_SECONDS,
+    SEARCH_MAX_RESULTS,
+    SEARCH_CACHE_TTL_SECONDS,
+    SEARCH_CACHE_MAX_ENTRIES,
+    SEARCH_CACHE_PATH,
+    SEARCH_CACHE_SAVE_EVERY,
+    SEARCH_TIMEOUT_SECONDS,
+    SEARCH_MAX_WORKERS,
+)
+from tools.search_cache import SearchCache, normalize_query
 
+logger = logging.getLogger(__name__)
 
-def get_tavily_search_tool():
-    """Get Tavily search tool.
+SEARCH_TOOL_DESCRIPTION = (
+    "A search engine optimized for comprehensive, accurate, and trusted results. "
+    "Useful for when you need to answer questions about current events. "
+    "Input should be a search query. Pass several related queries in `queries` "
+    "to run them concurrently."
+)
+
+
+class TavilyBackend:
+    """Search backend that calls the Tavily API."""
+
+    def __init__(self, api_key: str, max_results: int = SEARCH_MAX_RESULTS):
+        from langchain_tavily import TavilySearch
+
+        self.tool = TavilySearch(
+            api_key=api_key,
+            max_results=max_results,  # Number of search results to return
+        )
+
+    def search(self, query: str) -> dict:
+        return self.tool.invoke({"query": query})
+
+
+class FixtureSearchBackend:
+    """Offline search backend serving canned results from a local JSON file.
+    
+    The fixture file maps queries to Tavily-shaped result dicts. Queries not
+    in the fixture get a deterministic synthetic result, so agent throughput
+    can be benchmarked without network access. ``latency_seconds`` simulates
+    network latency per search.
+    """
+
+    def __init__(self, path: Optional[str] = None, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self.fixtures = {}
+        if path:
+            with open(path, encoding="utf-8") as f:
+                self.fixtures = {normalize_query(q): r for q, r in json.load(f).items()}
+            logger.info(f"Loaded {len(self.fixtures)} search fixtures from {path}")
+
+    def search(self, query: str) -> dict:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        result = self.fixtures.get(normalize_query(query))
+        if result is not None:
+            return result
+        digest = hashlib.sha1(normalize_query(query).encode("utf-8")).hexdigest()[:8]
+        return {
+            "query": query,
+            "results": [
+                {
+                    "title": f"Fixture result {i} for {query}",
+                    "url": f"https://example.com/{digest}/{i}",
+                    "content": f"Offline fixture content {i} for the query '{query}'.",
+                    "score": 1.0 - i * 0.1,
+                }
+                for i in range(SEARCH_MAX_RESULTS)
+            ],
+        }
+
+
+class CachedSearch:
+    """Search client with a result cache, in-flight deduplication and concurrent fan-out.
+    
+    Identical searches (after normalization) are served from the cache. If an
+    identical search is already running, callers wait for its result instead
+    of issuing a duplicate request.
+    """
+
+    def __init__(
+        self,
+        backend,
+        cache: Optional[SearchCache] = None,
+        timeout_seconds: float = SEARCH_TIMEOUT_SECONDS,
+        max_workers: int = SEARCH_MAX_WORKERS,
+    ):
+        self.backend = backend
+        self.cache = cache if cache is not None else SearchCache()
+        self.timeout_seconds = timeout_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="search")
+        self._in_flight: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def search(self, query: str) -> dict:
+        """Run a single search, using the cache and joining identical in-flight searches."""
+        key = normalize_query(query)
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.debug(f"Search cache hit for '{key}'")
+            return cached
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+
+        if not leader:
+            logger.debug(f"Joining in-flight search for '{key}'")
+            return future.result()
+
+        try:
+            try:
+                result = self.backend.search(query)
+            except Exception as e:
+                future.set_exception(e)
+                raise
+            future.set_result(result)
+            # A caching problem must not fail a search that succeeded
+            try:
+                self.cache.set(key, result)
+            except Exception as e:
+                logger.warning(f"Could not cache search results for '{key}': {e}")
+            return result
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def search_many(self, queries: list[str], timeout_seconds: Optional[float] = None) -> dict[str, dict]:
+        """Run several searches concurrently within a shared timeout budget.
+        
+        Args:
+            queries: Search queries to run
+            timeout_seconds: Total time budget (default: the client's timeout)
+            
+        Returns:
+            dict[str, dict]: Results keyed by query. Queries that failed or did
+                not finish within the budget are omitted.
+        """
+        timeout = self.timeout_seconds if timeout_seconds is None else timeout_seconds
+        unique_queries = list(dict.fromkeys(queries))
+        futures = {self._executor.submit(self.search, q): q for q in unique_queries}
+        done, not_done = wait(futures, timeout=timeout)
+        if not_done:
+            logger.warning(f"{len(not_done)} of {len(futures)} searches did not finish within {timeout}s")
+        results = {}
+        for future in done:
+            query = futures[future]
+            try:
+                results[query] = future.result()
+            except Exception as e:
+                logger.warning(f"Search failed for '{query}': {e}")
+        return {q: results[q] for q in unique_queries if q in results}
+
+
+def create_search_backend():
+    """Create the search backend selected by ``SEARCH_BACKEND``.
     
     Returns:
-        TavilySearch: Configured Tavily search tool
+        TavilyBackend | FixtureSearchBackend: Configured search backend
         
-    Note:
-        Requires TAVILY_API_KEY environment variable to be set.
-        Get your API key from: https://tavily.com/
+    Raises:
+        ValueError: If the Tavily backend is selected and TAVILY_API_KEY is not set
     """
+    if SEARCH_BACKEND == "fixture":
+        return FixtureSearchBackend(SEARCH_FIXTURE_PATH, SEARCH_FIXTURE_LATENCY_SECONDS)
+
     api_key = os.getenv("TAVILY_API_KEY")
     if not api_key:
         raise ValueError(
@@ -21,9 +192,51 @@ def get_tavily_search_tool():
             "Please set it in your .env file or export it. "
             "Get your API key from: https://tavily.com/"
         )
+    return TavilyBackend(api_key=api_key, max_results=SEARCH_MAX_RESULTS)
+
+
+@lru_cache(maxsize=None)
+def get_search_client() -> CachedSearch:
+    """Get the process-wide cached search client.
     
-    return TavilySearch(
-        api_key=api_key,
-        max_results=3,  # Number of search results to return
+    Returns:
+        CachedSearch: Shared search client so all agents share one cache
+    """
+    cache = SearchCache(
+        ttl_seconds=SEARCH_CACHE_TTL_SECONDS,
+        max_entries=SEARCH_CACHE_MAX_ENTRIES,
+        path=SEARCH_CACHE_PATH,
+        save_every=SEARCH_CACHE_SAVE_EVERY,
     )
+    if cache.path is not None:
+        # Keep the entries added since the last periodic save
+        atexit.register(cache.save)
+    return CachedSearch(create_search_backend(), cache=cache)
+
+
+def get_tavily_search_tool():
+    """Get Tavily search tool.
+    
+    The tool is backed by the shared CachedSearch client. Set
+    SEARCH_BACKEND=fixture to serve results from a local fixture file instead
+    of the Tavily API.
+    
+    Returns:
+        StructuredTool: Configured search tool
+        
+    Note:
+        Requires TAVILY_API_KEY environment variable to be set.
+        Get your API key from: https://tavily.com/
+    """
+    client = get_search_client()
+
+    def tavily_search(query: str, queries: Optional[list[str]] = None) -> dict:
+        if queries:
+            return {"results_by_query": client.search_many([query, *queries])}
+        return client.search(query)
 
+    return StructuredTool.from_function(
+        func=tavily_search,
+        name="tavily_search",
+        description=SEARCH_TOOL_DESCRIPTION,
+    )
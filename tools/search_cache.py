@@ -0,0 +1,153 @@
+"""TTL + LRU cache for search results, optionally persisted to disk."""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a search query so trivially different spellings share a cache entry.
+    
+    Args:
+        query: The raw search query
+        
+    Returns:
+        str: Lower-cased query with collapsed whitespace
+    """
+    return " ".join(query.lower().split())
+
+
+class SearchCache:
+    """Thread-safe search result cache with time-to-live and LRU eviction.
+    
+    Entries expire ``ttl_seconds`` after being stored. When the cache holds
+    ``max_entries`` items the least recently used entry is evicted. If
+    ``path`` is given, the cache is loaded from that JSON file and saved to
+    it after every ``save_every`` new entries; call :meth:`save` at shutdown
+    to keep the rest.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600, max_entries: int = 512, path: Optional[str] = None, save_every: int = 20):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.path = Path(path) if path else None
+        self.save_every = save_every
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        # Serializes writes to the cache file
+        self._save_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if self.path is not None:
+            self.load()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for ``key``, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        """Store ``value`` under ``key``, evicting the least recently used entry if full."""
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._unsaved += 1
+            due = self.path is not None and self._unsaved >= self.save_every
+        if due:
+            self.save()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def save(self, path: Optional[str] = None) -> bool:
+        """Persist unexpired entries to ``path`` (default: the cache's own path), written atomically.
+        
+        Write errors are logged, not raised, so a disk problem never fails a caller.
+        
+        Returns:
+            bool: True if the entries were written
+        """
+        path = Path(path) if path else self.path
+        if path is None:
+            return False
+        with self._save_lock:
+            now = time.time()
+            with self._lock:
+                data = [
+                    [key, stored_at, value]
+                    for key, (stored_at, value) in self._entries.items()
+                    if now - stored_at <= self.ttl_seconds
+                ]
+                unsaved, self._unsaved = self._unsaved, 0
+            tmp_path = None
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with tempfile.NamedTemporaryFile(
+                    "w", encoding="utf-8", dir=path.parent, prefix=f"{path.name}.", suffix=".tmp", delete=False
+                ) as f:
+                    tmp_path = f.name
+                    json.dump(data, f)
+                os.replace(tmp_path, path)
+            except (OSError, TypeError, ValueError) as e:
+                logger.warning(f"Could not save cache to {path}: {e}")
+                if tmp_path is not None and os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                with self._lock:
+                    self._unsaved += unsaved
+                return False
+        return True
+
+    def load(self, path: Optional[str] = None) -> int:
+        """Merge unexpired entries from a file written by :meth:`save` (default: the cache's own path).
+        
+        Entries already in the cache are only replaced by newer ones.
+        
+        Returns:
+            int: Number of entries loaded
+        """
+        path = Path(path) if path else self.path
+        if path is None or not path.exists():
+            return 0
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load cache from {path}: {e}")
+            return 0
+        now = time.time()
+        loaded = 0
+        with self._lock:
+            for key, stored_at, value in data[-self.max_entries:]:
+                if now - stored_at > self.ttl_seconds:
+                    continue
+                current = self._entries.get(key)
+                if current is not None and current[0] >= stored_at:
+                    continue
+                self._entries[key] = (stored_at, value)
+                loaded += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        logger.info(f"Loaded {loaded} cached entries from {path}")
+        return loaded